@@ -0,0 +1,72 @@
+"""Сравнение выборки диапазона дат бинарным поиском и булевой маской на синтетических данных.
+
+Запуск: python benchmarks/bench_date_range.py --rows 10000000
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from utils import select_date_range  # noqa: E402
+
+
+def make_transactions(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Синтетический DataFrame операций, отсортированный по дате, с датой в индексе."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2015-01-01T00:00:00")
+    seconds = np.sort(rng.integers(0, 10 * 365 * 24 * 3600, size=rows))
+    dates = start + seconds.astype("timedelta64[s]")
+    df = pd.DataFrame(
+        {
+            "Дата операции": dates,
+            "Сумма операции с округлением": rng.uniform(1, 5000, size=rows).round(2),
+        }
+    )
+    df.index = pd.DatetimeIndex(df["Дата операции"], name=None)
+    return df
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    """Лучшее время выполнения функции из repeat запусков, в секундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_transactions(args.rows)
+    windows = {
+        "месяц": (datetime(2021, 9, 1), datetime(2021, 9, 27, 16, 0, 0)),
+        "три месяца": (datetime(2021, 6, 27), datetime(2021, 9, 27)),
+        "день": (datetime(2021, 9, 27), datetime(2021, 9, 27, 23, 59, 59)),
+    }
+    print(f"Строк: {args.rows}")
+    for name, (start_date, end_date) in windows.items():
+        dates = df["Дата операции"]
+        mask_time = best_of(lambda: df[(dates >= start_date) & (dates <= end_date)], args.repeat)
+        search_time = best_of(lambda: select_date_range(df, start_date, end_date), args.repeat)
+        rows_in_window = len(select_date_range(df, start_date, end_date))
+        print(
+            f"{name:>10}: строк в окне {rows_in_window:>9}, маска {mask_time * 1000:9.3f} мс, "
+            f"бинарный поиск {search_time * 1000:9.3f} мс, ускорение x{mask_time / search_time:,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
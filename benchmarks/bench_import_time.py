@@ -0,0 +1,63 @@
+"""Время импорта модуля по данным python -X importtime и проверка бюджета на холодный старт.
+
+Запуск: python benchmarks/bench_import_time.py --module main --budget-ms 600
+Завершается с кодом 1, если время импорта превышает бюджет или при импорте загружаются отложенные зависимости.
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+# зависимости, которые должны загружаться только при первом использовании, а не при импорте
+LAZY_MODULES = ("requests", "urllib3", "openpyxl", "dotenv", "sqlite3")
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """Время импорта (собственное и суммарное, мкс) каждого модуля, загруженного при импорте module."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=600.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+    best_run = min(runs, key=lambda times: times[args.module][1])
+    total_ms = best_run[args.module][1] / 1000
+    print(f"Импорт {args.module}: {total_ms:.1f} мс (лучший из {args.repeat}), бюджет {args.budget_ms:.1f} мс")
+    print("Самые долгие модули по собственному времени импорта:")
+    for name, (self_us, cumulative_us) in sorted(best_run.items(), key=lambda item: -item[1][0])[: args.top]:
+        print(f"  {name:<50} {self_us / 1000:8.1f} мс (всего {cumulative_us / 1000:.1f} мс)")
+
+    eager = sorted({name.split(".")[0] for name in best_run} & set(LAZY_MODULES))
+    failed = False
+    if eager:
+        print(f"При импорте загружены отложенные зависимости: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"Время импорта превышает бюджет на {total_ms - args.budget_ms:.1f} мс")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Сравнение отбора топ-N транзакций частичным отбором и полной сортировкой на синтетических данных.
+
+Запуск: python benchmarks/bench_top_n.py --rows 10000000
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bench_date_range import best_of, make_transactions  # noqa: E402
+
+from views import get_top_transactions  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_transactions(args.rows)
+    df["Статус"] = pd.Categorical(np.where(np.arange(args.rows) % 50 == 0, "FAILED", "OK"))
+    print(f"Строк: {args.rows}")
+    for n in (5, 100, 10_000):
+        sort_time = best_of(
+            lambda: df[df["Статус"] == "OK"]
+            .sort_values(by="Сумма операции с округлением", ascending=False, kind="stable")
+            .head(n),
+            args.repeat,
+        )
+        top_time = best_of(lambda: get_top_transactions(df, n), args.repeat)
+        print(
+            f"N={n:>6}: полная сортировка {sort_time * 1000:9.3f} мс, "
+            f"частичный отбор {top_time * 1000:9.3f} мс, ускорение x{sort_time / top_time:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Набор бенчмарков публичных функций на синтетических операциях: время и пиковая память.
+
+Результаты записываются в JSON; при переданном baseline набор завершается с кодом 1,
+если время или память какой-либо функции выросли больше допустимого.
+
+Запуск: python benchmarks/run_benchmarks.py --rows 10000 100000 --baseline benchmarks/baseline.json
+Обновление эталона: python benchmarks/run_benchmarks.py --output benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from synthetic import EXCEL_MAX_ROWS, generate_transactions, write_transactions  # noqa: E402
+
+import main as main_module  # noqa: E402
+from reports import spending_by_category  # noqa: E402
+from services import get_transactions_with_phone_num  # noqa: E402
+from utils import TRANSACTION_SCHEMA, prepare_transactions, read_excel_file  # noqa: E402
+from views import filter_df_by_date, get_card_sum_cashback, get_topfive_transactions, parse_datetime  # noqa: E402
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = BENCHMARKS_DIR / "results.json"
+# дата запроса внутри периода синтетических данных
+DATE_TIME_STR = "2021-12-20 18:00:00"
+REPORT_DATE = "20.12.2021"
+REPORT_CATEGORY = "Супермаркеты"
+# изменения меньше этих величин считаются шумом измерений
+MIN_TIME_DELTA = 0.005
+MIN_MEMORY_DELTA = 1.0
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Лучшее время из repeat запусков (с) и пиковый прирост памяти за отдельный запуск (МиБ)."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"time_s": round(min(timings), 6), "peak_mb": round(peak / 2**20, 3)}
+
+
+def run_size(rows: int, seed: int, repeat: int, work_dir: Path) -> dict[str, dict[str, float]]:
+    """Бенчмарки всех функций на rows синтетических операциях."""
+    raw = generate_transactions(rows, seed)
+    df = prepare_transactions(raw)
+    dt = parse_datetime(DATE_TIME_STR)
+    month_df = filter_df_by_date(df, dt)
+    cases: dict[str, Callable[[], object]] = {
+        "prepare_transactions": lambda: prepare_transactions(raw),
+        "filter_df_by_date": lambda: filter_df_by_date(df, dt),
+        "get_card_sum_cashback": lambda: get_card_sum_cashback(month_df),
+        "get_topfive_transactions": lambda: get_topfive_transactions(month_df),
+        "spending_by_category": lambda: spending_by_category(df, REPORT_CATEGORY, REPORT_DATE),
+        "get_transactions_with_phone_num": lambda: get_transactions_with_phone_num(df),
+    }
+    if rows <= EXCEL_MAX_ROWS:
+        xlsx_path = work_dir / f"operations_{rows}.xlsx"
+        write_transactions(xlsx_path, rows, seed)
+        settings_path = work_dir / "user_settings.json"
+        # без валют и акций main не обращается к внешним API
+        settings_path.write_text(json.dumps({"user_currencies": [], "user_stocks": []}))
+        main_module.file_path_xlsx = xlsx_path
+        main_module.user_settings_path = settings_path
+        main_module.CACHE_DIR = work_dir / "cache"
+        cases["read_excel_file"] = lambda: read_excel_file(xlsx_path)
+        cases["read_excel_file_cached"] = lambda: read_excel_file(xlsx_path, cache_dir=work_dir / "cache")
+        cases["read_excel_file_schema"] = lambda: read_excel_file(
+            xlsx_path, cache_dir=work_dir / "cache", schema=TRANSACTION_SCHEMA
+        )
+        cases["main"] = lambda: main_module.main(DATE_TIME_STR)
+
+    results = {}
+    for name, func in cases.items():
+        # прогрев: кеш Excel, ленивые импорты
+        func()
+        key = f"{name}@{rows}"
+        results[key] = measure(func, repeat)
+        print(f"{key:<45} {results[key]['time_s'] * 1000:11.2f} мс {results[key]['peak_mb']:10.1f} МиБ")
+    return results
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], time_tolerance: float, memory_tolerance: float) -> list:
+    """Список регрессий относительно эталона: (бенчмарк, метрика, эталон, текущее значение)."""
+    regressions = []
+    for key, current in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric, tolerance, min_delta in (
+            ("time_s", time_tolerance, MIN_TIME_DELTA),
+            ("peak_mb", memory_tolerance, MIN_MEMORY_DELTA),
+        ):
+            delta = current[metric] - reference[metric]
+            if delta > min_delta and current[metric] > reference[metric] * (1 + tolerance):
+                regressions.append((key, metric, reference[metric], current[metric]))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--time-tolerance", type=float, default=0.5)
+    parser.add_argument("--memory-tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for rows in args.rows:
+            results.update(run_size(rows, args.seed, args.repeat, Path(work_dir)))
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "rows": args.rows,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=4, ensure_ascii=False), encoding="utf-8")
+    print(f"Результаты записаны в {args.output}")
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+        for key, metric, reference, current in regressions:
+            print(f"Регрессия {key} {metric}: {reference} -> {current}")
+        if regressions:
+            sys.exit(1)
+        print(f"Регрессий относительно {args.baseline} нет")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Детерминированный генератор синтетических операций в формате data/operations.xlsx.
+
+Одинаковые rows и seed всегда дают одинаковые данные. Большие объемы генерируются порциями по CHUNK_ROWS строк,
+поэтому и 50 млн строк можно записать в CSV, не держа их в памяти целиком.
+
+Запуск: python benchmarks/synthetic.py --rows 1000000 --output operations_1m.xlsx
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from report_writers import write_excel_streaming  # noqa: E402
+
+COLUMNS = ["Дата операции", "Номер карты", "Статус", "Сумма операции с округлением", "Категория", "Описание"]
+CHUNK_ROWS = 1_000_000
+# больше строк не помещается на лист Excel
+EXCEL_MAX_ROWS = 1_048_575
+PERIOD_START = datetime(2018, 1, 1)
+PERIOD_END = datetime(2021, 12, 31, 23, 59, 59)
+
+# карты и доля операций по ним (None - операции без карты), по data/operations.xlsx
+CARDS = {"*7197": 4834, "*4556": 1143, "*5091": 52, "*5441": 12, "*1112": 7, "*5507": 2, "*6002": 2, None: 653}
+FAILED_SHARE = 0.006
+# категории: доля операций, средняя сумма и типичные описания
+CATEGORIES: dict[str, tuple[int, float, list[str]]] = {
+    "Супермаркеты": (2274, 400, ["Колхоз", "Магнит", "SPAR", "Дикси", "Перекрёсток", "Supermarket 101"]),
+    "Фастфуд": (1291, 250, ["McDonald's", "Rumyanyj Khleb", "Бургер Кинг", "Kofe s sobojj", "OOO Frittella"]),
+    "Транспорт": (383, 300, ["Яндекс Такси", "Метро Санкт-Петербург", "Стрелка", "Московский транспорт"]),
+    "Переводы": (351, 5000, ["Перевод Кредитная карта. ТП 10.2 RUR", "Перевод на карту", "Иван С.", "Сергей З."]),
+    "Ж/д билеты": (245, 1500, ["РЖД", "Ozon.ru ЖД билеты"]),
+    "Различные товары": (227, 1200, ["Ozon.ru", "OZON.ru", "Wildberries"]),
+    "Связь": (194, 500, ["МТС", "Devajs Servis.", "REG.RU"]),
+    "Пополнения": (183, 10000, ["Перевод с карты", "Внесение наличных через банкомат Тинькофф"]),
+    "Аптеки": (152, 600, ["Аптека Вита", "Ригла", "Аптека Невис"]),
+    "Каршеринг": (119, 700, ["Ситидрайв", "Yandex Drive", "Делимобиль"]),
+    "Рестораны": (117, 1500, ["Pizza Hut", "Тануки", "Хачапури и вино"]),
+    "Бонусы": (103, 100, ["Вознаграждение за операции покупок", "Проценты на остаток по счету"]),
+    "Наличные": (100, 5000, ["Снятие в банкомате Сбербанк", "Снятие в банкомате Тинькофф"]),
+    "Дом и ремонт": (99, 1500, ["Леруа Мерлен", "OBI", "Петрович"]),
+    "Услуги банка": (93, 100, ["Плата за обслуживание", "Оплата услуг СМС-банка"]),
+    "Топливо": (75, 1500, ["Лукойл", "Shell", "Газпромнефть"]),
+    "Образование": (75, 3000, ["Skyeng", "Coursera"]),
+    "Одежда и обувь": (65, 3000, ["Uniqlo", "Спортмастер", "Lamoda"]),
+    "Другое": (65, 800, ["Прочие операции"]),
+    "Сервис": (58, 600, ["Яндекс Плюс", "Apple"]),
+    "ЖКХ": (48, 3500, ["ЖКУ Квартира", "Петроэлектросбыт"]),
+    "Цветы": (33, 1500, ["Цветы на Невском", "Flowwow"]),
+    "Мобильная связь": (30, 400, ["Я МТС", "Тинькофф Мобайл", "МТС Mobile", "Билайн"]),
+}
+# доля операций мобильной связи с номером телефона в описании
+PHONE_SHARE = 0.9
+# форматы записи номера в описании
+PHONE_FORMATS = ["+7 {a} {b}-{c}-{d}", "+7 ({a}) {b}-{c}-{d}", "+7{a}{b}{c}{d}", "8 {a} {b} {c} {d}"]
+
+
+def generate_transactions(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Синтетические операции в формате data/operations.xlsx, от новых к старым, как в выгрузке банка."""
+    chunks = list(iter_transactions(rows, seed))
+    if not chunks:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def iter_transactions(rows: int, seed: int = 0) -> Iterator[pd.DataFrame]:
+    """Те же операции, что generate_transactions, порциями не более CHUNK_ROWS строк.
+
+    Каждая порция покрывает свою часть периода и генерируется независимым генератором случайных чисел,
+    поэтому данные зависят только от rows и seed.
+    """
+    period_seconds = int((PERIOD_END - PERIOD_START).total_seconds())
+    for chunk_index, chunk_start in enumerate(range(0, rows, CHUNK_ROWS)):
+        chunk_rows = min(CHUNK_ROWS, rows - chunk_start)
+        # порция покрывает отрезок периода, пропорциональный своему размеру, новые операции - в первых порциях
+        newest = period_seconds - period_seconds * chunk_start // rows
+        oldest = period_seconds - period_seconds * (chunk_start + chunk_rows) // rows
+        rng = np.random.default_rng([seed, chunk_index])
+        yield _generate_chunk(rng, chunk_rows, oldest, newest)
+
+
+def _generate_chunk(rng: np.random.Generator, rows: int, oldest: int, newest: int) -> pd.DataFrame:
+    """Одна порция операций с датами в отрезке [oldest, newest] секунд от начала периода."""
+    seconds = np.sort(rng.integers(oldest, max(newest, oldest + 1), size=rows))[::-1]
+    dates = pd.Timestamp(PERIOD_START) + pd.to_timedelta(seconds, unit="s")
+
+    card_names = list(CARDS)
+    card_weights = np.array(list(CARDS.values()), dtype=float)
+    card_codes = rng.choice(len(card_names), size=rows, p=card_weights / card_weights.sum())
+    cards = np.array(card_names, dtype=object)[card_codes]
+
+    category_names = list(CATEGORIES)
+    category_weights = np.array([weight for weight, _, _ in CATEGORIES.values()], dtype=float)
+    category_codes = rng.choice(len(category_names), size=rows, p=category_weights / category_weights.sum())
+
+    mean_amounts = np.array([mean for _, mean, _ in CATEGORIES.values()])[category_codes]
+    amounts = np.round(mean_amounts * rng.lognormal(-0.5, 1.0, size=rows), 2).clip(1.0)
+
+    descriptions = np.empty(rows, dtype=object)
+    for code, (_, _, pool) in enumerate(CATEGORIES.values()):
+        positions = np.flatnonzero(category_codes == code)
+        descriptions[positions] = np.array(pool, dtype=object)[rng.integers(0, len(pool), size=len(positions))]
+    mobile = np.flatnonzero(category_codes == category_names.index("Мобильная связь"))
+    with_phone = mobile[rng.random(len(mobile)) < PHONE_SHARE]
+    descriptions[with_phone] = [f"{description} {_random_phone(rng)}" for description in descriptions[with_phone]]
+
+    return pd.DataFrame(
+        {
+            "Дата операции": dates.strftime("%d.%m.%Y %H:%M:%S"),
+            "Номер карты": cards,
+            "Статус": np.where(rng.random(rows) < FAILED_SHARE, "FAILED", "OK"),
+            "Сумма операции с округлением": amounts,
+            "Категория": np.array(category_names, dtype=object)[category_codes],
+            "Описание": descriptions,
+        }
+    )
+
+
+def _random_phone(rng: np.random.Generator) -> str:
+    """Мобильный номер в одном из распространенных форматов записи."""
+    phone_format = PHONE_FORMATS[rng.integers(len(PHONE_FORMATS))]
+    a, b, c, d = rng.integers(900, 1000), rng.integers(100, 1000), rng.integers(10, 100), rng.integers(10, 100)
+    return phone_format.format(a=a, b=b, c=c, d=d)
+
+
+def write_transactions(path: Path, rows: int, seed: int = 0) -> None:
+    """Записывает синтетические операции в .xlsx (не более EXCEL_MAX_ROWS строк) или порциями в .csv."""
+    if path.suffix == ".xlsx":
+        if rows > EXCEL_MAX_ROWS:
+            raise ValueError(f"На лист Excel помещается не более {EXCEL_MAX_ROWS} строк, используйте .csv")
+        write_excel_streaming(generate_transactions(rows, seed), path)
+    elif path.suffix == ".csv":
+        for chunk_index, chunk in enumerate(iter_transactions(rows, seed)):
+            chunk.to_csv(path, index=False, mode="w" if chunk_index == 0 else "a", header=chunk_index == 0)
+    else:
+        raise ValueError(f"Неизвестный формат файла: {path.suffix}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, required=True)
+    args = parser.parse_args()
+    write_transactions(args.output, args.rows, args.seed)
+    print(f"Записано операций: {args.rows} в файл {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import threading
+
+from log_config import start_logging
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def init(env_file: str = ".env") -> None:
+    """Инициализирует приложение: загружает переменные окружения из env_file и запускает запись логов в файлы.
+
+    Вызывается точками входа (main, server); повторные вызовы ничего не делают.
+    """
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        from dotenv import load_dotenv
+
+        load_dotenv(env_file)
+        start_logging()
+        _initialized = True
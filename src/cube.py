@@ -0,0 +1,128 @@
+from datetime import datetime
+from typing import Union
+
+import pandas as pd
+
+from log_config import get_logger
+from utils import select_date_range
+
+logger = get_logger("cube")
+
+# измерения куба помимо дня операции
+CUBE_KEYS = ["last_digits", "Категория", "Статус"]
+ONE_DAY = pd.Timedelta(days=1)
+ONE_NS = pd.Timedelta(1, unit="ns")
+
+
+def _aggregate_by_day(df: pd.DataFrame) -> pd.DataFrame:
+    """Агрегирует операции в ячейки (день, карта, категория, статус) с суммой и количеством операций.
+
+    Возвращает DataFrame, отсортированный по дню, с днем операции в индексе.
+    """
+    day = df["Дата операции"].dt.normalize().rename("day")
+    keys = [day] + [df[column].astype(object).rename(column) for column in CUBE_KEYS]
+    cells = (
+        df["Сумма операции с округлением"]
+        .groupby(keys, dropna=False)
+        .agg(total="sum", count="count")
+        .reset_index()
+        .set_index("day")
+    )
+    cells.index.name = None
+    return cells
+
+
+def _merge_cells(cells: list[pd.DataFrame]) -> pd.DataFrame:
+    """Объединяет наборы ячеек, суммируя значения в совпадающих ячейках."""
+    merged = pd.concat(cells)
+    merged.index.name = "day"
+    return _aggregate_cells(merged.reset_index(), ["day"] + CUBE_KEYS).set_index("day").rename_axis(None)
+
+
+def _aggregate_cells(cells: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    """Суммирует ячейки куба по заданным измерениям."""
+    return cells.groupby(keys, dropna=False)[["total", "count"]].sum().reset_index()
+
+
+class TransactionCube:
+    """Предагрегированные суммы и количества операций по (карта, день, категория, статус).
+
+    Запрос за произвольный диапазон дат складывается из ячеек за полные дни и из исходных строк
+    за неполные дни на границах диапазона, поэтому его стоимость не зависит от размера истории.
+    """
+
+    def __init__(self, transactions: pd.DataFrame) -> None:
+        """Строит куб по DataFrame в каноническом виде (см. utils.prepare_transactions)."""
+        self._segments = [transactions]
+        self._cells = _aggregate_by_day(transactions)
+        logger.info("Куб построен по %s операциям, ячеек: %s", len(transactions), len(self._cells))
+
+    @property
+    def cells(self) -> pd.DataFrame:
+        """Ячейки куба, отсортированные по дню операции."""
+        return self._cells
+
+    def append(self, transactions: pd.DataFrame) -> None:
+        """Добавляет новые операции (в каноническом виде), пересчитывая только затронутые дни."""
+        if transactions.empty:
+            return
+        new_cells = _aggregate_by_day(transactions)
+        first_pos = self._cells.index.searchsorted(new_cells.index[0], side="left")
+        unchanged = self._cells.iloc[:first_pos]
+        updated = _merge_cells([self._cells.iloc[first_pos:], new_cells])
+        self._cells = pd.concat([unchanged, updated])
+        self._segments.append(transactions)
+        logger.info("В куб добавлено %s операций, ячеек: %s", len(transactions), len(self._cells))
+
+    def cells_in_range(
+        self, start_date: Union[datetime, pd.Timestamp], end_date: Union[datetime, pd.Timestamp]
+    ) -> pd.DataFrame:
+        """Ячейки по операциям с датой в диапазоне [start_date, end_date] включительно."""
+        cells, raw_rows = self._split_range(start_date, end_date)
+        parts = [_aggregate_by_day(rows) for rows in raw_rows]
+        if not cells.empty:
+            parts.append(cells)
+        return pd.concat(parts) if parts else self._cells.iloc[:0]
+
+    def _split_range(
+        self, start_date: Union[datetime, pd.Timestamp], end_date: Union[datetime, pd.Timestamp]
+    ) -> tuple[pd.DataFrame, list[pd.DataFrame]]:
+        """Делит диапазон на ячейки за полные дни и исходные строки за неполные дни на границах."""
+        start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        first_full_day = start_date.normalize()
+        if first_full_day != start_date:
+            first_full_day += ONE_DAY
+        end_full_day = (end_date + ONE_NS).normalize()
+        if first_full_day >= end_full_day:
+            return self._cells.iloc[:0], self._raw_rows(start_date, end_date)
+        start_pos = self._cells.index.searchsorted(first_full_day, side="left")
+        end_pos = self._cells.index.searchsorted(end_full_day, side="left")
+        raw_rows = self._raw_rows(start_date, first_full_day - ONE_NS) + self._raw_rows(end_full_day, end_date)
+        return self._cells.iloc[start_pos:end_pos], raw_rows
+
+    def _raw_rows(self, start_date: pd.Timestamp, end_date: pd.Timestamp) -> list[pd.DataFrame]:
+        """Исходные строки за неполный день на границе диапазона."""
+        if start_date > end_date:
+            return []
+        rows = [select_date_range(segment, start_date, end_date) for segment in self._segments]
+        return [part for part in rows if not part.empty]
+
+    def card_sums(self, start_date: datetime, end_date: datetime) -> pd.Series:
+        """Суммы успешных операций по картам за диапазон дат."""
+        cells, raw_rows = self._split_range(start_date, end_date)
+        cells = cells[(cells["Статус"] == "OK") & cells["last_digits"].notna()]
+        parts = [cells["total"].groupby(cells["last_digits"]).sum()]
+        for rows in raw_rows:
+            rows = rows[(rows["Статус"] == "OK") & rows["last_digits"].notna()]
+            parts.append(rows["Сумма операции с округлением"].groupby(rows["last_digits"].astype(object)).sum())
+        parts = [part for part in parts if not part.empty]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return pd.Series(dtype="float64", index=pd.Index([], dtype="object", name="last_digits"))
+        return pd.concat(parts).groupby(level=0).sum().rename_axis("last_digits")
+
+    def category_totals(self, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+        """Суммы и количества операций по категориям за диапазон дат."""
+        cells = self.cells_in_range(start_date, end_date)
+        return _aggregate_cells(cells, ["Категория"])
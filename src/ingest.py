@@ -0,0 +1,153 @@
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from log_config import get_logger
+from services import SOURCE_ROW_COLUMN
+from utils import CATEGORICAL_COLUMNS, TRANSACTION_SCHEMA, prepare_transactions, read_excel_file
+
+logger = get_logger("ingest")
+
+# столбцы выписки, по значениям которых строится ключ строки
+KEY_COLUMNS = list(TRANSACTION_SCHEMA)
+DEFAULT_PATTERN = "operations*.xlsx"
+
+
+@dataclass(frozen=True)
+class StoreSnapshot:
+    """Согласованное состояние хранилища: операции, версии их добавления и номер версии."""
+
+    transactions: pd.DataFrame
+    row_versions: np.ndarray
+    version: int
+
+
+def row_keys(df: pd.DataFrame) -> np.ndarray:
+    """Стабильные ключи строк DataFrame в каноническом виде.
+
+    Ключ - хеш значений столбцов выписки и номера повторения такой же строки в DataFrame:
+    одинаковые операции внутри одного файла остаются разными строками, а строки,
+    повторяющиеся в пересекающихся выписках, получают одинаковые ключи.
+    """
+    columns = [column for column in KEY_COLUMNS if column in df]
+    content = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    occurrence = pd.Series(content).groupby(content).cumcount().to_numpy()
+    hashed = pd.util.hash_pandas_object(pd.DataFrame({"content": content, "occurrence": occurrence}), index=False)
+    keys: np.ndarray = hashed.to_numpy()
+    return keys
+
+
+class TransactionStore:
+    """Сводное хранилище операций из нескольких файлов выписок.
+
+    Разбираются только новые и изменившиеся файлы: для неизменившегося файла ingest выполняет
+    только os.stat. Операции, уже загруженные из других файлов, отбрасываются по ключу строки
+    (см. row_keys), новые добавляются в общий DataFrame в каноническом виде, а номер версии
+    увеличивается. Операции из хранилища не удаляются, даже если исчезли из измененного файла.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        schema: Optional[dict[str, Optional[str]]] = TRANSACTION_SCHEMA,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.schema = schema
+        # файл -> (mtime_ns, размер) при последней загрузке, None - файл еще не загружался
+        self._files: dict[Path, Optional[tuple[int, int]]] = {}
+        self._keys = np.empty(0, dtype="uint64")
+        # число строк в загруженных файлах: номера исходных строк продолжаются от файла к файлу
+        self._source_rows = 0
+        self._lock = threading.Lock()
+        self.snapshot = StoreSnapshot(pd.DataFrame(), np.empty(0, dtype="int64"), 0)
+
+    @property
+    def transactions(self) -> pd.DataFrame:
+        """Все операции хранилища в каноническом виде, отсортированные по дате."""
+        return self.snapshot.transactions
+
+    @property
+    def version(self) -> int:
+        """Номер версии, увеличивается при каждом добавлении операций."""
+        return self.snapshot.version
+
+    def register(self, *paths: Union[str, Path]) -> None:
+        """Регистрирует файлы выписок; они будут загружены при следующем вызове ingest."""
+        with self._lock:
+            for path in paths:
+                self._files.setdefault(Path(path), None)
+
+    def register_directory(self, directory: Union[str, Path], pattern: str = DEFAULT_PATTERN) -> None:
+        """Регистрирует все файлы выписок в каталоге, подходящие под шаблон имени."""
+        self.register(*sorted(Path(directory).glob(pattern)))
+
+    def ingest(self) -> int:
+        """Загружает новые и изменившиеся файлы и возвращает число добавленных операций.
+
+        Если разбор файла завершился исключением, хранилище не изменяется. Файл, который не удалось
+        прочитать (или в котором нет операций), не отмечается загруженным и читается при следующем вызове.
+        """
+        with self._lock:
+            known_keys = self._keys
+            source_rows = self._source_rows
+            signatures = {}
+            parts = []
+            for path, signature in self._files.items():
+                try:
+                    stat = os.stat(path)
+                except OSError as e:
+                    logger.error("Исключение %s. Файл выписки %s пропущен.", e, path)
+                    continue
+                if signature == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                file_data = read_excel_file(path, cache_dir=self.cache_dir, schema=self.schema)
+                if file_data.empty:
+                    # read_excel_file возвращает пустой DataFrame и при ошибке чтения (например, файл занят),
+                    # поэтому файл не отмечается загруженным и читается снова при следующем вызове
+                    logger.warning("Файл выписки %s не прочитан или пуст, он будет прочитан повторно.", path)
+                    continue
+                signatures[path] = (stat.st_mtime_ns, stat.st_size)
+                df = prepare_transactions(file_data)
+                df[SOURCE_ROW_COLUMN] += source_rows
+                source_rows += len(df)
+                keys = row_keys(df)
+                is_new = ~np.isin(keys, known_keys)
+                known_keys = np.concatenate([known_keys, keys[is_new]])
+                logger.info("Файл выписки %s загружен, новых операций: %s", path, int(is_new.sum()))
+                if is_new.any():
+                    parts.append(df[is_new])
+            if parts:
+                self.snapshot = self._append(parts)
+            self._keys = known_keys
+            self._source_rows = source_rows
+            self._files.update(signatures)
+            added = sum(len(part) for part in parts)
+            if added:
+                logger.info("В хранилище добавлено %s операций, версия %s", added, self.snapshot.version)
+            return added
+
+    def rows_since(self, version: int) -> pd.DataFrame:
+        """Операции, добавленные после указанной версии (например, для TransactionCube.append)."""
+        snapshot = self.snapshot
+        return snapshot.transactions[snapshot.row_versions > version]
+
+    def _append(self, parts: list[pd.DataFrame]) -> StoreSnapshot:
+        """Новый снимок хранилища с добавленными операциями, отсортированными по дате вместе с прежними."""
+        previous = self.snapshot
+        version = previous.version + 1
+        frames = [previous.transactions, *parts] if not previous.transactions.empty else parts
+        combined = pd.concat(frames)
+        # при объединении категорий разных файлов pandas переводит столбец в object
+        for column in (*CATEGORICAL_COLUMNS, "last_digits"):
+            if column in combined and not isinstance(combined[column].dtype, pd.CategoricalDtype):
+                combined[column] = combined[column].astype("category")
+        row_versions = np.concatenate(
+            [previous.row_versions, np.full(sum(len(part) for part in parts), version, dtype="int64")]
+        )
+        order = np.argsort(combined.index.to_numpy(), kind="stable")
+        return StoreSnapshot(combined.iloc[order], row_versions[order], version)
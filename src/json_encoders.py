@@ -0,0 +1,35 @@
+import json
+from typing import Any, Callable
+
+JsonEncoder = Callable[[Any, bool], str]
+
+
+def encode_json(data: Any, compact: bool = False) -> str:
+    """Кодирует ответ стандартным json: с отступом в 4 пробела или компактно, без пробелов между элементами."""
+    if compact:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(data, indent=4, ensure_ascii=False)
+
+
+def encode_orjson(data: Any, compact: bool = False) -> str:
+    """Кодирует ответ через orjson, требуется установленный orjson.
+
+    orjson поддерживает только отступ в 2 пробела и записывает NaN как null,
+    поэтому его вывод совпадает с encode_json только по содержанию.
+    """
+    import orjson
+
+    return orjson.dumps(data, option=0 if compact else orjson.OPT_INDENT_2).decode("utf-8")
+
+
+ENCODERS: dict[str, JsonEncoder] = {
+    "json": encode_json,
+    "orjson": encode_orjson,
+}
+
+
+def get_encoder(name: str) -> JsonEncoder:
+    """Возвращает функцию кодирования JSON-ответа по имени."""
+    if name not in ENCODERS:
+        raise ValueError(f"Неизвестный кодировщик JSON: {name}")
+    return ENCODERS[name]
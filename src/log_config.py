@@ -0,0 +1,112 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Optional, Union
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+LOG_DIR = BASE_DIR / "logs"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s: %(message)s"
+
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_listener: Optional[QueueListener] = None
+_module_names: list[str] = []
+_lock = threading.Lock()
+
+
+class _ModuleFileHandler(logging.Handler):
+    """Направляет каждую запись в файл логов своего модуля: logs/<имя логгера>.log."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._handlers: dict[str, logging.Handler] = {}
+
+    def add_module(self, name: str) -> None:
+        file_handler = logging.FileHandler(LOG_DIR / f"{name}.log", mode="w", encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        self._handlers[name] = file_handler
+
+    def emit(self, record: logging.LogRecord) -> None:
+        file_handler = self._handlers.get(record.name)
+        if file_handler is not None:
+            file_handler.handle(record)
+
+    def close(self) -> None:
+        for file_handler in self._handlers.values():
+            file_handler.close()
+        self._handlers.clear()
+        super().close()
+
+
+class _LazyQueueHandler(QueueHandler):
+    """Кладет запись в очередь без форматирования: сообщение собирается в потоке записи в файл."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_file_router = _ModuleFileHandler()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Возвращает логгер модуля, записи которого после start_logging пишет в файл logs/<name>.log фоновый поток.
+
+    Сообщения передаются в %-стиле (logger.debug("... %s", value)) и форматируются только
+    для записей, прошедших по уровню логгера. Вызов не открывает файлов и не запускает потоков.
+    """
+    logger = logging.getLogger(name)
+    with _lock:
+        if name not in _module_names:
+            _module_names.append(name)
+            if _listener is not None:
+                _attach(logger)
+    return logger
+
+
+def start_logging() -> None:
+    """Открывает файлы логов модулей и запускает фоновый поток записи; повторный вызов ничего не делает.
+
+    Уровень по умолчанию задается переменной окружения LOG_LEVEL (DEBUG, если не задана),
+    уровень отдельного модуля - переменной LOG_LEVEL_<МОДУЛЬ>, например LOG_LEVEL_UTILS.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        _listener = QueueListener(_log_queue, _file_router)
+        _listener.start()
+        for name in _module_names:
+            _attach(logging.getLogger(name))
+    atexit.register(stop_logging)
+
+
+def _attach(logger: logging.Logger) -> None:
+    """Подключает логгер к очереди записи и задает его уровень."""
+    _file_router.add_module(logger.name)
+    logger.addHandler(_LazyQueueHandler(_log_queue))
+    default_level = os.getenv("LOG_LEVEL", "DEBUG")
+    logger.setLevel(os.getenv(f"LOG_LEVEL_{logger.name.upper()}", default_level))
+
+
+def set_log_level(name: str, level: Union[int, str]) -> None:
+    """Меняет уровень логирования модуля во время работы."""
+    logging.getLogger(name).setLevel(level)
+
+
+def stop_logging() -> None:
+    """Дописывает в файлы все записи из очереди, закрывает файлы и останавливает фоновый поток."""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+        for name in _module_names:
+            logger = logging.getLogger(name)
+            for handler in [handler for handler in logger.handlers if isinstance(handler, _LazyQueueHandler)]:
+                logger.removeHandler(handler)
+        _file_router.close()
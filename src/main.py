@@ -1,68 +1,235 @@
 import json
+import os
+from contextlib import nullcontext
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Optional, Union
 
-from utils import get_currency_rate, get_stock_prices, read_excel_file
-from views import filter_df_by_date, get_card_sum_cashback, get_greeting, get_topfive_transactions, parse_datetime
+import pandas as pd
+
+from bootstrap import init
+from cube import TransactionCube
+from json_encoders import get_encoder
+from metrics import collect_timings, count, enabled, stage
+from quote_cache import QUOTE_CACHE_PATH, QuoteCache
+from utils import CACHE_DIR, TRANSACTION_SCHEMA, get_currency_rate, get_stock_prices, read_excel_file
+from views import (filter_df_by_date, get_card_sum_cashback, get_card_sum_cashback_batch,
+                   get_card_sum_cashback_from_cube, get_greeting, get_topfive_transactions,
+                   get_topfive_transactions_batch, parse_datetime)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 file_path_xlsx = BASE_DIR / "data" / "operations.xlsx"
 user_settings_path = BASE_DIR / "user_settings.json"
+_quote_cache: Optional[QuoteCache] = None
+# разобранные файлы пользовательских установок: путь -> ((mtime_ns, размер), установки)
+_settings_cache: dict[Path, tuple[tuple[int, int], dict[str, Any]]] = {}
+
+
+def get_quote_cache() -> QuoteCache:
+    """Возвращает общий кеш котировок, при первом обращении загружая его с диска.
 
+    Просроченные котировки обновляются до ответа: фоновое обновление main не пережило бы завершения процесса.
+    Сервер включает фоновое обновление (см. server.serve).
+    """
+    global _quote_cache
+    if _quote_cache is None:
+        _quote_cache = QuoteCache(store_path=QUOTE_CACHE_PATH, background_refresh=False)
+    return _quote_cache
 
-def main(date_time_str: str) -> str:
-    """Главная функция, возвращающая JSON-ответ с приветствием и исходной датой."""
+
+def get_dashboard_data(df: pd.DataFrame, dt: datetime, cube: Optional[TransactionCube] = None) -> dict[str, Any]:
+    """Формирует часть ответа для страницы «Главная», зависящую от операций: приветствие, карты и топ-5.
+
+    Если передан куб, суммы по картам берутся из него.
+    """
     # приветствие пользователя
-    dt = parse_datetime(date_time_str)
     greeting = get_greeting(dt.hour)
 
-    # извлечение отфильтрованной по датам информации из файла
-    df = read_excel_file(file_path_xlsx)
-    date_filtered_df = filter_df_by_date(df, dt)
+    # извлечение отфильтрованной по датам информации
+    with stage("filter_by_date"):
+        date_filtered_df = filter_df_by_date(df, dt)
+    if enabled():
+        # для SqliteTransactions len - запрос COUNT(*) к базе, поэтому без сбора метрик он не выполняется
+        count("rows_scanned", len(date_filtered_df))
 
     # суммирование операций и кешбэка по картам
-    summary_df = get_card_sum_cashback(date_filtered_df)
-    cards_data = [
+    with stage("card_summary"):
+        if cube is None:
+            summary_df = get_card_sum_cashback(date_filtered_df)
+        else:
+            summary_df = get_card_sum_cashback_from_cube(cube, dt)
+        cards = get_cards_data(summary_df)
+
+    # топ 5 операций по сумме
+    with stage("top_transactions"):
+        top_transactions = get_top_data(get_topfive_transactions(date_filtered_df))
+    return {"greeting": greeting, "cards": cards, "top_transactions": top_transactions}
+
+
+def get_cards_data(summary_df: pd.DataFrame) -> list[dict[str, Any]]:
+    """Формирует список данных по картам для JSON-ответа."""
+    return _records(
         {
-            "last_digits": row["last_digits"],
-            "total_spent": round(row["total_spent"], 2),
-            "cashback": round(row["cashback"], 2),
+            "last_digits": summary_df["last_digits"].tolist(),
+            "total_spent": _round_values(summary_df["total_spent"]),
+            "cashback": _round_values(summary_df["cashback"]),
         }
-        for index, row in summary_df.iterrows()
-    ]
+    )
 
-    # топ 5 операций по сумме
-    topfive_df = get_topfive_transactions(date_filtered_df)
-    topfive_transactions = [
+
+def get_top_data(topfive_df: pd.DataFrame) -> list[dict[str, Any]]:
+    """Формирует список топ-транзакций для JSON-ответа."""
+    return _records(
         {
-            "date": row["Дата операции"].strftime("%d.%m.%Y"),
-            "amount": round(row["Сумма операции с округлением"], 2),
-            "category": row["Категория"],
-            "description": row["Описание"],
+            "date": topfive_df["Дата операции"].dt.strftime("%d.%m.%Y").tolist(),
+            "amount": _round_values(topfive_df["Сумма операции с округлением"]),
+            "category": topfive_df["Категория"].tolist(),
+            "description": topfive_df["Описание"].tolist(),
         }
-        for index, row in topfive_df.iterrows()
-    ]
+    )
+
+
+def _round_values(column: pd.Series, digits: int = 2) -> list:
+    """Значения столбца, округленные встроенной round: np.round округляет иначе и меняет ответ."""
+    return [round(value, digits) for value in column.tolist()]
+
+
+def _records(columns: dict[str, list]) -> list[dict[str, Any]]:
+    """Собирает записи ответа из списков значений столбцов."""
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def read_user_settings(settings_path: Path) -> dict[str, Any]:
+    """Читает пользовательские установки валют и акций."""
+    with open(settings_path, "r") as file:
+        parsed_user_settings: dict[str, Any] = json.load(file)
+    return parsed_user_settings
+
+
+def load_user_settings(settings_path: Path) -> dict[str, Any]:
+    """Возвращает пользовательские установки, разбирая файл заново только при изменении его mtime или размера.
+
+    Словарь установок общий для всех вызовов, изменять его нельзя.
+    """
+    stat = os.stat(settings_path)
+    cached = _settings_cache.get(settings_path)
+    if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+    parsed_user_settings = read_user_settings(settings_path)
+    _settings_cache[settings_path] = ((stat.st_mtime_ns, stat.st_size), parsed_user_settings)
+    return parsed_user_settings
 
-    # чтение пользовательских установок валют и акций
-    with open(user_settings_path, "r") as file:
-        parsed_user_settings = json.load(file)
-    user_currencies = parsed_user_settings["user_currencies"]
-    user_stocks = parsed_user_settings["user_stocks"]
 
+def get_quotes(user_settings: dict[str, Any]) -> dict[str, Any]:
+    """Получает курсы валют и стоимость акций из пользовательских установок."""
     # получение курсов валют
-    currency_rates = get_currency_rate(user_currencies)
+    quote_cache = get_quote_cache()
+    with stage("currency_rates"):
+        currency_rates = get_currency_rate(user_settings["user_currencies"], cache=quote_cache, batch=True)
 
     # получение стоимости акций из S&P500
-    stock_prices = get_stock_prices(user_stocks)
-
-    # формирование ответа
-    response = {
-        "greeting": greeting,
-        "cards": cards_data,
-        "top_transactions": topfive_transactions,
-        "currency_rates": currency_rates,
-        "stock_prices": stock_prices,
-    }
-    return json.dumps(response, indent=4, ensure_ascii=False)
+    with stage("stock_prices"):
+        stock_prices = get_stock_prices(user_settings["user_stocks"], cache=quote_cache)
+    return {"currency_rates": currency_rates, "stock_prices": stock_prices}
+
+
+def main(date_time_str: str, timings: bool = False, compact: bool = False, encoder: str = "json") -> str:
+    """Главная функция, возвращающая JSON-ответ с приветствием и исходной датой.
+
+    При timings=True в ответ добавляется блок "_timings" с длительностями этапов и счетчиками.
+    compact=True убирает отступы из JSON, encoder задает кодировщик из json_encoders.ENCODERS.
+    """
+    init()
+    encode = get_encoder(encoder)
+    with collect_timings() if timings else nullcontext() as collected:
+        dt = parse_datetime(date_time_str)
+
+        # извлечение информации из файла: в кеше хранится DataFrame в каноническом виде
+        with stage("read_excel"):
+            df = read_excel_file(file_path_xlsx, cache_dir=CACHE_DIR, schema=TRANSACTION_SCHEMA, prepared=True)
+        count("rows_loaded", len(df))
+
+        # чтение пользовательских установок валют и акций
+        with stage("read_settings"):
+            parsed_user_settings = load_user_settings(user_settings_path)
+
+        # формирование ответа
+        response = {**get_dashboard_data(df, dt), **get_quotes(parsed_user_settings)}
+        with stage("json"):
+            result: str = encode(response, compact)
+    if collected is None:
+        return result
+    response["_timings"] = collected.as_dict()
+    result = encode(response, compact)
+    return result
+
+
+def main_batch(date_time_strs: list[str], compact: bool = False, encoder: str = "json") -> list[str]:
+    """Возвращает JSON-ответы главной функции для списка дат, обрабатывая операции за один проход.
+
+    Файл операций, пользовательские установки и котировки читаются один раз на весь пакет.
+    compact и encoder - как в main.
+    """
+    init()
+    encode = get_encoder(encoder)
+    dts = [parse_datetime(date_time_str) for date_time_str in date_time_strs]
+    df = read_excel_file(file_path_xlsx, cache_dir=CACHE_DIR, schema=TRANSACTION_SCHEMA, prepared=True)
+    quotes = get_quotes(load_user_settings(user_settings_path))
+    return [encode({**dashboard, **quotes}, compact) for dashboard in _get_dashboard_batch(df, dts)]
+
+
+def main_multi_user(
+    requests: list[tuple[Union[Path, dict[str, Any]], str]], compact: bool = False, encoder: str = "json"
+) -> list[str]:
+    """Возвращает JSON-ответы главной функции для запросов многих пользователей: (установки, дата и время).
+
+    Установки - путь к файлу (разбирается один раз, см. load_user_settings) или уже разобранный словарь.
+    Ответ каждому пользователю совпадает с ответом main для его установок, но котировки запрашиваются
+    один раз для объединения валют и акций всех пользователей, а часть ответа по операциям
+    считается один раз для каждой различной даты. compact и encoder - как в main.
+    """
+    init()
+    encode = get_encoder(encoder)
+    users_settings = [
+        settings if isinstance(settings, dict) else load_user_settings(settings) for settings, _ in requests
+    ]
+    dts = [parse_datetime(date_time_str) for _, date_time_str in requests]
+    df = read_excel_file(file_path_xlsx, cache_dir=CACHE_DIR, schema=TRANSACTION_SCHEMA, prepared=True)
+    unique_dts = list(dict.fromkeys(dts))
+    dashboards = dict(zip(unique_dts, _get_dashboard_batch(df, unique_dts)))
+
+    # объединение валют и акций всех пользователей с сохранением порядка первого упоминания
+    all_currencies = dict.fromkeys(currency for settings in users_settings for currency in settings["user_currencies"])
+    all_stocks = dict.fromkeys(symbol for settings in users_settings for symbol in settings["user_stocks"])
+    count("quote_symbols", len(all_currencies) + len(all_stocks))
+    quotes = get_quotes({"user_currencies": list(all_currencies), "user_stocks": list(all_stocks)})
+    currency_rates = {rate["currency"]: rate for rate in quotes["currency_rates"]}
+    stock_prices = {price["stock"]: price for price in quotes["stock_prices"]}
+
+    responses = []
+    for dt, settings in zip(dts, users_settings):
+        user_quotes = {
+            "currency_rates": [currency_rates[currency] for currency in settings["user_currencies"]],
+            # акции без данных пропускаются, как в get_stock_prices
+            "stock_prices": [stock_prices[symbol] for symbol in settings["user_stocks"] if symbol in stock_prices],
+        }
+        responses.append(encode({**dashboards[dt], **user_quotes}, compact))
+    return responses
+
+
+def _get_dashboard_batch(df: pd.DataFrame, dts: list[datetime]) -> list[dict[str, Any]]:
+    """Части ответов, зависящие от операций, для списка дат за один проход по операциям."""
+    summaries = get_card_sum_cashback_batch(df, dts)
+    topfives = get_topfive_transactions_batch(df, dts)
+    return [
+        {
+            "greeting": get_greeting(dt.hour),
+            "cards": get_cards_data(summary_df),
+            "top_transactions": get_top_data(topfive_df),
+        }
+        for dt, summary_df, topfive_df in zip(dts, summaries, topfives)
+    ]
 
 
 if __name__ == "__main__":
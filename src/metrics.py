@@ -0,0 +1,160 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, ContextManager, Iterator, Optional
+
+# пустой контекст для выключенных измерений: этапы не оборачиваются ничем, кроме него
+_DISABLED_STAGE = nullcontext()
+
+
+class MetricsSink:
+    """Приемник метрик: счетчики и наблюдения (длительности этапов). Базовая реализация ничего не делает."""
+
+    def increment(self, name: str, value: float = 1, labels: Optional[dict[str, str]] = None) -> None:
+        """Увеличивает счетчик name на value."""
+
+    def observe(self, name: str, value: float, labels: Optional[dict[str, str]] = None) -> None:
+        """Добавляет наблюдение value в сводку name."""
+
+
+class MetricsRegistry(MetricsSink):
+    """Реестр метрик в памяти процесса с выгрузкой в текстовом формате Prometheus."""
+
+    def __init__(self) -> None:
+        self._counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        self._summaries: dict[tuple[str, tuple[tuple[str, str], ...]], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, labels: Optional[dict[str, str]] = None) -> None:
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[dict[str, str]] = None) -> None:
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            summary = self._summaries.setdefault(key, [0, 0.0])
+            summary[0] += 1
+            summary[1] += value
+
+    def counter_value(self, name: str, labels: Optional[dict[str, str]] = None) -> float:
+        """Текущее значение счетчика."""
+        return self._counters.get((name, tuple(sorted((labels or {}).items()))), 0)
+
+    def export_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus: счетчики - counter, длительности - summary (_count и _sum)."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            summaries = sorted(self._summaries.items())
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {name} counter")
+                declared.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), (count, total) in summaries:
+            if name not in declared:
+                lines.append(f"# TYPE {name} summary")
+                declared.add(name)
+            lines.append(f"{name}_count{_format_labels(labels)} {count:g}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+class Timings:
+    """Длительности этапов и счетчики одного запроса (блок "_timings" ответа)."""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+        self.counters: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_count(self, name: str, value: float) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self) -> dict[str, Any]:
+        """Длительности этапов в миллисекундах и значения счетчиков."""
+        with self._lock:
+            stages_ms = {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()}
+            return {"stages_ms": stages_ms, "counters": dict(self.counters)}
+
+
+_sink: Optional[MetricsSink] = None
+_current_timings: ContextVar[Optional[Timings]] = ContextVar("current_timings", default=None)
+
+
+def set_sink(sink: Optional[MetricsSink]) -> None:
+    """Подключает приемник метрик для всего процесса (None - отключает)."""
+    global _sink
+    _sink = sink
+
+
+def get_sink() -> Optional[MetricsSink]:
+    """Подключенный приемник метрик."""
+    return _sink
+
+
+@contextmanager
+def collect_timings() -> Iterator[Timings]:
+    """Собирает длительности этапов и счетчики кода внутри блока, включая потоки fetch_concurrently."""
+    timings = Timings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def enabled() -> bool:
+    """Собираются ли метрики: подключен приемник или собираются длительности текущего запроса.
+
+    Позволяет не вычислять значение счетчика (например, число строк в базе), когда метрики выключены.
+    """
+    return _sink is not None or _current_timings.get() is not None
+
+
+def stage(name: str) -> ContextManager:
+    """Контекст, измеряющий длительность этапа; без приемника и сбора длительностей ничего не измеряет."""
+    if not enabled():
+        return _DISABLED_STAGE
+    return _measure_stage(name)
+
+
+@contextmanager
+def _measure_stage(name: str) -> Iterator[None]:
+    timings = _current_timings.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if timings is not None:
+            timings.add_stage(name, elapsed)
+        if _sink is not None:
+            _sink.observe("stage_seconds", elapsed, {"stage": name})
+
+
+def count(name: str, value: float = 1) -> None:
+    """Увеличивает счетчик name (строки, попадания в кеш, запросы к API) текущего запроса и приемника."""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add_count(name, value)
+    if _sink is not None:
+        _sink.increment(f"{name}_total", value)
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    """Метки в формате Prometheus: {name="value",...}."""
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar, cast
+
+from log_config import get_logger
+from metrics import count
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+logger = get_logger("quote_cache")
+
+# время жизни котировок по источникам, в секундах
+DEFAULT_TTLS = {"currency": 60 * 60, "stock": 5 * 60}
+DEFAULT_MAX_ENTRIES = 1024
+QUOTE_CACHE_PATH = BASE_DIR / ".cache" / "quotes.json"
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """Выполняющийся запрос к внешнему API, результат которого ждут все одинаковые запросы."""
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class QuoteCache:
+    """Кеш котировок с TTL по источникам, LRU-вытеснением и необязательным хранением на диске.
+
+    При background_refresh=True (долгоживущий сервер) просроченное значение отдается сразу, а обновление
+    выполняется в фоновом потоке (stale-while-revalidate). При background_refresh=False (однократный запуск,
+    после которого фоновый поток был бы остановлен вместе с процессом) просроченное значение обновляется
+    сразу, а прежнее отдается, только если обновить его не удалось.
+    Одновременные одинаковые запросы объединяются в один запрос к API.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[dict[str, float]] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        store_path: Optional[Path] = None,
+        background_refresh: bool = True,
+    ) -> None:
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_entries = max_entries
+        self.store_path = store_path
+        self.background_refresh = background_refresh
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "upstream_calls": 0}
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._flights: dict[str, _Flight] = {}
+        self._refresh_threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._load()
+
+    def get(self, source: str, key: str, loader: Callable[[], T]) -> T:
+        """Возвращает котировку из кеша или загружает ее с помощью loader.
+
+        Результат None и исключения loader не кешируются.
+        """
+        cache_key = f"{source}:{key}"
+        # просроченное значение, которое отдается, если синхронно обновить его не удалось
+        stale: Optional[tuple[Any]] = None
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                value, stored_at = entry
+                if time.time() - stored_at < self.ttls.get(source, 0):
+                    self.stats["hits"] += 1
+                    count("quote_cache_hits")
+                    return cast(T, value)
+                self.stats["stale_hits"] += 1
+                count("quote_cache_stale_hits")
+                if self.background_refresh:
+                    if cache_key not in self._flights:
+                        self._start_refresh(cache_key, loader)
+                    return cast(T, value)
+                stale = (value,)
+            else:
+                self.stats["misses"] += 1
+                count("quote_cache_misses")
+            flight = self._flights.get(cache_key)
+            is_leader = flight is None
+            if flight is None:
+                flight = self._flights[cache_key] = _Flight()
+        if is_leader:
+            self._run(cache_key, loader, flight)
+        else:
+            flight.event.wait()
+        if stale is not None and (flight.error is not None or flight.value is None):
+            return cast(T, stale[0])
+        if flight.error is not None:
+            raise flight.error
+        return cast(T, flight.value)
+
+    def wait_for_refreshes(self, timeout: Optional[float] = None) -> None:
+        """Ожидает завершения фоновых обновлений просроченных значений."""
+        with self._lock:
+            threads, self._refresh_threads = self._refresh_threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def _start_refresh(self, cache_key: str, loader: Callable[[], Any]) -> None:
+        """Запускает фоновое обновление просроченного значения, вызывается под блокировкой."""
+        flight = self._flights[cache_key] = _Flight()
+        thread = threading.Thread(target=self._run, args=(cache_key, loader, flight), daemon=True)
+        # завершившиеся потоки удаляются, чтобы список не рос в долгоживущем сервере
+        self._refresh_threads = [running for running in self._refresh_threads if running.is_alive()]
+        self._refresh_threads.append(thread)
+        thread.start()
+        logger.debug("Запущено фоновое обновление котировки %s", cache_key)
+
+    def _run(self, cache_key: str, loader: Callable[[], Any], flight: _Flight) -> None:
+        """Загружает значение, сохраняет его в кеш и оповещает ожидающие запросы."""
+        try:
+            with self._lock:
+                self.stats["upstream_calls"] += 1
+            flight.value = loader()
+            if flight.value is not None:
+                self._store(cache_key, flight.value)
+        except BaseException as e:
+            flight.error = e
+            logger.error("Исключение %s. Не удалось обновить котировку %s.", e, cache_key)
+        finally:
+            with self._lock:
+                self._flights.pop(cache_key, None)
+            flight.event.set()
+
+    def _store(self, cache_key: str, value: Any) -> None:
+        """Сохраняет значение в кеш, вытесняя давно не использованные записи."""
+        with self._lock:
+            self._entries[cache_key] = (value, time.time())
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                logger.debug("Котировка %s вытеснена из кеша", evicted_key)
+            if self.store_path is not None:
+                self._save()
+
+    def _load(self) -> None:
+        """Загружает записи кеша с диска."""
+        if self.store_path is None or not self.store_path.exists():
+            return
+        try:
+            with open(self.store_path, "r", encoding="utf-8") as file:
+                stored = json.load(file)
+            for cache_key, entry in stored.items():
+                self._entries[cache_key] = (entry["value"], entry["stored_at"])
+            logger.info("Из файла %s загружено котировок: %s", self.store_path, len(self._entries))
+        except Exception as e:
+            logger.error("Исключение %s. Не удалось прочитать кеш котировок %s.", e, self.store_path)
+
+    def _save(self) -> None:
+        """Атомарно записывает кеш на диск, вызывается под блокировкой."""
+        if self.store_path is None:
+            return
+        stored = {key: {"value": value, "stored_at": stored_at} for key, (value, stored_at) in self._entries.items()}
+        self.store_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.store_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(stored, file, ensure_ascii=False)
+        os.replace(tmp_path, self.store_path)
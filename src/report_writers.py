@@ -0,0 +1,118 @@
+import atexit
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+import pandas as pd
+
+from log_config import get_logger
+
+logger = get_logger("report_writers")
+
+ReportWriter = Callable[[pd.DataFrame, Union[str, Path]], None]
+
+# максимальное число отчетов, ожидающих записи в фоне; при заполнении очереди декоратор ждет
+BACKGROUND_QUEUE_SIZE = 8
+# число строк, которое потоковый писатель xlsx берет из DataFrame за один раз
+STREAM_CHUNK_ROWS = 10_000
+
+
+def write_excel(df: pd.DataFrame, path: Union[str, Path]) -> None:
+    """Записывает отчет в xlsx через DataFrame.to_excel."""
+    df.to_excel(path, index=False)
+
+
+def write_excel_streaming(df: pd.DataFrame, path: Union[str, Path]) -> None:
+    """Записывает отчет в xlsx построчно (openpyxl write-only), не создавая объекты ячеек для всего листа."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([str(column) for column in df.columns])
+    for start in range(0, len(df), STREAM_CHUNK_ROWS):
+        stop = start + STREAM_CHUNK_ROWS
+        chunk = df.iloc[start:stop].astype(object)
+        for row in chunk.where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def write_csv(df: pd.DataFrame, path: Union[str, Path]) -> None:
+    """Записывает отчет в CSV (UTF-8 с BOM, чтобы Excel правильно открывал кириллицу)."""
+    df.to_csv(path, index=False, encoding="utf-8-sig")
+
+
+def write_parquet(df: pd.DataFrame, path: Union[str, Path]) -> None:
+    """Записывает отчет в Parquet, требуется установленный pyarrow или fastparquet."""
+    df.to_parquet(path, index=False)
+
+
+WRITERS: dict[str, ReportWriter] = {
+    "excel": write_excel,
+    "excel_stream": write_excel_streaming,
+    "csv": write_csv,
+    "parquet": write_parquet,
+}
+WRITER_SUFFIXES = {"excel": ".xlsx", "excel_stream": ".xlsx", "csv": ".csv", "parquet": ".parquet"}
+
+
+def get_writer(name: str) -> ReportWriter:
+    """Возвращает функцию записи отчета по имени формата."""
+    if name not in WRITERS:
+        raise ValueError(f"Неизвестный формат отчета: {name}")
+    return WRITERS[name]
+
+
+class BackgroundWriter:
+    """Фоновый поток, записывающий отчеты из ограниченной очереди.
+
+    submit ставит отчет в очередь и сразу возвращает управление (или ждет, если очередь заполнена),
+    flush дожидается записи всех поставленных отчетов.
+    """
+
+    def __init__(self, max_queued: int = BACKGROUND_QUEUE_SIZE) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._pending = 0
+        self._thread: Optional[threading.Thread] = None
+        self.errors: list[tuple[Path, Exception]] = []
+
+    def submit(self, writer: ReportWriter, df: pd.DataFrame, path: Union[str, Path]) -> None:
+        """Ставит отчет в очередь на запись."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+                self._thread.start()
+        with self._idle:
+            self._pending += 1
+        self._queue.put((writer, df, Path(path)))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Ждет записи всех отчетов из очереди; возвращает False, если время ожидания истекло."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _run(self) -> None:
+        while True:
+            writer, df, path = self._queue.get()
+            try:
+                writer(df, path)
+                logger.debug("Отчет сохранен в файл: %s", path)
+            except Exception as e:
+                self.errors.append((path, e))
+                logger.error("Исключение %s. Не удалось сохранить отчет в файл %s.", e, path)
+            finally:
+                with self._idle:
+                    self._pending -= 1
+                    self._idle.notify_all()
+
+
+background_writer = BackgroundWriter()
+atexit.register(background_writer.flush)
+
+
+def flush_reports(timeout: Optional[float] = None) -> bool:
+    """Ждет записи всех отчетов, поставленных в очередь декораторами в фоновом режиме."""
+    return background_writer.flush(timeout)
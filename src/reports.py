@@ -1,52 +1,79 @@
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from functools import wraps
+from multiprocessing import shared_memory
 from pathlib import Path
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Iterable, Optional, Union
 
+import numpy as np
 import pandas as pd
 from dateutil.relativedelta import relativedelta
 
+from cube import TransactionCube
+from log_config import get_logger
+from report_writers import WRITER_SUFFIXES, background_writer, get_writer
+from rolling import RollingSpend
+from services import get_process_context
+from sqlite_store import SqliteTransactions
+from utils import select_date_range
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-file_rep_name = BASE_DIR / f"report_3month_category_{current_time}.xlsx"
+logger = get_logger("reports")
 
-file_path_log = BASE_DIR / "logs" / "reports.log"
-logger = logging.getLogger("reports")
-logger.setLevel(logging.DEBUG)
-file_handler = logging.FileHandler(file_path_log, mode="w", encoding="utf-8")
-file_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s: %(message)s")
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
+# начиная с этого числа пар (категория, дата) отчеты строятся в нескольких процессах
+BULK_PARALLEL_THRESHOLD = 256
 
+# столбцы дат и кодов категорий, подключенные рабочим процессом из разделяемой памяти
+_shared_columns: dict[str, Any] = {}
 
-def save_report_to_file_no_filename_input(func: Callable[..., pd.DataFrame]) -> Callable:
-    """Декоратор для сохранения отчета в файл с автоматически сгенерированным именем."""
 
-    @wraps(func)
-    def wrapper(*args: Any, **kwargs: Any) -> pd.DataFrame:
-        result = func(*args, **kwargs)
-        current_time_auto = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_file = f"{func.__name__}_report_{current_time_auto}.xlsx"
-        result.to_excel(report_file, index=False)
-        logger.debug(f"Отчет сохранен в файл: {report_file}")
-        print(f"Отчет сохранен в файл: {report_file}")
-        return result
+def report_file_name() -> Path:
+    """Имя файла для отчета по категории за три месяца с текущими датой и временем."""
+    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return BASE_DIR / f"report_3month_category_{current_time}.xlsx"
+
+
+def save_report_to_file_no_filename_input(
+    func: Optional[Callable[..., pd.DataFrame]] = None, *, writer: str = "excel", background: bool = False
+) -> Callable:
+    """Декоратор для сохранения отчета в файл с автоматически сгенерированным именем.
+
+    Применяется без параметров или с параметрами writer (формат: excel, excel_stream, csv, parquet)
+    и background (запись в фоновом потоке, см. report_writers.flush_reports).
+    """
+    get_writer(writer)
+
+    def decorator(func: Callable[..., pd.DataFrame]) -> Callable:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> pd.DataFrame:
+            result = func(*args, **kwargs)
+            current_time_auto = datetime.now().strftime("%Y%m%d_%H%M%S")
+            report_file = f"{func.__name__}_report_{current_time_auto}{WRITER_SUFFIXES[writer]}"
+            _save_report(result, report_file, writer, background)
+            return result
+
+        return wrapper
+
+    return decorator if func is None else decorator(func)
 
-    return wrapper
 
+def save_report_to_file_with_filename_input(
+    file_name: Path, writer: str = "excel", background: bool = False
+) -> Callable:
+    """Параметризуемый декоратор для сохранения отчета в файл, получает на вход имя файла.
 
-def save_report_to_file_with_filename_input(file_name: Path) -> Callable:
-    """Параметризуемый декоратор для сохранения отчета в файл, получает на вход имя файла."""
+    Параметры writer и background - как в save_report_to_file_no_filename_input.
+    """
+    get_writer(writer)
 
     def decorator(func: Callable[..., pd.DataFrame]) -> Callable:
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> pd.DataFrame:
             result = func(*args, **kwargs)
-            result.to_excel(file_name, index=False)
-            logger.debug(f"Отчет сохранен в файл: {file_name}")
-            print(f"Отчет сохранен в файл: {file_name}")
+            _save_report(result, file_name, writer, background)
             return result
 
         return wrapper
@@ -54,32 +81,229 @@ def save_report_to_file_with_filename_input(file_name: Path) -> Callable:
     return decorator
 
 
+def _save_report(result: pd.DataFrame, report_file: Union[str, Path], writer: str, background: bool) -> None:
+    """Сохраняет отчет сразу или ставит копию отчета в очередь фоновой записи."""
+    if background:
+        background_writer.submit(get_writer(writer), result.copy(), report_file)
+        logger.debug("Отчет поставлен в очередь на запись в файл: %s", report_file)
+        print(f"Отчет поставлен в очередь на запись в файл: {report_file}")
+    else:
+        get_writer(writer)(result, report_file)
+        logger.debug("Отчет сохранен в файл: %s", report_file)
+        print(f"Отчет сохранен в файл: {report_file}")
+
+
 # @save_report_to_file_no_filename_input # применение декоратора без параметра с автогенерацией имени файла
-# @save_report_to_file_with_filename_input(file_rep_name) # применение декоратора с параметром - имя файла для отчета
-def spending_by_category(transactions: pd.DataFrame, category: str, input_date: Optional[str] = None) -> pd.DataFrame:
-    """Возвращает траты по заданной категории за последние три месяца (от переданной даты)."""
-    df_copy = transactions.copy()
-    df_copy["Дата операции"] = pd.to_datetime(df_copy["Дата операции"], format="%d.%m.%Y %H:%M:%S")
-    if input_date is None:
-        use_date = datetime.now()
+# @save_report_to_file_with_filename_input(report_file_name()) # применение декоратора с параметром - имя файла
+def spending_by_category(
+    transactions: Union[pd.DataFrame, Iterable[pd.DataFrame], SqliteTransactions],
+    category: str,
+    input_date: Optional[str] = None,
+) -> pd.DataFrame:
+    """Возвращает траты по заданной категории за последние три месяца (от переданной даты).
+
+    Принимает DataFrame или итератор порций DataFrame, в памяти накапливаются только отобранные строки.
+    Для SqliteTransactions строки отбираются в базе по индексу (категория, дата).
+    """
+    start_date, use_date = _report_period(input_date)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Определен диапазон дат %s - %s для фильтрации по категории %s",
+            start_date.strftime("%d.%m.%Y"),
+            use_date.strftime("%d.%m.%Y"),
+            category,
+        )
+    if isinstance(transactions, pd.DataFrame):
+        filtered_transactions = _filter_spending(transactions, category, start_date, use_date)
+    elif isinstance(transactions, SqliteTransactions):
+        filtered_transactions = transactions.date_range(start_date, use_date).select_category(category)
     else:
-        use_date = datetime.strptime(input_date, "%d.%m.%Y")
-    start_date = use_date - relativedelta(months=3)
-    start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    logger.debug(
-        f"Определен диапазон дат {start_date.strftime('%d.%m.%Y')} - {use_date.strftime('%d.%m.%Y')} "
-        f"для фильтрации по категории {category}"
-    )
-    filtered_transactions = df_copy[
-        (df_copy["Дата операции"] >= start_date)
-        & (df_copy["Дата операции"] <= use_date)
-        & (df_copy["Категория"] == category)
-    ]
+        filtered_chunks = [_filter_spending(chunk, category, start_date, use_date) for chunk in transactions]
+        if filtered_chunks:
+            filtered_transactions = pd.concat(filtered_chunks)
+        else:
+            filtered_transactions = pd.DataFrame(columns=["Дата операции", "Категория"])
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "DataFrame отфильтрован по датам %s - %s и категории %s",
+            start_date.strftime("%d.%m.%Y"),
+            use_date.strftime("%d.%m.%Y"),
+            category,
+        )
+    return filtered_transactions
+
+
+def spending_totals_by_category(cube: TransactionCube, input_date: Optional[str] = None) -> pd.DataFrame:
+    """Возвращает суммы и количество трат по каждой категории за последние три месяца по предагрегированному кубу.
+
+    Диапазон дат тот же, что и в spending_by_category.
+    """
+    start_date, use_date = _report_period(input_date)
+    totals = cube.category_totals(start_date, use_date)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Суммы трат по категориям за период %s - %s посчитаны по кубу",
+            start_date.strftime("%d.%m.%Y"),
+            use_date.strftime("%d.%m.%Y"),
+        )
+    return totals.rename(columns={"total": "total_spent", "count": "operations_count"})
+
+
+def spending_by_category_bulk(
+    transactions: Union[pd.DataFrame, SqliteTransactions],
+    requests: Iterable[tuple[str, Optional[str]]],
+    workers: Optional[int] = None,
+) -> list[pd.DataFrame]:
+    """Возвращает траты для многих пар (категория, дата) - то же, что spending_by_category для каждой пары.
+
+    Для DataFrame в каноническом виде (см. utils.prepare_transactions) строки отбираются по датам и кодам категорий.
+    Начиная с BULK_PARALLEL_THRESHOLD пар работа распределяется по процессам (workers, по умолчанию - по числу ядер):
+    процессы читают столбцы из разделяемой памяти, а возвращают только позиции отобранных строк.
+    Для SqliteTransactions каждый отчет строится отдельным запросом к базе.
+    """
+    requests = list(requests)
+    if isinstance(transactions, SqliteTransactions):
+        return [spending_by_category(transactions, category, input_date) for category, input_date in requests]
+    index = transactions.index
+    if not (isinstance(index, pd.DatetimeIndex) and index.is_monotonic_increasing):
+        logger.debug("DataFrame не отсортирован по дате, отчеты строятся по одному")
+        return [spending_by_category(transactions, category, input_date) for category, input_date in requests]
+
+    categories = pd.Categorical(transactions["Категория"])
+    category_codes = {category: code for code, category in enumerate(categories.categories)}
+    tasks = []
+    for category, input_date in requests:
+        start_date, use_date = _report_period(input_date)
+        tasks.append((category_codes.get(category, -2), pd.Timestamp(start_date).value, pd.Timestamp(use_date).value))
+    columns = {"dates": index.asi8, "codes": categories.codes}
+
+    workers = workers or os.cpu_count() or 1
+    if len(tasks) < BULK_PARALLEL_THRESHOLD or workers < 2:
+        positions = _select_positions(columns, tasks)
+    else:
+        positions = _select_positions_parallel(columns, tasks, workers)
+    logger.info("Построены отчеты по категориям для %s пар (категория, дата)", len(tasks))
+    return [transactions.iloc[row_positions] for row_positions in positions]
+
+
+def rolling_spending_by_category(
+    transactions: Union[pd.DataFrame, RollingSpend],
+    input_dates: Optional[Iterable[str]] = None,
+    months: int = 3,
+    days: int = 0,
+) -> pd.DataFrame:
+    """Возвращает суммы трат по каждой категории за окно [дата - months месяцев - days дней, дата] для многих дат.
+
+    Строки - даты input_dates (по умолчанию - конец каждого дня выписки), столбцы - категории.
+    При months=3 и days=0 сумма по категории совпадает с суммой трат, которые вернет spending_by_category.
+    Для многих вызовов по одним и тем же операциям передайте заранее построенный RollingSpend.
+    """
+    rolling = transactions if isinstance(transactions, RollingSpend) else RollingSpend(transactions)
+    anchors = None if input_dates is None else [datetime.strptime(date, "%d.%m.%Y") for date in input_dates]
+    totals = rolling.rolling_totals(anchors, months=months, days=days)
     logger.info(
-        f"DataFrame отфильтрован по датам {start_date.strftime('%d.%m.%Y')} - {use_date.strftime('%d.%m.%Y')}"
-        f"и категории {category}"
+        "Суммы трат по категориям за окно %s мес. %s дн. посчитаны для %s дат", months, days, len(totals.index)
     )
-    return filtered_transactions
+    return totals
+
+
+def _report_period(input_date: Optional[str]) -> tuple[datetime, datetime]:
+    """Диапазон дат отчета: три месяца до переданной даты (по умолчанию - до текущего момента)."""
+    use_date = datetime.now() if input_date is None else datetime.strptime(input_date, "%d.%m.%Y")
+    start_date = (use_date - relativedelta(months=3)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start_date, use_date
+
+
+def _match_positions(columns: dict[str, np.ndarray], task: tuple[int, int, int]) -> np.ndarray:
+    """Позиции строк с заданным кодом категории и датой в диапазоне [начало, конец]."""
+    code, start, end = task
+    dates = columns["dates"]
+    start_pos = int(np.searchsorted(dates, start, side="left"))
+    end_pos = int(np.searchsorted(dates, end, side="right"))
+    return start_pos + np.flatnonzero(columns["codes"][start_pos:end_pos] == code)
+
+
+def _select_positions(columns: dict[str, np.ndarray], tasks: list[tuple[int, int, int]]) -> list[np.ndarray]:
+    """Позиции отобранных строк для каждой задачи."""
+    return [_match_positions(columns, task) for task in tasks]
+
+
+def _select_positions_parallel(
+    columns: dict[str, np.ndarray], tasks: list[tuple[int, int, int]], workers: int
+) -> list[np.ndarray]:
+    """Распределяет задачи по процессам, данные передаются через разделяемую память.
+
+    Каждый процесс за один проход отбирает позиции строк по своим задачам и записывает их в новый блок
+    разделяемой памяти, возвращая только имя блока и число строк по задачам, так что ни столбцы,
+    ни результаты не сериализуются.
+    """
+    blocks: dict[str, shared_memory.SharedMemory] = {}
+    try:
+        for name, values in columns.items():
+            blocks[name] = _share_array(values)
+        layout = {name: (blocks[name].name, values.shape, values.dtype.str) for name, values in columns.items()}
+        chunk_size = -(-len(tasks) // workers)
+        chunks = []
+        for start in range(0, len(tasks), chunk_size):
+            stop = start + chunk_size
+            chunks.append(tasks[start:stop])
+        # процессы запускаются через forkserver, как в services.detect_phone_numbers
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_process_context(),
+            initializer=_attach_shared_columns,
+            initargs=(layout,),
+        )
+        positions: list[np.ndarray] = []
+        with executor:
+            for block_name, counts in executor.map(_select_shared_positions, chunks):
+                block = blocks[block_name] = shared_memory.SharedMemory(name=block_name)
+                chunk_positions = np.ndarray((sum(counts),), dtype="int64", buffer=block.buf).copy()
+                positions.extend(np.split(chunk_positions, np.cumsum(counts)[:-1]))
+        return positions
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+
+def _share_array(values: np.ndarray) -> shared_memory.SharedMemory:
+    """Копирует массив в новый блок разделяемой памяти."""
+    block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+    return block
+
+
+def _attach_shared_columns(layout: dict[str, tuple[str, tuple[int, ...], str]]) -> None:
+    """Подключает рабочий процесс к столбцам в разделяемой памяти."""
+    for name, (block_name, shape, dtype) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _shared_columns[name] = (block, np.ndarray(shape, dtype=dtype, buffer=block.buf))
+
+
+def _shared_arrays() -> dict[str, np.ndarray]:
+    """Столбцы, подключенные рабочим процессом."""
+    return {name: values for name, (_, values) in _shared_columns.items()}
+
+
+def _select_shared_positions(tasks: list[tuple[int, int, int]]) -> tuple[str, list[int]]:
+    """Отбирает в рабочем процессе позиции строк по задачам и записывает их подряд в новый блок разделяемой памяти.
+
+    Возвращает имя блока (его освобождает основной процесс) и число отобранных строк по каждой задаче.
+    """
+    columns = _shared_arrays()
+    positions = [_match_positions(columns, task) for task in tasks]
+    block = _share_array(np.concatenate(positions) if positions else np.empty(0, dtype="int64"))
+    block.close()
+    return block.name, [len(task_positions) for task_positions in positions]
+
+
+def _filter_spending(
+    transactions: pd.DataFrame, category: str, start_date: datetime, use_date: datetime
+) -> pd.DataFrame:
+    """Отбирает операции заданной категории в диапазоне дат."""
+    date_filtered = select_date_range(transactions, start_date, use_date)
+    return date_filtered[date_filtered["Категория"] == category]
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from log_config import get_logger
+
+logger = get_logger("rolling")
+
+AMOUNT_COLUMN = "Сумма операции с округлением"
+ONE_DAY = pd.Timedelta(days=1)
+ONE_NS = pd.Timedelta(1, unit="ns")
+
+Anchors = Union[Iterable[datetime], pd.DatetimeIndex]
+
+
+class RollingSpend:
+    """Накопленные суммы трат по категориям для сумм за скользящее окно [дата - окно, дата].
+
+    Операции один раз сортируются по (категория, дата) и для них считаются накопленные суммы,
+    после чего сумма по категории за любое окно и для любой даты - два бинарных поиска и вычитание.
+    Начало окна, как в reports.spending_by_category, - начало дня (дата - months месяцев - days дней).
+    """
+
+    def __init__(self, transactions: pd.DataFrame, column: str = AMOUNT_COLUMN) -> None:
+        """Строит накопленные суммы по DataFrame операций (в каноническом виде или с датой-строкой)."""
+        dates = transactions["Дата операции"]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, format="%d.%m.%Y %H:%M:%S")
+        categories = pd.Categorical(transactions["Категория"])
+        amounts = pd.to_numeric(transactions[column], errors="coerce")
+        # суммы накапливаются в копейках, поэтому разность накопленных сумм точная
+        self._scale = 1 if pd.api.types.is_integer_dtype(amounts) else 100
+        scaled_amounts = np.round(amounts.fillna(0).to_numpy(dtype="float64") * self._scale).astype("int64")
+
+        date_values = dates.to_numpy(dtype="datetime64[ns]").astype("int64")
+        codes = categories.codes
+        # операции без категории попадают в начало и не входят ни в один отрезок категорий
+        order = np.lexsort((date_values, codes))
+        self._dates = date_values[order]
+        self._cumulative = np.concatenate([[0], np.cumsum(scaled_amounts[order])])
+        self._offsets = np.searchsorted(codes[order], np.arange(len(categories.categories) + 1), side="left")
+        self.categories: list[str] = list(categories.categories)
+        self._first_date: Optional[pd.Timestamp] = dates.min() if len(dates) else None
+        self._last_date: Optional[pd.Timestamp] = dates.max() if len(dates) else None
+        logger.info("Накопленные суммы построены по %s операциям, категорий: %s", len(order), len(self.categories))
+
+    def window_totals(self, category: str, anchors: Anchors, months: int = 0, days: int = 0) -> pd.Series:
+        """Траты по категории за окно [дата - months месяцев - days дней, дата] для каждой даты anchors."""
+        anchors = pd.DatetimeIndex(anchors)
+        starts, ends = _window_bounds(anchors, months, days)
+        if category in self.categories:
+            totals = self._segment_totals(self.categories.index(category), starts, ends)
+        else:
+            totals = np.zeros(len(anchors), dtype="int64")
+        return pd.Series(self._unscale(totals), index=anchors, name=category)
+
+    def rolling_totals(self, anchors: Optional[Anchors] = None, months: int = 0, days: int = 0) -> pd.DataFrame:
+        """Траты по каждой категории за скользящее окно: строки - даты anchors, столбцы - категории.
+
+        По умолчанию даты - конец каждого дня от первой до последней операции.
+        """
+        if anchors is None:
+            anchors = self._daily_anchors()
+        anchors = pd.DatetimeIndex(anchors)
+        starts, ends = _window_bounds(anchors, months, days)
+        columns = {
+            category: self._unscale(self._segment_totals(code, starts, ends))
+            for code, category in enumerate(self.categories)
+        }
+        return pd.DataFrame(columns, index=anchors, columns=self.categories)
+
+    def _segment_totals(self, code: int, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Суммы по отрезку категории code за диапазоны [starts, ends] в копейках."""
+        low, high = self._offsets[code], self._offsets[code + 1]
+        segment_dates = self._dates[low:high]
+        start_pos = low + np.searchsorted(segment_dates, starts, side="left")
+        end_pos = low + np.searchsorted(segment_dates, ends, side="right")
+        totals: np.ndarray = self._cumulative[np.maximum(end_pos, start_pos)] - self._cumulative[start_pos]
+        return totals
+
+    def _unscale(self, totals: np.ndarray) -> np.ndarray:
+        return totals if self._scale == 1 else totals / self._scale
+
+    def _daily_anchors(self) -> pd.DatetimeIndex:
+        """Конец каждого дня от первой до последней операции."""
+        if self._first_date is None or self._last_date is None:
+            return pd.DatetimeIndex([])
+        days = pd.date_range(self._first_date.normalize(), self._last_date.normalize(), freq="D")
+        return days + (ONE_DAY - ONE_NS)
+
+
+def _window_bounds(anchors: pd.DatetimeIndex, months: int, days: int) -> tuple[np.ndarray, np.ndarray]:
+    """Начала и концы окон в наносекундах: [начало дня (дата - months месяцев - days дней), дата]."""
+    if months < 0 or days < 0:
+        raise ValueError("Размер окна не может быть отрицательным")
+    starts = anchors
+    if months:
+        starts = starts - pd.DateOffset(months=months)
+    if days:
+        starts = starts - pd.Timedelta(days=days)
+    return starts.normalize().asi8, anchors.asi8
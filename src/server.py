@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import threading
+from contextlib import nullcontext
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from bootstrap import init
+from cube import TransactionCube
+from log_config import get_logger
+from main import (file_path_xlsx, get_dashboard_data, get_quote_cache, get_quotes, read_user_settings,
+                  user_settings_path)
+from metrics import MetricsRegistry, collect_timings, get_sink, set_sink, stage
+from utils import CACHE_DIR, TRANSACTION_SCHEMA, read_excel_file
+from views import parse_datetime
+
+logger = get_logger("server")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+# период проверки изменения файлов, в секундах
+WATCH_INTERVAL = 2.0
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Согласованный набор данных, с которым обрабатывается запрос."""
+
+    transactions: pd.DataFrame
+    cube: TransactionCube
+    user_settings: dict[str, Any]
+    data_mtime_ns: int
+    settings_mtime_ns: int
+
+
+class DataStore:
+    """Хранит операции и пользовательские установки в памяти и перезагружает их при изменении файлов.
+
+    Новые данные готовятся целиком и подменяют текущий снимок одной операцией присваивания,
+    поэтому запросы всегда видят согласованное состояние.
+    """
+
+    def __init__(self, data_path: Path, settings_path: Path, cache_dir: Optional[Path] = CACHE_DIR) -> None:
+        """cache_dir - каталог кеша разобранного файла операций (None - без кеша)."""
+        self.data_path = data_path
+        self.settings_path = settings_path
+        self.cache_dir = cache_dir
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self.snapshot = self._load()
+
+    def _load(self, previous: Optional[Snapshot] = None) -> Snapshot:
+        """Загружает файлы, которые изменились с момента загрузки предыдущего снимка."""
+        data_mtime_ns = os.stat(self.data_path).st_mtime_ns
+        settings_mtime_ns = os.stat(self.settings_path).st_mtime_ns
+        if previous is not None and previous.data_mtime_ns == data_mtime_ns:
+            transactions, cube = previous.transactions, previous.cube
+        else:
+            transactions = read_excel_file(
+                self.data_path, cache_dir=self.cache_dir, schema=TRANSACTION_SCHEMA, prepared=True
+            )
+            cube = TransactionCube(transactions)
+            logger.info("Загружено операций из файла %s: %s", self.data_path, len(transactions))
+        if previous is not None and previous.settings_mtime_ns == settings_mtime_ns:
+            user_settings = previous.user_settings
+        else:
+            user_settings = read_user_settings(self.settings_path)
+            logger.info("Загружены пользовательские установки из файла %s", self.settings_path)
+        return Snapshot(transactions, cube, user_settings, data_mtime_ns, settings_mtime_ns)
+
+    def reload_if_changed(self) -> bool:
+        """Перезагружает данные, если файлы изменились. Возвращает True, если снимок обновлен."""
+        with self._reload_lock:
+            previous = self.snapshot
+            try:
+                changed = (
+                    os.stat(self.data_path).st_mtime_ns != previous.data_mtime_ns
+                    or os.stat(self.settings_path).st_mtime_ns != previous.settings_mtime_ns
+                )
+                if changed:
+                    self.snapshot = self._load(previous)
+            except Exception as e:
+                logger.error("Исключение %s. Не удалось перезагрузить данные, используются прежние.", e)
+                return False
+            return changed
+
+    def start_watching(self, interval: float = WATCH_INTERVAL) -> None:
+        """Запускает фоновую проверку изменения файлов."""
+
+        def watch() -> None:
+            while not self._stop_event.wait(interval):
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        """Останавливает фоновую проверку изменения файлов."""
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+
+def build_response(store: DataStore, date_time_str: str, timings: bool = False) -> dict[str, Any]:
+    """Формирует ответ для страницы «Главная» по данным в памяти.
+
+    При timings=True в ответ добавляется блок "_timings" с длительностями этапов и счетчиками.
+    """
+    snapshot = store.snapshot
+    with collect_timings() if timings else nullcontext() as collected:
+        dt = parse_datetime(date_time_str)
+        response = {
+            **get_dashboard_data(snapshot.transactions, dt, snapshot.cube),
+            **get_quotes(snapshot.user_settings),
+        }
+    if collected is not None:
+        response["_timings"] = collected.as_dict()
+    return response
+
+
+def make_handler(store: DataStore) -> type[BaseHTTPRequestHandler]:
+    """Создает обработчик HTTP-запросов, работающий с заданным хранилищем данных."""
+
+    class DashboardHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            sink = get_sink()
+            if url.path == "/metrics" and isinstance(sink, MetricsRegistry):
+                self._send_text(200, sink.export_prometheus())
+                return
+            if url.path != "/main":
+                self._send_json(404, {"error": "Страница не найдена"})
+                return
+            query = parse_qs(url.query)
+            date_time_str = query.get("datetime", [""])[0]
+            try:
+                with stage("request"):
+                    response = build_response(store, date_time_str, timings=query.get("timings") == ["1"])
+            except ValueError as e:
+                self._send_json(400, {"error": f"Неверный формат даты: {e}"})
+                return
+            except Exception as e:
+                # без ответа клиент получил бы разорванное соединение
+                logger.error("Исключение %s. Не удалось обработать запрос %s.", e, self.path)
+                self._send_json(500, {"error": "Внутренняя ошибка сервера"})
+                return
+            self._send_json(200, response)
+
+        def _send_json(self, status: int, body: dict[str, Any]) -> None:
+            data = json.dumps(body, indent=4, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_text(self, status: int, text: str) -> None:
+            data = text.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("%s - " + format, self.address_string(), *args)
+
+    return DashboardHandler
+
+
+def make_server(store: DataStore, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """Создает HTTP-сервер, отвечающий JSON страницы «Главная» на запросы GET /main?datetime=..."""
+    server = ThreadingHTTPServer((host, port), make_handler(store))
+    server.daemon_threads = True
+    return server
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, metrics: bool = False) -> None:
+    """Запускает сервер, загружая данные один раз и перезагружая их при изменении файлов.
+
+    При metrics=True метрики собираются в реестр и отдаются по GET /metrics в формате Prometheus.
+    """
+    init()
+    if metrics:
+        set_sink(MetricsRegistry())
+    # процесс живет долго, поэтому просроченные котировки отдаются сразу и обновляются в фоне
+    get_quote_cache().background_refresh = True
+    store = DataStore(file_path_xlsx, user_settings_path)
+    store.start_watching()
+    server = make_server(store, host, port)
+    logger.info("Сервер запущен на %s:%s", host, port)
+    print(f"Сервер запущен на http://{host}:{port}/main?datetime=2018-01-20%2018:59:59")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.stop_watching()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сервер JSON-ответов для страницы «Главная»")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--metrics", action="store_true", help="собирать метрики и отдавать их по GET /metrics")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.metrics)
@@ -1,32 +1,157 @@
 import json
-import logging
+import multiprocessing
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Callable, Optional
 
+import numpy as np
 import pandas as pd
 
+from log_config import get_logger
+from text_index import DescriptionIndex
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-file_path_log = BASE_DIR / "logs" / "services.log"
-logger = logging.getLogger("services")
-logger.setLevel(logging.DEBUG)
-file_handler = logging.FileHandler(file_path_log, mode="w", encoding="utf-8")
-file_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s: %(message)s")
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
+logger = get_logger("services")
+
+
+# мобильные номера в распространенных форматах записи:
+# +7 XXX XX(X)-XX-XX, +7 (XXX) XXX-XX-XX, +7XXXXXXXXXX, 8 XXX XXX XX XX, 8 (XXX) XXX-XX-XX, 8XXXXXXXXXX
+PHONE_PATTERN = re.compile(
+    r"(?<![\d+])(?:"
+    r"\+7 \d{3} \d{2,3}-\d{2}-\d{2}"
+    r"|(?:\+7|8)[\s-]?(?:\(\d{3}\)|\d{3})[\s-]?\d{3}[\s-]?\d{2}[\s-]?\d{2}"
+    r")(?!\d)"
+)
+# начиная с этого числа строк поиск номеров распределяется по процессам
+PHONE_PARALLEL_THRESHOLD = 200_000
+# номер строки в исходном файле: канонический DataFrame отсортирован по дате,
+# а ответы выводят операции и упорядочивают равные суммы в порядке файла
+SOURCE_ROW_COLUMN = "source_row"
+# модули, которые процесс forkserver импортирует один раз, чтобы рабочие процессы не импортировали их заново
+FORKSERVER_PRELOAD = ["numpy", "pandas"]
+# служебные столбцы канонического DataFrame, которых нет в исходном Excel-файле
+DERIVED_COLUMNS = ["last_digits", "has_phone", "phone_number", SOURCE_ROW_COLUMN]
+
+
+def normalize_phone_number(phone_number: str) -> str:
+    """Приводит найденный номер к виду +7XXXXXXXXXX.
+
+    Неполный номер (в выписке встречается запись +7 XXX XX-XX-XX) однозначно нормализовать нельзя,
+    он возвращается в том виде, в котором записан в описании.
+    """
+    digits = re.sub(r"\D", "", phone_number)
+    if len(digits) != 11:
+        return phone_number
+    return f"+7{digits[1:]}"
+
+
+def get_process_context() -> multiprocessing.context.BaseContext:
+    """Контекст запуска рабочих процессов: forkserver с предварительно загруженными numpy и pandas.
+
+    В отличие от fork, копия процесса с работающими потоками логирования, наблюдения за файлами
+    и HTTP-сервера не создается.
+    """
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(FORKSERVER_PRELOAD)
+    return context
+
+
+def _find_phone_numbers(descriptions: list) -> list[Optional[str]]:
+    """Ищет первый мобильный номер в каждом описании и возвращает нормализованные номера."""
+    phone_numbers: list[Optional[str]] = []
+    search = PHONE_PATTERN.search
+    for description in descriptions:
+        match = search(description) if isinstance(description, str) else None
+        phone_numbers.append(normalize_phone_number(match.group()) if match else None)
+    return phone_numbers
+
+
+def detect_phone_numbers(descriptions: pd.Series, workers: Optional[int] = None) -> pd.Series:
+    """Возвращает нормализованные мобильные номера из описаний операций (None, если номера нет).
+
+    По умолчанию поиск выполняется в текущем процессе. Если передан workers (0 - по числу ядер),
+    поиск в больших DataFrame распределяется по процессам. Процессы запускаются через forkserver:
+    копия процесса с работающими потоками логирования, наблюдения за файлами и HTTP-сервера не создается,
+    но вызывающий скрипт должен запускаться под защитой if __name__ == "__main__".
+    """
+    values = descriptions.tolist()
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers is None or workers < 2 or len(values) < PHONE_PARALLEL_THRESHOLD:
+        phone_numbers = _find_phone_numbers(values)
+    else:
+        chunk_size = -(-len(values) // workers)
+        chunks = []
+        for start in range(0, len(values), chunk_size):
+            stop = start + chunk_size
+            chunks.append(values[start:stop])
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context()) as executor:
+            phone_numbers = [number for chunk in executor.map(_find_phone_numbers, chunks) for number in chunk]
+    logger.debug("Мобильные номера найдены в %s описаниях операций", len(values))
+    return pd.Series(phone_numbers, index=descriptions.index, dtype=object, name="phone_number")
+
+
+def _to_source_format(df: pd.DataFrame) -> pd.DataFrame:
+    """Возвращает отобранные строки канонического DataFrame в формате и порядке строк исходного Excel-файла."""
+    if SOURCE_ROW_COLUMN in df:
+        df = df.iloc[np.argsort(df[SOURCE_ROW_COLUMN].to_numpy(), kind="stable")]
+    df = df.drop(columns=DERIVED_COLUMNS, errors="ignore")
+    if "Дата операции" in df and pd.api.types.is_datetime64_any_dtype(df["Дата операции"]):
+        df = df.assign(**{"Дата операции": df["Дата операции"].dt.strftime("%d.%m.%Y %H:%M:%S")})
+    return df
 
 
 def get_transactions_with_phone_num(df: pd.DataFrame) -> str:
-    """Функция возвращает JSON со всеми транзакциями, содержащими в описании мобильные номера."""
+    """Функция возвращает JSON со всеми транзакциями, содержащими в описании мобильные номера.
+
+    Для DataFrame в каноническом виде используется столбец has_phone, посчитанный при загрузке.
+    """
     if "Описание" not in df or df["Описание"].dtype != "O":
         return json.dumps([], ensure_ascii=False, indent=4)
-    mobile_pattern = re.compile(r"\+7 \d{3} \d{2,3}-\d{2}-\d{2}")
-    transactions_with_mobile = df[df["Описание"].str.contains(mobile_pattern, na=False)].copy()
+    if "has_phone" in df:
+        has_phone = df["has_phone"]
+    else:
+        has_phone = detect_phone_numbers(df["Описание"]).notna()
+    transactions_with_mobile = _to_source_format(df[has_phone])
     result_json = transactions_with_mobile.to_json(orient="records", force_ascii=False, indent=4)
     logger.info("Транзакции, содержащие в описании мобильные номера, определены.")
     return result_json
 
 
+def build_description_index(df: pd.DataFrame) -> DescriptionIndex:
+    """Строит индекс описаний операций для быстрого поиска по подстроке.
+
+    Позиции индекса совпадают с позициями строк df; новые строки добавляются методом DescriptionIndex.add.
+    """
+    descriptions = df["Описание"] if "Описание" in df else pd.Series([], dtype=object)
+    index = DescriptionIndex(descriptions.tolist())
+    logger.info("Индекс описаний построен, строк: %s", len(index))
+    return index
+
+
+def search_transactions(df: pd.DataFrame, index: DescriptionIndex, query: str, mode: str = "substring") -> str:
+    """Функция возвращает JSON с транзакциями, описание которых подходит под запрос.
+
+    mode: substring - описание содержит query, prefix - начинается с query (без учета регистра),
+    regex - содержит совпадение с регулярным выражением query.
+    """
+    searches: dict[str, Callable[[str], np.ndarray]] = {
+        "substring": index.search_substring,
+        "prefix": index.search_prefix,
+        "regex": index.search_regex,
+    }
+    if mode not in searches:
+        raise ValueError(f"Неизвестный режим поиска: {mode}")
+    positions = searches[mode](query)
+    found = _to_source_format(df.iloc[positions])
+    logger.info("По запросу '%s' (%s) найдено транзакций: %s", query, mode, len(found))
+    result_json: str = found.to_json(orient="records", force_ascii=False, indent=4)
+    return result_json
+
+
 # if __name__ == "__main__":
 #     BASE_DIR = Path(__file__).resolve().parent.parent
 #     file_path_xlsx = BASE_DIR / "data" / "operations.xlsx"
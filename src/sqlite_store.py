@@ -0,0 +1,182 @@
+import copy
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+import pandas as pd
+
+from log_config import get_logger
+from utils import CATEGORICAL_COLUMNS
+
+if TYPE_CHECKING:
+    import sqlite3
+
+logger = get_logger("sqlite_store")
+
+# столбцы канонического DataFrame (см. utils.prepare_transactions) и соответствующие столбцы таблицы
+COLUMNS = {
+    "Дата операции": "operation_date",
+    "Номер карты": "card_number",
+    "Статус": "status",
+    "Сумма операции с округлением": "amount",
+    "Категория": "category",
+    "Описание": "description",
+    "last_digits": "last_digits",
+    "phone_number": "phone_number",
+    "has_phone": "has_phone",
+    "source_row": "source_row",
+}
+# дата хранится целым числом наносекунд, как datetime64[ns]: сравнение дат - сравнение чисел
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    operation_date INTEGER NOT NULL,
+    card_number TEXT,
+    status TEXT,
+    amount REAL,
+    category TEXT,
+    description TEXT,
+    last_digits TEXT,
+    phone_number TEXT,
+    has_phone INTEGER,
+    source_row INTEGER
+);
+CREATE INDEX IF NOT EXISTS transactions_operation_date ON transactions (operation_date);
+CREATE INDEX IF NOT EXISTS transactions_last_digits ON transactions (last_digits, operation_date);
+CREATE INDEX IF NOT EXISTS transactions_category ON transactions (category, operation_date);
+CREATE INDEX IF NOT EXISTS transactions_status ON transactions (status, operation_date);
+"""
+# строки с одинаковой датой возвращаются в порядке добавления, как при устойчивой сортировке DataFrame
+ORDER_BY_DATE = "operation_date, id"
+
+
+class SqliteTransactions:
+    """Операции в базе SQLite (стандартный модуль sqlite3) или их диапазон дат.
+
+    Отбор по датам и категории, суммы по картам и топ-n выполняются запросами к базе
+    по индексам (функции views и reports принимают такой объект вместо DataFrame),
+    поэтому данные не обязаны помещаться в память, а файл базы можно читать из нескольких процессов.
+    Результаты - DataFrame того же вида, что дают функции views и reports для канонического DataFrame.
+    """
+
+    _connection: "sqlite3.Connection"
+
+    def __init__(self, db_path: Union[str, Path] = ":memory:") -> None:
+        import sqlite3
+
+        self.db_path = db_path
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.start_date: Optional[pd.Timestamp] = None
+        self.end_date: Optional[pd.Timestamp] = None
+        with self._lock, self._connection:
+            if db_path != ":memory:":
+                # читатели в других процессах не блокируются записью
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, db_path: Union[str, Path] = ":memory:") -> "SqliteTransactions":
+        """Создает базу и загружает в нее операции из DataFrame в каноническом виде."""
+        store = cls(db_path)
+        store.append(df)
+        return store
+
+    def append(self, df: pd.DataFrame) -> None:
+        """Добавляет операции из DataFrame в каноническом виде."""
+        columns = [column for column in COLUMNS if column in df]
+        rows = df[columns].astype(object).where(df[columns].notna(), None)
+        rows["Дата операции"] = df["Дата операции"].to_numpy(dtype="datetime64[ns]").astype("int64").tolist()
+        if "has_phone" in rows:
+            rows["has_phone"] = df["has_phone"].astype(int).tolist()
+        sql = (
+            f"INSERT INTO transactions ({', '.join(COLUMNS[column] for column in columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        with self._lock, self._connection:
+            self._connection.executemany(sql, rows.itertuples(index=False, name=None))
+        logger.info("В базу %s добавлено операций: %s", self.db_path, len(df))
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        self._connection.close()
+
+    def date_range(
+        self, start_date: Union[datetime, pd.Timestamp], end_date: Union[datetime, pd.Timestamp]
+    ) -> "SqliteTransactions":
+        """Операции с датой в диапазоне [start_date, end_date] включительно; запрос к базе не выполняется."""
+        view = copy.copy(self)
+        start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        view.start_date = start_date if self.start_date is None else max(start_date, self.start_date)
+        view.end_date = end_date if self.end_date is None else min(end_date, self.end_date)
+        return view
+
+    def __len__(self) -> int:
+        where, params = self._where()
+        return int(self._query(f"SELECT COUNT(*) FROM transactions {where}", params)[0][0])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Операции диапазона в виде DataFrame в каноническом виде."""
+        where, params = self._where()
+        return self._select(f"{where} ORDER BY {ORDER_BY_DATE}", params)
+
+    def card_sums(self) -> pd.Series:
+        """Суммы успешных операций по последним цифрам номера карты.
+
+        Суммы считаются в копейках, чтобы результат не зависел от порядка суммирования строк.
+        """
+        where, params = self._where("status = 'OK'", "card_number IS NOT NULL")
+        rows = self._query(
+            f"SELECT last_digits, TOTAL(CAST(ROUND(amount * 100) AS INTEGER)) FROM transactions {where} "
+            "GROUP BY last_digits ORDER BY last_digits",
+            params,
+        )
+        index = pd.Index([row[0] for row in rows], dtype="object", name="last_digits")
+        return pd.Series([row[1] / 100 for row in rows], index=index, dtype="float64")
+
+    def top_transactions(self, n: int = 5, column: str = "Сумма операции с округлением") -> pd.DataFrame:
+        """Первые n успешных операций по значению столбца column.
+
+        Из равных первой идет встретившаяся раньше в исходном файле; в отличие от views.get_top_transactions
+        для больших диапазонов порядок равных значений не воспроизводит сортировку pandas.
+        """
+        if column not in COLUMNS:
+            raise ValueError(f"Неизвестный столбец: {column}")
+        sql_column = COLUMNS[column]
+        where, params = self._where("status = 'OK'", f"{sql_column} IS NOT NULL")
+        return self._select(f"{where} ORDER BY {sql_column} DESC, source_row, id LIMIT ?", [*params, n])
+
+    def select_category(self, category: str) -> pd.DataFrame:
+        """Операции заданной категории в диапазоне дат."""
+        where, params = self._where("category = ?")
+        return self._select(f"{where} ORDER BY {ORDER_BY_DATE}", [category, *params])
+
+    def _where(self, *conditions: str) -> tuple[str, list[Any]]:
+        """Условие WHERE с заданными условиями и диапазоном дат и его параметры (после параметров conditions)."""
+        conditions_list = list(conditions)
+        params: list[Any] = []
+        if self.start_date is not None:
+            conditions_list.append("operation_date >= ?")
+            params.append(self.start_date.value)
+        if self.end_date is not None:
+            conditions_list.append("operation_date <= ?")
+            params.append(self.end_date.value)
+        return ("WHERE " + " AND ".join(conditions_list) if conditions_list else ""), params
+
+    def _query(self, sql: str, params: list[Any]) -> list[tuple]:
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def _select(self, condition: str, params: list[Any]) -> pd.DataFrame:
+        """Строки таблицы, отобранные условием, в виде DataFrame в каноническом виде."""
+        rows = self._query(f"SELECT {', '.join(COLUMNS.values())} FROM transactions {condition}", params)
+        df = pd.DataFrame.from_records(rows, columns=list(COLUMNS))
+        df["Дата операции"] = pd.to_datetime(df["Дата операции"].astype("int64"), unit="ns")
+        df["Сумма операции с округлением"] = df["Сумма операции с округлением"].astype("float64")
+        for column in (*CATEGORICAL_COLUMNS, "last_digits"):
+            df[column] = df[column].astype("category")
+        df["has_phone"] = df["has_phone"].astype(bool)
+        df["source_row"] = df["source_row"].astype("int64")
+        df.index = pd.DatetimeIndex(df["Дата операции"], name=None)
+        return df
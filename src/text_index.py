@@ -0,0 +1,156 @@
+import re
+from collections import defaultdict
+from typing import Iterable, Optional
+
+import numpy as np
+
+from log_config import get_logger
+
+logger = get_logger("text_index")
+
+NGRAM_SIZE = 3
+# метка начала строки, триграммы с ней используются для поиска по префиксу
+START_MARK = "\x02"
+# метка конца строки: с обеими метками любой фрагмент короче триграммы входит хотя бы в одну триграмму строки
+END_MARK = "\x03"
+# позиции строк в списках триграмм: 4 байта на позицию вместо объекта int в списке Python
+POSTING_DTYPE = "int32"
+REGEX_METACHARS = set(".^$*+?{}[]()|")
+
+
+def _ngrams(text: str) -> set[str]:
+    """Множество триграмм строки."""
+    shifted = [text[shift:] for shift in range(NGRAM_SIZE)]
+    return {"".join(chars) for chars in zip(*shifted)}
+
+
+def regex_literals(pattern: str) -> list[str]:
+    """Выделяет из регулярного выражения фрагменты, которые обязательно входят в любое совпадение.
+
+    Для выражений с альтернативой (|) обязательные фрагменты не определяются.
+    """
+    if "|" in pattern:
+        return []
+    literals, current = [], ""
+    depth, position = 0, 0
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "\\":
+            escaped = pattern[position + 1] if position + 1 < len(pattern) else ""
+            if escaped and not escaped.isalnum() and depth == 0:
+                current += escaped
+            else:
+                literals.append(current)
+                current = ""
+            position += 2
+            continue
+        if char == "[":
+            # символьный класс пропускается целиком
+            literals.append(current)
+            current = ""
+            position = pattern.find("]", position + 2)
+            if position < 0:
+                break
+        elif char == "(":
+            depth += 1
+            literals.append(current)
+            current = ""
+        elif char == ")":
+            depth -= 1
+        elif char in "*?{":
+            # предыдущий символ необязателен или повторяется, квантификатор пропускается
+            literals.append(current[:-1])
+            current = ""
+            if char == "{":
+                position = pattern.find("}", position)
+                if position < 0:
+                    break
+        elif char in REGEX_METACHARS:
+            literals.append(current)
+            current = ""
+        elif depth == 0:
+            current += char
+        position += 1
+    literals.append(current)
+    return [literal for literal in literals if literal]
+
+
+class DescriptionIndex:
+    """Инвертированный индекс триграмм по описаниям операций.
+
+    Для каждой триграммы хранится возрастающий массив numpy с позициями строк, в описании которых она встречается.
+    Кандидаты для запроса из трех и более символов берутся из самого короткого массива триграмм запроса,
+    для запроса из одного-двух символов - из объединения массивов триграмм, содержащих запрос,
+    и проверяются точным сравнением, поэтому время запроса определяется числом подходящих строк,
+    а не размером таблицы. Пустому запросу подходят все строки.
+    """
+
+    def __init__(self, descriptions: Iterable[Optional[str]] = ()) -> None:
+        self._texts: list[str] = []
+        self._lower_texts: list[str] = []
+        self._postings: dict[str, np.ndarray] = {}
+        # кандидаты для фрагментов короче триграммы, сбрасываются при добавлении строк
+        self._short_candidates: dict[str, np.ndarray] = {}
+        self.add(descriptions)
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, descriptions: Iterable[Optional[str]]) -> None:
+        """Добавляет описания в конец индекса, позиции продолжают уже проиндексированные строки."""
+        start_position = len(self._texts)
+        new_postings: defaultdict[str, list[int]] = defaultdict(list)
+        for position, description in enumerate(descriptions, start=start_position):
+            text = description if isinstance(description, str) else ""
+            lower_text = text.lower()
+            self._texts.append(text)
+            self._lower_texts.append(lower_text)
+            for ngram in _ngrams(START_MARK + lower_text + END_MARK):
+                new_postings[ngram].append(position)
+        for ngram, positions in new_postings.items():
+            added = np.array(positions, dtype=POSTING_DTYPE)
+            previous = self._postings.get(ngram)
+            self._postings[ngram] = added if previous is None else np.concatenate([previous, added])
+        self._short_candidates.clear()
+        logger.debug("В индекс описаний добавлено строк: %s", len(self._texts) - start_position)
+
+    def _candidates(self, fragment: str) -> np.ndarray:
+        """Позиции строк, которые могут содержать фрагмент (без учета регистра)."""
+        if not fragment:
+            return np.arange(len(self._texts))
+        if len(fragment) >= NGRAM_SIZE:
+            empty = np.empty(0, dtype=POSTING_DTYPE)
+            return min((self._postings.get(ngram, empty) for ngram in _ngrams(fragment)), key=len)
+        candidates = self._short_candidates.get(fragment)
+        if candidates is None:
+            containing = [positions for ngram, positions in self._postings.items() if fragment in ngram]
+            candidates = np.unique(np.concatenate(containing)) if containing else np.empty(0, dtype=POSTING_DTYPE)
+            self._short_candidates[fragment] = candidates
+        return candidates
+
+    def search_substring(self, query: str) -> np.ndarray:
+        """Позиции строк, описание которых содержит query (без учета регистра)."""
+        query = query.lower()
+        lower_texts = self._lower_texts
+        positions = [position for position in self._candidates(query).tolist() if query in lower_texts[position]]
+        return np.array(positions, dtype="int64")
+
+    def search_prefix(self, query: str) -> np.ndarray:
+        """Позиции строк, описание которых начинается с query (без учета регистра)."""
+        query = query.lower()
+        lower_texts = self._lower_texts
+        candidates = self._candidates(START_MARK + query).tolist()
+        positions = [position for position in candidates if lower_texts[position].startswith(query)]
+        return np.array(positions, dtype="int64")
+
+    def search_regex(self, pattern: str, flags: int = 0) -> np.ndarray:
+        """Позиции строк, в описании которых есть совпадение с регулярным выражением.
+
+        Кандидаты отбираются по самому длинному обязательному фрагменту выражения.
+        """
+        compiled = re.compile(pattern, flags)
+        literals = regex_literals(pattern)
+        fragment = max(literals, key=len).lower() if literals else ""
+        texts = self._texts
+        positions = [position for position in self._candidates(fragment).tolist() if compiled.search(texts[position])]
+        return np.array(positions, dtype="int64")
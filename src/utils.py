@@ -1,91 +1,522 @@
-import logging
+import hashlib
+import json
 import os
 import pathlib
+import pickle
+import threading
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional, TypeVar
 
+import numpy as np
 import pandas as pd
-import requests
-from dotenv import load_dotenv
+
+from log_config import get_logger
+from metrics import count, stage
+from quote_cache import QuoteCache
+from services import SOURCE_ROW_COLUMN, detect_phone_numbers
+
+if TYPE_CHECKING:
+    import requests
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-file_path_log = BASE_DIR / "logs" / "utils.log"
-logger = logging.getLogger("utils")
-logger.setLevel(logging.DEBUG)
-file_handler = logging.FileHandler(file_path_log, mode="w", encoding="utf-8")
-file_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s: %(message)s")
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
+logger = get_logger("utils")
+
+# ключи API берутся из переменных окружения при запросе (см. bootstrap.init), если не заданы здесь явно
+APILAYER_API_KEY: Optional[str] = None
+ALPHAVANTAGE_API_KEY: Optional[str] = None
+
+# кеш разобранных Excel-файлов
+CACHE_DIR = BASE_DIR / ".cache" / "excel"
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_MAX_FILES = 32
+# протокол pickle файлов кеша; вместе с версией pandas входит в ключ кеша, поэтому кеш,
+# записанный другой версией pandas или Python, не читается
+CACHE_PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL
+
+# параметры запросов к внешним API
+APILAYER_URL = "https://api.apilayer.com/exchangerates_data"
+ALPHAVANTAGE_URL = "https://www.alphavantage.co/query"
+REQUEST_TIMEOUT = 5
+FETCH_DEADLINE = 10
+MAX_FETCH_WORKERS = 8
+# базовая валюта таблицы курсов для пакетного получения курсов
+RATES_BASE = "EUR"
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+T = TypeVar("T")
+
+# размер порции строк при потоковом чтении Excel-файла
+DEFAULT_CHUNK_SIZE = 100_000
+
+# столбцы выписки, которые использует приложение, и их типы при загрузке (None - тип, прочитанный из файла);
+# дата разбирается в prepare_transactions, суммы остаются float64: округления и суммы в ответах не меняются
+TRANSACTION_SCHEMA: dict[str, Optional[str]] = {
+    "Дата операции": None,
+    "Номер карты": "category",
+    "Статус": "category",
+    "Сумма операции с округлением": "float64",
+    "Категория": "category",
+    "Описание": None,
+}
+# столбцы канонического DataFrame с категориальным типом (см. prepare_transactions)
+CATEGORICAL_COLUMNS = ("Номер карты", "Категория", "Статус")
+# версия канонического вида в ключе кеша: при изменении prepare_transactions старый кеш не читается
+PREPARED_CACHE_VERSION = 2
+
+
+def _file_content_hash(file_path: pathlib.Path) -> str:
+    """Вычисляет sha256 содержимого файла, читая его блоками."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(
+    file_path: pathlib.Path,
+    cache_dir: pathlib.Path,
+    schema: Optional[dict[str, Optional[str]]] = None,
+    prepared: bool = False,
+) -> tuple[Path, Path]:
+    """Возвращает пути к файлу кеша и к файлу с метаданными для исходного файла, схемы загрузки и вида данных."""
+    source = str(Path(file_path).resolve())
+    source += f"pandas:{pd.__version__}:pickle:{CACHE_PICKLE_PROTOCOL}"
+    if schema is not None:
+        source += json.dumps(schema, ensure_ascii=False)
+    if prepared:
+        source += f"prepared:{PREPARED_CACHE_VERSION}"
+    key = hashlib.sha1(source.encode("utf-8")).hexdigest()
+    return cache_dir / f"{key}.pkl", cache_dir / f"{key}.json"
+
+
+def _evict_cache(cache_dir: pathlib.Path, max_bytes: int, max_files: int) -> None:
+    """Удаляет давно не использованные файлы кеша сверх лимитов по размеру и количеству."""
+    entries = sorted(cache_dir.glob("*.pkl"), key=lambda path: path.stat().st_mtime, reverse=True)
+    total_size = 0
+    for index, data_path in enumerate(entries):
+        total_size += data_path.stat().st_size
+        if index >= max_files or total_size > max_bytes:
+            data_path.unlink(missing_ok=True)
+            data_path.with_suffix(".json").unlink(missing_ok=True)
+            logger.debug("Файл кеша %s удален при очистке кеша", data_path)
+
+
+def _drop_cache_entry(data_path: pathlib.Path, meta_path: pathlib.Path, error: BaseException) -> None:
+    """Удаляет файл кеша, который не удалось прочитать, вместе с его метаданными."""
+    logger.warning("Исключение %s. Файл кеша %s не прочитан и будет пересобран.", error, data_path)
+    count("excel_cache_errors")
+    data_path.unlink(missing_ok=True)
+    meta_path.unlink(missing_ok=True)
+
+
+def _read_excel(file_path: pathlib.Path, schema: Optional[dict[str, Optional[str]]]) -> pd.DataFrame:
+    """Читает .xlsx файл целиком или только столбцы schema с заданными в ней типами."""
+    if schema is None:
+        return pd.read_excel(file_path, engine="openpyxl")
+    file_data = pd.read_excel(file_path, engine="openpyxl", usecols=lambda column: column in schema)
+    return file_data.astype({column: dtype for column, dtype in schema.items() if dtype and column in file_data})
 
-load_dotenv(".env")
-APILAYER_API_KEY = os.getenv("APILAYER_API_KEY")
-ALPHAVANTAGE_API_KEY = os.getenv("ALPHAVANTAGE_API_KEY")
 
+def _read_excel_cached(
+    file_path: pathlib.Path,
+    cache_dir: pathlib.Path,
+    schema: Optional[dict[str, Optional[str]]] = None,
+    prepared: bool = False,
+) -> pd.DataFrame:
+    """Читает DataFrame из кеша, пересобирая кеш только при изменении исходного файла.
 
-def read_excel_file(file_path: pathlib.Path) -> pd.DataFrame:
-    """Функция читает данные из .xlsx файла и возвращает их в формате DataFrame."""
+    При prepared=True в кеше хранится DataFrame в каноническом виде (см. prepare_transactions).
+    """
+    data_path, meta_path = _cache_paths(file_path, cache_dir, schema, prepared)
+    stat = os.stat(file_path)
+    meta: dict[str, Any] = {}
+    if data_path.exists() and meta_path.exists():
+        try:
+            with open(meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+        except (OSError, ValueError) as e:
+            _drop_cache_entry(data_path, meta_path, e)
+    if meta:
+        content_hash = meta.get("sha256")
+        if meta.get("size") != stat.st_size or meta.get("mtime_ns") != stat.st_mtime_ns:
+            # время изменения могло поменяться без изменения содержимого
+            content_hash = _file_content_hash(file_path)
+        if content_hash == meta.get("sha256"):
+            try:
+                cached_data: pd.DataFrame = pd.read_pickle(data_path)
+            except Exception as e:
+                # кеш обрезан или поврежден: он удаляется, а Excel файл разбирается заново
+                _drop_cache_entry(data_path, meta_path, e)
+            else:
+                if meta.get("mtime_ns") != stat.st_mtime_ns:
+                    meta.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                    with open(meta_path, "w", encoding="utf-8") as file:
+                        json.dump(meta, file)
+                os.utime(data_path)
+                count("excel_cache_hits")
+                logger.debug("Данные Excel файла %s прочитаны из кеша %s", file_path, data_path)
+                return cached_data
+        meta["sha256"] = content_hash
+
+    count("excel_cache_misses")
+    file_data = _read_excel(file_path, schema)
+    if prepared:
+        file_data = _prepare_stage(file_data)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = data_path.with_suffix(".tmp")
+    file_data.to_pickle(tmp_path, protocol=CACHE_PICKLE_PROTOCOL)
+    os.replace(tmp_path, data_path)
+    meta = {
+        "path": str(Path(file_path).resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": meta.get("sha256") or _file_content_hash(file_path),
+    }
+    with open(meta_path, "w", encoding="utf-8") as file:
+        json.dump(meta, file)
+    logger.debug("Кеш %s для Excel файла %s обновлен", data_path, file_path)
+    _evict_cache(cache_dir, CACHE_MAX_BYTES, CACHE_MAX_FILES)
+    return file_data
+
+
+def read_excel_file(
+    file_path: pathlib.Path,
+    cache_dir: Optional[pathlib.Path] = None,
+    schema: Optional[dict[str, Optional[str]]] = None,
+    prepared: bool = False,
+) -> pd.DataFrame:
+    """Функция читает данные из .xlsx файла и возвращает их в формате DataFrame.
+
+    Если передан cache_dir, разобранные данные сохраняются в кеш и повторно читаются из него,
+    пока исходный файл не изменится. Если передана schema (например, TRANSACTION_SCHEMA), читаются
+    только ее столбцы с компактными типами: строки справочников - категориальные.
+    При prepared=True возвращается DataFrame в каноническом виде (см. prepare_transactions), и в кеше
+    хранится уже он: для неизменившегося файла даты, категории и номера телефонов повторно не разбираются.
+    """
     try:
-        logger.debug(f"Чтение данных из Excel файла {file_path}")
-        file_data = pd.read_excel(file_path, engine="openpyxl")
-        logger.info(f"Данные из Excel файла {file_path} получены")
+        logger.debug("Чтение данных из Excel файла %s", file_path)
+        if cache_dir is None:
+            file_data = _read_excel(file_path, schema)
+            if prepared:
+                file_data = _prepare_stage(file_data)
+        else:
+            file_data = _read_excel_cached(file_path, cache_dir, schema, prepared)
+        logger.info("Данные из Excel файла %s получены", file_path)
         return file_data
+    except BrokenExecutor:
+        # сбой пула процессов - ошибка запуска программы, а не чтения файла, поэтому она не скрывается
+        raise
     except Exception as e:
-        logger.error(f"Ошибка: {e} - файл {file_path} не найден")
+        logger.error("Ошибка: %s - файл %s не найден", e, file_path)
         print(f"Произошла ошибка: {e}")
         return pd.DataFrame()
 
 
-def get_currency_rate(cur_list: list, convert_to: str = "RUB") -> list[dict[str, Any]]:
-    """Получение курсов валют с apilayer.com."""
+def read_excel_chunks(
+    file_path: pathlib.Path, chunk_size: int = DEFAULT_CHUNK_SIZE, dtype: Optional[dict[str, Any]] = None
+) -> Iterator[pd.DataFrame]:
+    """Потоково читает .xlsx файл и возвращает DataFrame порциями не более chunk_size строк.
+
+    Файл читается в режиме read_only, поэтому в памяти одновременно находится только одна порция.
+    Через dtype можно задать типы столбцов, одинаковые для всех порций.
+    """
+    if chunk_size < 1:
+        raise ValueError("Размер порции должен быть положительным числом")
+    import openpyxl
+
+    logger.debug("Потоковое чтение данных из Excel файла %s порциями по %s строк", file_path, chunk_size)
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = list(header)
+        buffer: list[tuple] = []
+        chunks_count = 0
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                chunks_count += 1
+                yield _rows_to_frame(buffer, columns, dtype)
+                buffer = []
+        if buffer:
+            chunks_count += 1
+            yield _rows_to_frame(buffer, columns, dtype)
+        logger.info("Данные из Excel файла %s прочитаны потоково, порций: %s", file_path, chunks_count)
+    finally:
+        workbook.close()
+
+
+def _rows_to_frame(rows: list[tuple], columns: list, dtype: Optional[dict[str, Any]]) -> pd.DataFrame:
+    """Собирает типизированный DataFrame из строк, прочитанных openpyxl."""
+    frame = pd.DataFrame.from_records(rows, columns=columns).replace({None: np.nan}).infer_objects()
+    if dtype:
+        frame = frame.astype(dtype)
+    return frame
+
+
+def prepare_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """Приводит DataFrame операций к каноническому виду, выполняется один раз после загрузки.
+
+    Дата операции разбирается в datetime, номер карты, категория и статус становятся категориальными,
+    суммы - числовыми, добавляется категориальный столбец last_digits с последними цифрами номера карты.
+    Строки сортируются по дате операции, дата становится индексом DataFrame (см. select_date_range),
+    номер строки в исходном файле сохраняется в столбце source_row (порядок вывода и равных сумм в ответах).
+    Мобильные номера из описаний ищутся один раз и сохраняются в столбцах phone_number и has_phone;
+    при чтении через read_excel_file(prepared=True) с кешем - один раз для каждой версии файла.
+    Функции views, reports и services работают с таким DataFrame без повторного разбора и копирования.
+    """
+    df = df.copy()
+    if SOURCE_ROW_COLUMN not in df:
+        df[SOURCE_ROW_COLUMN] = np.arange(len(df))
+    if "Дата операции" in df:
+        if not pd.api.types.is_datetime64_any_dtype(df["Дата операции"]):
+            df["Дата операции"] = pd.to_datetime(df["Дата операции"], format="%d.%m.%Y %H:%M:%S")
+        # отсортированный индекс по дате позволяет выбирать диапазоны дат бинарным поиском
+        df = df.sort_values("Дата операции", kind="stable")
+        df.index = pd.DatetimeIndex(df["Дата операции"], name=None)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("category")
+    for column in ("Сумма операции", "Сумма платежа", "Кэшбэк", "Сумма операции с округлением"):
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    if "Номер карты" in df:
+        # последние цифры вычисляются для каждого номера карты один раз, а не для каждой строки
+        cards = df["Номер карты"].cat
+        suffix_codes, suffixes = pd.factorize(cards.categories.astype(str).str[-4:])
+        codes = np.append(suffix_codes, -1)[cards.codes.to_numpy()]
+        df["last_digits"] = pd.Categorical.from_codes(codes, categories=suffixes)
+    if "Описание" in df:
+        df["phone_number"] = detect_phone_numbers(df["Описание"])
+        df["has_phone"] = df["phone_number"].notna()
+    # столбец номеров исходных строк - последний, после остальных служебных столбцов
+    df[SOURCE_ROW_COLUMN] = df.pop(SOURCE_ROW_COLUMN)
+    logger.info("DataFrame из %s операций приведен к каноническому виду", len(df))
+    return df
+
+
+def _prepare_stage(file_data: pd.DataFrame) -> pd.DataFrame:
+    """Приводит прочитанные данные к каноническому виду, измеряя длительность этапа prepare."""
+    with stage("prepare"):
+        return prepare_transactions(file_data)
+
+
+def select_date_range(df: pd.DataFrame, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+    """Возвращает операции с датой в диапазоне [start_date, end_date] включительно.
+
+    Для DataFrame с отсортированным индексом по дате (см. prepare_transactions) границы диапазона
+    находятся бинарным поиском и возвращается срез без копирования данных, иначе применяется маска.
+    """
+    index = df.index
+    if isinstance(index, pd.DatetimeIndex) and index.is_monotonic_increasing:
+        start_pos = index.searchsorted(start_date, side="left")
+        end_pos = index.searchsorted(end_date, side="right")
+        return df.iloc[start_pos:end_pos]
+    operation_dates = df["Дата операции"]
+    if not pd.api.types.is_datetime64_any_dtype(operation_dates):
+        operation_dates = pd.to_datetime(operation_dates, format="%d.%m.%Y %H:%M:%S")
+        df = df.assign(**{"Дата операции": operation_dates})
+    return df[(operation_dates >= start_date) & (operation_dates <= end_date)]
+
+
+def get_session() -> "requests.Session":
+    """Возвращает общую для всех запросов сессию requests с пулом keep-alive соединений."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_FETCH_WORKERS, pool_maxsize=MAX_FETCH_WORKERS)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def fetch_concurrently(
+    fetch: Callable[[Any], T],
+    items: list,
+    on_error: Callable[[Any, BaseException], T],
+    deadline: Optional[float] = None,
+) -> list[T]:
+    """Выполняет fetch для каждого элемента items в пуле потоков и возвращает результаты в исходном порядке.
+
+    Для элементов, запрос по которым завершился исключением или не уложился в deadline секунд,
+    результат формирует on_error.
+    """
+    if not items:
+        return []
+    if deadline is None:
+        deadline = FETCH_DEADLINE
+    executor = ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(items)))
+    try:
+        # каждый запрос выполняется в копии контекста, чтобы счетчики metrics попадали в текущий запрос
+        futures = [executor.submit(copy_context().run, fetch, item) for item in items]
+        wait(futures, timeout=deadline)
+        results = []
+        for item, future in zip(items, futures):
+            if not future.done():
+                future.cancel()
+                results.append(on_error(item, TimeoutError(f"превышен общий таймаут {deadline} с")))
+                continue
+            error = future.exception()
+            results.append(future.result() if error is None else on_error(item, error))
+        return results
+    finally:
+        # не ждем запросы, не уложившиеся в deadline: их ограничивает таймаут REQUEST_TIMEOUT
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _apilayer_headers() -> dict[str, str]:
+    """Заголовки запроса к apilayer.com с ключом API."""
+    return {"apikey": APILAYER_API_KEY or os.getenv("APILAYER_API_KEY") or ""}
+
+
+def _fetch_currency_rate(currency: str, convert_to: str) -> dict[str, Any]:
+    """Запрашивает курс одной валюты с apilayer.com."""
+    url = f"{APILAYER_URL}/convert?to={convert_to}&from={currency}&amount=1"
+    headers = _apilayer_headers()
+    count("upstream_calls")
+    logger.debug("Отправляем API-запрос в APILAYER для конвертации %s в %s.", currency, convert_to)
+    response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    logger.debug("Получен ответ от APILAYER")
+    data = response.json()
+    rate = data["info"]["rate"]
+    logger.info("Обработан ответ от APILAYER на запрос конвертации %s в %s.", currency, convert_to)
+    return {"currency": currency, "rate": round(rate, 2)}
+
+
+def _currency_rate_error(currency: str, e: BaseException) -> dict[str, Any]:
+    """Результат для валюты, курс которой получить не удалось."""
+    logger.error("Исключение %s. Не удалось получить курс валюты %s.", e, currency)
+    print(f"Исключение {e}. Не удалось получить курс валюты {currency}.")
+    return {"currency": currency, "rate": ""}
+
+
+def get_currency_rate(
+    cur_list: list, convert_to: str = "RUB", cache: Optional[QuoteCache] = None, batch: bool = False
+) -> list[dict[str, Any]]:
+    """Получение курсов валют с apilayer.com.
+
+    Запросы по валютам выполняются параллельно через общую сессию, поэтому общее время
+    близко ко времени самого долгого запроса. Если передан cache, курсы берутся из кеша котировок.
+    При batch=True все курсы получаются одним запросом таблицы курсов (см. get_rates_table).
+    """
+    if batch:
+        return _get_currency_rate_batch(list(cur_list), convert_to, cache)
+
+    def fetch(currency: str) -> dict[str, Any]:
+        if cache is None:
+            return _fetch_currency_rate(currency, convert_to)
+        rate: dict[str, Any] = cache.get(
+            "currency", f"{currency}/{convert_to}", partial(_fetch_currency_rate, currency, convert_to)
+        )
+        return rate
+
+    return fetch_concurrently(fetch, list(cur_list), _currency_rate_error)
+
+
+def _fetch_rates_table(base: str) -> dict[str, float]:
+    """Запрашивает с apilayer.com курсы всех валют относительно базовой валюты одним запросом."""
+    url = f"{APILAYER_URL}/latest?base={base}"
+    headers = _apilayer_headers()
+    count("upstream_calls")
+    logger.debug("Отправляем API-запрос в APILAYER для получения таблицы курсов относительно %s.", base)
+    response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    data = response.json()
+    rates = {currency: float(rate) for currency, rate in data["rates"].items()}
+    rates[base] = 1.0
+    logger.info("Обработан ответ от APILAYER, получено курсов относительно %s: %s.", base, len(rates))
+    return rates
+
+
+def get_rates_table(cache: Optional[QuoteCache] = None, base: str = RATES_BASE) -> dict[str, float]:
+    """Возвращает таблицу курсов всех валют относительно base (сколько единиц валюты стоит 1 base).
+
+    Таблица общая для всех пользователей, поэтому при использовании cache за время жизни записи
+    к API выполняется не более одного запроса независимо от числа пользователей и валют.
+    """
+    if cache is None:
+        return _fetch_rates_table(base)
+    rates: dict[str, float] = cache.get("currency", f"table/{base}", partial(_fetch_rates_table, base))
+    return rates
+
+
+def cross_rate(rates: dict[str, float], currency: str, convert_to: str) -> float:
+    """Вычисляет курс currency в convert_to по таблице курсов относительно общей базовой валюты."""
+    return rates[convert_to] / rates[currency]
+
+
+def _get_currency_rate_batch(cur_list: list, convert_to: str, cache: Optional[QuoteCache]) -> list[dict[str, Any]]:
+    """Получает курсы валют одним запросом таблицы курсов и вычисляет кросс-курсы локально."""
+    if not cur_list:
+        return []
+    try:
+        rates = get_rates_table(cache)
+    except Exception as e:
+        return [_currency_rate_error(currency, e) for currency in cur_list]
     cur_rates_list = []
     for currency in cur_list:
         try:
-            url = f"https://api.apilayer.com/exchangerates_data/convert?to={convert_to}" f"&from={currency}&amount=1"
-            payload: dict[Any, Any] = {}
-            headers = {"apikey": APILAYER_API_KEY}
-            logger.debug(f"Отправляем API-запрос в APILAYER для конвертации {currency} в {convert_to}.")
-            response = requests.request("GET", url, headers=headers, data=payload)
-            logger.debug("Получен ответ от APILAYER")
-            data = response.json()
-            rate = data["info"]["rate"]
-            cur_rates_list.append({"currency": currency, "rate": round(rate, 2)})
-            logger.info(f"Обработан ответ от APILAYER на запрос конвертации {currency} в {convert_to}.")
-        except Exception as e:
-            cur_rates_list.append({"currency": currency, "rate": ""})
-            logger.error(f"Исключение {e}. Не удалось получить курс валюты {currency}.")
-            print(f"Исключение {e}. Не удалось получить курс валюты {currency}.")
+            cur_rates_list.append({"currency": currency, "rate": round(cross_rate(rates, currency, convert_to), 2)})
+        except KeyError as e:
+            cur_rates_list.append(_currency_rate_error(currency, ValueError(f"В таблице нет курса {e.args[0]}")))
     return cur_rates_list
 
 
-def get_stock_prices(stock_list: list) -> list[dict[str, Any]]:
-    """Получение стоимости акций с alphavantage.co."""
-    stock_prices_list = []
-    for symbol in stock_list:
-        try:
-            url = (
-                f"https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&"
-                f"symbol={symbol}&interval=5min&apikey={ALPHAVANTAGE_API_KEY}"
-            )
-            logger.debug(f"Отправляем API-запрос в ALPHAVANTAGE для получения стоимости акции {symbol}.")
-            r = requests.get(url)
-            logger.debug("Получен ответ от ALPHAVANTAGE")
-            data = r.json()
-            time_series = data.get("Time Series (5min)", {})
-            if time_series:
-                first_timestamp = next(iter(time_series))
-                first_close_value = time_series[first_timestamp]["4. close"]
-                stock_prices_list.append({"stock": symbol, "price": round(float(first_close_value), 2)})
-                logger.info(f"Обработан ответ от ALPHAVANTAGE на запрос стоимости акции {symbol}.")
-            else:
-                logger.warning(f"Нет данных в разделе 'Time Series (5min)' в ответе для акции {symbol}.")
-                print(f"Нет данных в разделе 'Time Series (5min)' в ответе для акции {symbol}.")
-
-        except Exception as e:
-            stock_prices_list.append({"stock": symbol, "price": ""})
-            logger.error(f"Исключение {e}. Не удалось получить стоимость акции {symbol}.")
-            print(f"Исключение {e}. Не удалось получить стоимость акции {symbol}.")
-    return stock_prices_list
+def _fetch_stock_price(symbol: str) -> Optional[dict[str, Any]]:
+    """Запрашивает стоимость одной акции с alphavantage.co."""
+    api_key = ALPHAVANTAGE_API_KEY or os.getenv("ALPHAVANTAGE_API_KEY", "")
+    url = f"{ALPHAVANTAGE_URL}?function=TIME_SERIES_INTRADAY&symbol={symbol}&interval=5min&apikey={api_key}"
+    count("upstream_calls")
+    logger.debug("Отправляем API-запрос в ALPHAVANTAGE для получения стоимости акции %s.", symbol)
+    r = get_session().get(url, timeout=REQUEST_TIMEOUT)
+    logger.debug("Получен ответ от ALPHAVANTAGE")
+    data = r.json()
+    time_series = data.get("Time Series (5min)", {})
+    if not time_series:
+        logger.warning("Нет данных в разделе 'Time Series (5min)' в ответе для акции %s.", symbol)
+        print(f"Нет данных в разделе 'Time Series (5min)' в ответе для акции {symbol}.")
+        return None
+    first_timestamp = next(iter(time_series))
+    first_close_value = time_series[first_timestamp]["4. close"]
+    logger.info("Обработан ответ от ALPHAVANTAGE на запрос стоимости акции %s.", symbol)
+    return {"stock": symbol, "price": round(float(first_close_value), 2)}
+
+
+def _stock_price_error(symbol: str, e: BaseException) -> dict[str, Any]:
+    """Результат для акции, стоимость которой получить не удалось."""
+    logger.error("Исключение %s. Не удалось получить стоимость акции %s.", e, symbol)
+    print(f"Исключение {e}. Не удалось получить стоимость акции {symbol}.")
+    return {"stock": symbol, "price": ""}
+
+
+def get_stock_prices(stock_list: list, cache: Optional[QuoteCache] = None) -> list[dict[str, Any]]:
+    """Получение стоимости акций с alphavantage.co.
+
+    Запросы по акциям выполняются параллельно через общую сессию, акции без данных пропускаются.
+    Если передан cache, стоимость берется из кеша котировок.
+    """
+
+    def fetch(symbol: str) -> Optional[dict[str, Any]]:
+        if cache is None:
+            return _fetch_stock_price(symbol)
+        price: Optional[dict[str, Any]] = cache.get("stock", symbol, partial(_fetch_stock_price, symbol))
+        return price
+
+    results = fetch_concurrently(fetch, list(stock_list), _stock_price_error)
+    return [result for result in results if result is not None]
 
 
 # if __name__ == "__main__":
@@ -1,23 +1,25 @@
+import heapq
 import logging
 from datetime import datetime
 from pathlib import Path
+from typing import Iterable, Optional, Union
 
+import numpy as np
 import pandas as pd
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-file_path_log = BASE_DIR / "logs" / "views.log"
+from cube import TransactionCube
+from log_config import get_logger
+from services import SOURCE_ROW_COLUMN
+from sqlite_store import SqliteTransactions
+from utils import select_date_range
 
-logger = logging.getLogger("views")
-logger.setLevel(logging.DEBUG)
-file_handler = logging.FileHandler(file_path_log, mode="w", encoding="utf-8")
-file_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s: %(message)s")
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
+BASE_DIR = Path(__file__).resolve().parent.parent
+logger = get_logger("views")
 
 
 def get_greeting(hour: int) -> str:
     """Возвращает приветствие в зависимости от часа."""
-    logger.debug(f"Вывод приветствия в зависимости от часа: {hour}")
+    logger.debug("Вывод приветствия в зависимости от часа: %s", hour)
     if 6 <= hour < 12:
         return "Доброе утро"
     elif 12 <= hour < 18:
@@ -30,50 +32,309 @@ def get_greeting(hour: int) -> str:
 
 def parse_datetime(datetime_str: str) -> datetime:
     """Парсит строку с датой и временем в формате YYYY-MM-DD HH:MM:SS в объект datetime."""
-    logger.debug(f"Получаем объект datetime из строки {datetime_str}")
+    logger.debug("Получаем объект datetime из строки %s", datetime_str)
     return datetime.strptime(datetime_str, "%Y-%m-%d %H:%M:%S")
 
 
-def filter_df_by_date(df: pd.DataFrame, input_date: datetime) -> pd.DataFrame:
-    """Фильтрует DataFrame по дате, возвращая данные за текущий месяц."""
-    df["Дата операции"] = pd.to_datetime(df["Дата операции"], format="%d.%m.%Y %H:%M:%S")
+def filter_df_by_date(
+    df: Union[pd.DataFrame, SqliteTransactions], input_date: datetime
+) -> Union[pd.DataFrame, SqliteTransactions]:
+    """Фильтрует DataFrame по дате, возвращая данные за текущий месяц.
+
+    Для SqliteTransactions возвращается диапазон дат в базе, по которому get_card_sum_cashback
+    и get_topfive_transactions выполняют запросы к базе (DataFrame дает метод to_frame).
+    """
     start_of_month = input_date.replace(day=1, hour=0, minute=0, second=0)
-    logger.debug(
-        f"Определен диапазон дат для фильтрации dataframe: "
-        f"{start_of_month.strftime('%d.%m.%Y')} - {input_date.strftime('%d.%m.%Y')}"
-    )
-    filtered_df = df[(df["Дата операции"] >= start_of_month) & (df["Дата операции"] <= input_date)]
-    logger.info(
-        f"Данные отобраны за текущий месяц: "
-        f"{start_of_month.strftime('%d.%m.%Y')} - {input_date.strftime('%d.%m.%Y')}"
-    )
+    period = (start_of_month, input_date)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Определен диапазон дат для фильтрации dataframe: %s - %s", *_format_dates(period))
+    if isinstance(df, SqliteTransactions):
+        filtered_df: Union[pd.DataFrame, SqliteTransactions] = df.date_range(start_of_month, input_date)
+    else:
+        filtered_df = select_date_range(df, start_of_month, input_date)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Данные отобраны за текущий месяц: %s - %s", *_format_dates(period))
     return filtered_df
 
 
-def get_card_sum_cashback(df: pd.DataFrame) -> pd.DataFrame:
-    """Подсчет общей суммы расходов и кешбэка по каждой карте."""
-    df = df.dropna(subset=["Номер карты"]).copy()
+def _format_dates(dates: Iterable[datetime]) -> list[str]:
+    """Даты в формате ДД.ММ.ГГГГ для сообщений лога."""
+    return [date.strftime("%d.%m.%Y") for date in dates]
+
+
+def _card_sums(df: pd.DataFrame) -> pd.Series:
+    """Суммы успешных операций по последним четырем цифрам номера карты."""
+    df = df.dropna(subset=["Номер карты"])
     df = df[df["Статус"] == "OK"]
-    df.loc[:, "last_digits"] = df["Номер карты"].astype(str).str[-4:]
+    amounts = df["Сумма операции с округлением"]
+    if "last_digits" in df and isinstance(df["last_digits"].dtype, pd.CategoricalDtype):
+        # группировка по кодам категорий без преобразования номеров карт в строки
+        card_sums = amounts.groupby(df["last_digits"], observed=True).sum()
+        card_sums.index = card_sums.index.astype(str)
+        return card_sums.sort_index()
+    if "last_digits" in df:
+        last_digits = df["last_digits"].astype(str)
+    else:
+        last_digits = df["Номер карты"].astype(str).str[-4:].rename("last_digits")
+    return amounts.groupby(last_digits).sum()
+
+
+def _card_cashback(df: pd.DataFrame) -> pd.Series:
+    """Кешбэк по картам, как в прежнем расчете: round(сумма / 100, 2) по успешным операциям в порядке файла.
+
+    Половина копейки кешбэка округляется по последнему разряду суммы с плавающей точкой, который зависит
+    от порядка сложения, поэтому операции складываются в порядке исходного файла (см. _source_rows).
+    """
+    positions = np.flatnonzero((df["Номер карты"].notna() & (df["Статус"] == "OK")).to_numpy())
+    positions = positions[np.argsort(_source_rows(df)[positions], kind="stable")]
+    if "last_digits" in df and isinstance(df["last_digits"].dtype, pd.CategoricalDtype):
+        card_codes = df["last_digits"].cat.codes.to_numpy()[positions]
+        cards = df["last_digits"].cat.categories.astype(str)
+    else:
+        last_digits = df["last_digits"] if "last_digits" in df else df["Номер карты"].astype(str).str[-4:]
+        card_codes, cards = pd.factorize(last_digits.astype(str).to_numpy()[positions])
+    # Series.sum складывает значения numpy, заменяя пропуски нулями
+    amounts = np.nan_to_num(df["Сумма операции с округлением"].to_numpy(dtype="float64")[positions])
+    cashback = {cards[code]: round(amounts[card_codes == code].sum() / 100, 2) for code in np.unique(card_codes)}
+    return pd.Series(cashback, dtype="float64")
+
+
+def get_card_sum_cashback(df: Union[pd.DataFrame, Iterable[pd.DataFrame], SqliteTransactions]) -> pd.DataFrame:
+    """Подсчет общей суммы расходов и кешбэка по каждой карте.
+
+    Принимает DataFrame или итератор порций DataFrame, порции обрабатываются по одной.
+    Для SqliteTransactions суммы считаются запросом GROUP BY в базе.
+    """
+    cashback = None
+    if isinstance(df, pd.DataFrame):
+        card_sums = _card_sums(df)
+        cashback = _card_cashback(df)
+    elif isinstance(df, SqliteTransactions):
+        card_sums = df.card_sums()
+    else:
+        card_sums = None
+        for chunk in df:
+            chunk_sums = _card_sums(chunk)
+            card_sums = chunk_sums if card_sums is None else pd.concat([card_sums, chunk_sums]).groupby(level=0).sum()
+        if card_sums is None:
+            card_sums = pd.Series(dtype="float64", index=pd.Index([], dtype="object", name="last_digits"))
     logger.debug("DataFrame подготовлен для подсчета общей суммы расходов и кешбэка.")
-    summary_df = (
-        df.groupby("last_digits")
-        .agg(
-            total_spent=("Сумма операции с округлением", "sum"),
-            cashback=("Сумма операции с округлением", lambda x: round(x.sum() / 100, 2)),
-        )
-        .reset_index()
-    )
+    summary_df = _build_card_summary(card_sums, cashback)
     logger.info("Общая сумма расходов и кешбэка по каждой карте посчитаны.")
     return summary_df
 
 
-def get_topfive_transactions(df: pd.DataFrame) -> pd.DataFrame:
-    """Топ-5 транзакций по сумме платежа."""
-    filtered_df = df[df["Статус"] == "OK"]
-    sorted_df = filtered_df.sort_values(by="Сумма операции с округлением", ascending=False)
-    logger.info("Топ-5 транзакций по сумме платежа определены.")
-    return sorted_df.head()
+def get_card_sum_cashback_from_cube(cube: TransactionCube, input_date: datetime) -> pd.DataFrame:
+    """Подсчет общей суммы расходов и кешбэка по каждой карте за текущий месяц по предагрегированному кубу.
+
+    Суммы совпадают с get_card_sum_cashback(filter_df_by_date(df, input_date)), кешбэк считается
+    по суммам в копейках и может отличаться на копейку, когда он приходится ровно на половину копейки.
+    """
+    start_of_month = input_date.replace(day=1, hour=0, minute=0, second=0)
+    summary_df = _build_card_summary(cube.card_sums(start_of_month, input_date))
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Общая сумма расходов и кешбэка по каждой карте посчитаны по кубу за период %s - %s",
+            *_format_dates((start_of_month, input_date)),
+        )
+    return summary_df
+
+
+def _build_card_summary(card_sums: pd.Series, cashback: Optional[pd.Series] = None) -> pd.DataFrame:
+    """Формирует DataFrame с суммой расходов и кешбэком по картам.
+
+    Если кешбэк не передан (порции, куб, база), он считается по суммам в копейках.
+    """
+    # суммы в копейках не зависят от порядка суммирования строк (порции, куб, сортировка)
+    card_sums = card_sums.round(2)
+    if cashback is None:
+        # np.round, как round для np.float64 в прежнем расчете: встроенная round округляет иначе
+        cashback_values = (card_sums / 100).round(2).to_numpy()
+    else:
+        cashback_values = cashback.reindex(card_sums.index).to_numpy()
+    return pd.DataFrame(
+        {
+            "last_digits": card_sums.index,
+            "total_spent": card_sums.values,
+            "cashback": cashback_values,
+        }
+    )
+
+
+def _top_transactions(df: pd.DataFrame, n: int, column: str) -> pd.DataFrame:
+    """Первые n успешных транзакций по значению столбца column.
+
+    Используется частичный отбор (np.partition) вместо полной сортировки, сортируются только
+    отобранные строки. Порядок операций с равным значением совпадает с сортировкой sort_values
+    успешных операций в порядке исходного файла (см. _source_rows), как в ответах до перехода на отбор.
+    """
+    values = df[column].to_numpy(dtype="float64")
+    is_candidate = ~np.isnan(values)
+    if "Статус" in df:
+        is_candidate &= (df["Статус"] == "OK").to_numpy()
+    candidates = np.flatnonzero(is_candidate)
+    selected = candidates
+    if len(candidates) > n:
+        threshold = np.partition(values[candidates], len(candidates) - n)[len(candidates) - n]
+        selected = candidates[values[candidates] >= threshold]
+    if len(selected) > n or len(np.unique(values[selected])) < len(selected):
+        # порядок равных значений при сортировке sort_values (quicksort) зависит от всех строк,
+        # поэтому при совпадении сумм сортируются все успешные операции в порядке исходного файла
+        in_source_order = candidates[np.argsort(_source_rows(df)[candidates], kind="stable")]
+        order = pd.Series(values[in_source_order]).sort_values(ascending=False).index.to_numpy()
+        top_positions = in_source_order[order[:n]]
+    else:
+        top_positions = selected[np.argsort(-values[selected])]
+    return df.iloc[top_positions]
+
+
+def _source_rows(df: pd.DataFrame) -> np.ndarray:
+    """Номера строк в исходном файле: столбец source_row канонического DataFrame или позиции строк."""
+    if SOURCE_ROW_COLUMN not in df:
+        return np.arange(len(df))
+    source_rows: np.ndarray = df[SOURCE_ROW_COLUMN].to_numpy()
+    return source_rows
+
+
+def merge_top_transactions(
+    parts: Iterable[pd.DataFrame], n: int = 5, column: str = "Сумма операции с округлением"
+) -> pd.DataFrame:
+    """Объединяет топ-n, посчитанные по отдельным порциям или частям данных, в общий топ-n.
+
+    Части должны идти в исходном порядке строк, тогда из операций с равным значением первой идет более ранняя.
+    """
+    top_df = None
+    for part in parts:
+        part_top = _top_transactions(part, n, column)
+        top_df = part_top if top_df is None else _top_transactions(pd.concat([top_df, part_top]), n, column)
+    if top_df is None:
+        top_df = pd.DataFrame(columns=["Статус", column])
+    return top_df
+
+
+def get_top_transactions(
+    df: Union[pd.DataFrame, Iterable[pd.DataFrame], SqliteTransactions],
+    n: int = 5,
+    column: str = "Сумма операции с округлением",
+) -> pd.DataFrame:
+    """Топ-n успешных транзакций по значению столбца column (по умолчанию - по сумме платежа).
+
+    Принимает DataFrame или итератор порций DataFrame, от каждой порции хранится только ее топ-n.
+    Для SqliteTransactions топ-n отбирается в базе запросом ORDER BY ... LIMIT n.
+    """
+    if isinstance(df, pd.DataFrame):
+        top_df = _top_transactions(df, n, column)
+    elif isinstance(df, SqliteTransactions):
+        top_df = df.top_transactions(n, column)
+    else:
+        top_df = merge_top_transactions(df, n, column)
+    logger.info("Топ-%s транзакций по столбцу '%s' определены.", n, column)
+    return top_df
+
+
+def get_topfive_transactions(df: Union[pd.DataFrame, Iterable[pd.DataFrame], SqliteTransactions]) -> pd.DataFrame:
+    """Топ-5 транзакций по сумме платежа.
+
+    Принимает DataFrame или итератор порций DataFrame, от каждой порции хранится только ее топ-5.
+    """
+    return get_top_transactions(df, 5)
+
+
+def _sorted_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    """Возвращает DataFrame, отсортированный по дате операции (канонический DataFrame не копируется)."""
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.is_monotonic_increasing:
+        return df
+    return df.sort_values("Дата операции", kind="stable")
+
+
+def get_card_sum_cashback_batch(df: pd.DataFrame, input_dates: list[datetime]) -> list[pd.DataFrame]:
+    """Подсчет общей суммы расходов и кешбэка по каждой карте за текущий месяц для каждой из дат.
+
+    Суммы для каждой даты совпадают с get_card_sum_cashback(filter_df_by_date(df, input_date)),
+    кешбэк считается по суммам в копейках, как в get_card_sum_cashback_from_cube.
+    Суммы с начала месяца берутся из накопленных сумм по каждой карте, поэтому весь пакет
+    обрабатывается за один проход по операциям.
+    """
+    df = _sorted_by_date(df)
+    df = df[(df["Статус"] == "OK") & df["Номер карты"].notna()]
+    if "last_digits" in df:
+        last_digits = df["last_digits"].astype(str)
+    else:
+        last_digits = df["Номер карты"].astype(str).str[-4:]
+    amounts = df["Сумма операции с округлением"]
+    # дробные суммы накапливаются в копейках, чтобы результат не зависел от порядка суммирования;
+    # пропущенные суммы, как и при суммировании в get_card_sum_cashback, считаются нулевыми
+    scale = 1 if pd.api.types.is_integer_dtype(amounts) else 100
+    scaled_amounts = np.round(amounts.fillna(0).to_numpy(dtype="float64") * scale).astype("int64")
+    dates = df["Дата операции"].to_numpy()
+    anchors = np.array(input_dates, dtype="datetime64[ns]")
+    month_starts = np.array(
+        [input_date.replace(day=1, hour=0, minute=0, second=0) for input_date in input_dates], dtype="datetime64[ns]"
+    )
+
+    totals: list[dict[str, int]] = [{} for _ in input_dates]
+    for card, positions in sorted(last_digits.groupby(last_digits).indices.items()):
+        card_dates = dates[positions]
+        cumulative = np.concatenate([[0], np.cumsum(scaled_amounts[positions])])
+        end_pos = np.searchsorted(card_dates, anchors, side="right")
+        start_pos = np.searchsorted(card_dates, month_starts, side="left")
+        for index in np.flatnonzero(end_pos > start_pos):
+            totals[index][card] = cumulative[end_pos[index]] - cumulative[start_pos[index]]
+
+    summaries = []
+    for card_totals in totals:
+        card_sums = pd.Series(card_totals, dtype="int64", index=pd.Index(list(card_totals), name="last_digits"))
+        summaries.append(_build_card_summary(card_sums if scale == 1 else card_sums / scale))
+    logger.info("Общая сумма расходов и кешбэка по каждой карте посчитаны для %s дат.", len(input_dates))
+    return summaries
+
+
+def get_topfive_transactions_batch(df: pd.DataFrame, input_dates: list[datetime], n: int = 5) -> list[pd.DataFrame]:
+    """Топ-5 (или топ-n) транзакций по сумме платежа за текущий месяц для каждой из дат.
+
+    Результат для каждой даты совпадает с get_top_transactions(filter_df_by_date(df, input_date), n).
+    Топ-n поддерживается в куче при одном проходе по операциям в порядке дат.
+    """
+    added_source_rows = SOURCE_ROW_COLUMN not in df
+    if added_source_rows:
+        # порядок исходных строк нужен для операций с равной суммой (см. _top_transactions)
+        df = df.assign(**{SOURCE_ROW_COLUMN: np.arange(len(df))})
+    df = _sorted_by_date(df)
+    ok_positions = np.flatnonzero(((df["Статус"] == "OK") & df["Сумма операции с округлением"].notna()).to_numpy())
+    dates = df["Дата операции"].to_numpy()[ok_positions]
+    months = dates.astype("datetime64[M]")
+    amounts = df["Сумма операции с округлением"].to_numpy()[ok_positions]
+    anchors = np.array(input_dates, dtype="datetime64[ns]")
+
+    results: list[pd.DataFrame] = [df.iloc[:0]] * len(input_dates)
+    heap: list[tuple] = []
+    heap_month = None
+    month_start = row = 0
+    for index in np.argsort(anchors, kind="stable"):
+        anchor = anchors[index]
+        while row < len(dates) and dates[row] <= anchor:
+            if months[row] != heap_month:
+                heap, heap_month, month_start = [], months[row], row
+            # при равной сумме из кучи первой вытесняется более поздняя операция
+            item = (amounts[row], -row)
+            if len(heap) < n:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+            row += 1
+        if heap and heap_month == anchor.astype("datetime64[M]"):
+            top_amounts = [amount for amount, _ in heap]
+            if len(set(top_amounts)) < len(heap) or np.count_nonzero(amounts[month_start:row] >= heap[0][0]) > n:
+                # равные суммы упорядочиваются по всем операциям месяца, как в _top_transactions
+                month_df = df.iloc[ok_positions[month_start:row]]
+                results[index] = _top_transactions(month_df, n, "Сумма операции с округлением")
+            else:
+                top_rows = [-position for _, position in sorted(heap, reverse=True)]
+                results[index] = df.iloc[ok_positions[top_rows]]
+    if added_source_rows:
+        results = [result.drop(columns=SOURCE_ROW_COLUMN) for result in results]
+    logger.info("Топ-%s транзакций по сумме платежа определены для %s дат.", n, len(input_dates))
+    return results
 
 
 # if __name__ == "__main__":
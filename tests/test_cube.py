@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src.cube import TransactionCube
+from src.utils import prepare_transactions
+
+
+@pytest.fixture
+def card_transactions():
+    """Операции по картам в каноническом виде."""
+    return prepare_transactions(
+        pd.DataFrame(
+            {
+                "Дата операции": [
+                    "31.08.2021 23:59:59",
+                    "01.09.2021 10:00:00",
+                    "01.09.2021 18:00:00",
+                    "15.09.2021 12:00:00",
+                    "15.09.2021 20:00:00",
+                    "30.09.2021 14:00:00",
+                ],
+                "Номер карты": ["*1111", "*1111", None, "*2222", "*1111", "*2222"],
+                "Статус": ["OK", "OK", "OK", "OK", "FAILED", "OK"],
+                "Категория": ["Переводы", "Супермаркеты", "Переводы", "Переводы", "Супермаркеты", "Переводы"],
+                "Сумма операции с округлением": [100.0, 200.0, 300.0, 400.0, 500.0, 600.0],
+            }
+        )
+    )
+
+
+def test_cells_in_range_partial_days(card_transactions):
+    cube = TransactionCube(card_transactions)
+    cells = cube.cells_in_range(datetime(2021, 9, 1, 12, 0), datetime(2021, 9, 15, 13, 0))
+    assert cells["total"].sum() == 700.0
+    assert cells["count"].sum() == 2
+
+
+def test_card_sums(card_transactions):
+    cube = TransactionCube(card_transactions)
+    card_sums = cube.card_sums(datetime(2021, 9, 1), datetime(2021, 9, 30, 23, 59, 59))
+    assert card_sums.to_dict() == {"1111": 200.0, "2222": 1000.0}
+
+
+def test_category_totals(card_transactions):
+    cube = TransactionCube(card_transactions)
+    totals = cube.category_totals(datetime(2021, 8, 31), datetime(2021, 9, 15, 23, 0))
+    assert totals.set_index("Категория")["total"].to_dict() == {"Переводы": 800.0, "Супермаркеты": 700.0}
+
+
+def test_append(card_transactions):
+    cube = TransactionCube(card_transactions.iloc[:4])
+    cube.append(card_transactions.iloc[4:])
+    full_cube = TransactionCube(card_transactions)
+    pd.testing.assert_frame_equal(cube.cells, full_cube.cells)
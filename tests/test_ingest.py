@@ -0,0 +1,104 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cube import TransactionCube
+from src.ingest import TransactionStore, row_keys
+from src.utils import prepare_transactions
+
+
+def make_statement(rows):
+    return pd.DataFrame(
+        rows,
+        columns=["Дата операции", "Номер карты", "Статус", "Сумма операции с округлением", "Категория", "Описание"],
+    )
+
+
+ROW_1 = ["01.09.2021 10:00:00", "*7197", "OK", 100.0, "Супермаркеты", "Колхоз"]
+ROW_2 = ["02.09.2021 11:00:00", "*7197", "OK", 250.5, "Фастфуд", "Бургер Кинг"]
+ROW_3 = ["03.09.2021 12:00:00", "*4556", "OK", 300.0, "Переводы", "Иван С."]
+ROW_4 = ["04.09.2021 13:00:00", "*4556", "FAILED", 50.0, "Транспорт", "Метро"]
+
+
+@pytest.fixture
+def statements(tmp_path):
+    first = tmp_path / "operations.xlsx"
+    second = tmp_path / "operations_2.xlsx"
+    # одинаковая операция дважды в одном файле - это две операции
+    make_statement([ROW_1, ROW_2, ROW_2]).to_excel(first, index=False)
+    # выписки пересекаются по ROW_2
+    make_statement([ROW_2, ROW_3]).to_excel(second, index=False)
+    return first, second
+
+
+def test_row_keys():
+    df = prepare_transactions(make_statement([ROW_1, ROW_2, ROW_2]))
+    keys = row_keys(df)
+    assert len(set(keys)) == 3
+    # ключ не зависит от других строк и порядка категорий
+    assert row_keys(prepare_transactions(make_statement([ROW_2])))[0] == keys[1]
+
+
+def test_store_ingest(statements, tmp_path):
+    store = TransactionStore()
+    store.register_directory(tmp_path)
+    assert store.ingest() == 4
+    assert store.version == 1
+    transactions = store.transactions
+    assert transactions.index.is_monotonic_increasing
+    assert transactions["Описание"].tolist() == ["Колхоз", "Бургер Кинг", "Бургер Кинг", "Иван С."]
+    for column in ("Номер карты", "Категория", "Статус", "last_digits"):
+        assert isinstance(transactions[column].dtype, pd.CategoricalDtype)
+
+    # неизменившиеся файлы не разбираются
+    with patch("src.ingest.read_excel_file") as mock_read_excel:
+        assert store.ingest() == 0
+    mock_read_excel.assert_not_called()
+    assert store.version == 1
+
+    # в измененном файле добавляются только новые операции
+    make_statement([ROW_2, ROW_3, ROW_4]).to_excel(statements[1], index=False)
+    assert store.ingest() == 1
+    assert store.version == 2
+    assert len(store.transactions) == 5
+    assert store.rows_since(1)["Описание"].tolist() == ["Метро"]
+    assert len(store.rows_since(0)) == 5
+
+
+def test_store_rows_since_cube(statements):
+    store = TransactionStore()
+    store.register(statements[0])
+    store.ingest()
+    cube = TransactionCube(store.transactions)
+    version = store.version
+
+    store.register(statements[1])
+    store.ingest()
+    cube.append(store.rows_since(version))
+    start, end = pd.Timestamp("2021-09-01"), pd.Timestamp("2021-09-30")
+    expected = TransactionCube(store.transactions).card_sums(start, end)
+    pd.testing.assert_series_equal(cube.card_sums(start, end), expected, check_index_type=False)
+
+
+def test_store_ingest_error_keeps_state(statements):
+    store = TransactionStore()
+    store.register(*statements)
+    with patch("src.ingest.prepare_transactions", side_effect=ValueError("неверная дата")):
+        with pytest.raises(ValueError):
+            store.ingest()
+    assert store.version == 0
+    assert store.ingest() == 4
+    assert np.array_equal(np.sort(store.snapshot.row_versions), np.ones(4))
+
+
+def test_store_ingest_unreadable_file_retried(statements):
+    store = TransactionStore()
+    store.register(statements[0])
+    # файл занят другим процессом: read_excel_file возвращает пустой DataFrame
+    with patch("src.utils.pd.read_excel", side_effect=PermissionError("файл занят")):
+        assert store.ingest() == 0
+    assert store.version == 0
+    assert store.ingest() == 3
+    assert store.version == 1
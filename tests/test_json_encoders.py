@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from src.json_encoders import encode_json, encode_orjson, get_encoder
+
+RESPONSE = {
+    "greeting": "Добрый вечер",
+    "cards": [{"last_digits": "3456", "total_spent": 1000.5, "cashback": 10.01}],
+    "stock_prices": [],
+}
+
+
+def test_encode_json():
+    assert encode_json(RESPONSE) == json.dumps(RESPONSE, indent=4, ensure_ascii=False)
+    compact = encode_json(RESPONSE, compact=True)
+    assert "\n" not in compact and ", " not in compact
+    assert json.loads(compact) == RESPONSE
+
+
+def test_encode_orjson():
+    pytest.importorskip("orjson")
+    assert json.loads(encode_orjson(RESPONSE)) == RESPONSE
+    assert encode_orjson(RESPONSE, compact=True) == encode_json(RESPONSE, compact=True)
+
+
+def test_get_encoder():
+    assert get_encoder("json") is encode_json
+    with pytest.raises(ValueError):
+        get_encoder("yaml")
@@ -0,0 +1,61 @@
+from src import log_config
+from src.log_config import get_logger, set_log_level, start_logging, stop_logging
+
+
+class StrCounter:
+    """Аргумент сообщения, считающий обращения к __str__."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "значение"
+
+
+def test_get_logger_writes_module_file(tmp_path, monkeypatch):
+    """Тест записи сообщений модуля в отдельный файл через фоновый поток."""
+    monkeypatch.setattr(log_config, "LOG_DIR", tmp_path)
+    logger = get_logger("test_module")
+    start_logging()
+    logger.info("Обработано %s операций", 3)
+    stop_logging()
+    log_text = (tmp_path / "test_module.log").read_text(encoding="utf-8")
+    assert "test_module - INFO: Обработано 3 операций" in log_text
+
+
+def test_lazy_formatting_below_level(tmp_path, monkeypatch):
+    """Тест: сообщения ниже уровня логгера не форматируются."""
+    monkeypatch.setattr(log_config, "LOG_DIR", tmp_path)
+    logger = get_logger("test_quiet_module")
+    start_logging()
+    set_log_level("test_quiet_module", "WARNING")
+    debug_argument, warning_argument = StrCounter(), StrCounter()
+    logger.debug("Отладочное сообщение: %s", debug_argument)
+    logger.warning("Предупреждение: %s", warning_argument)
+    stop_logging()
+    assert debug_argument.calls == 0
+    assert warning_argument.calls > 0
+    log_text = (tmp_path / "test_quiet_module.log").read_text(encoding="utf-8")
+    assert "Отладочное сообщение" not in log_text
+    assert "Предупреждение: значение" in log_text
+
+
+def test_level_from_environment(tmp_path, monkeypatch):
+    """Тест уровня логирования модуля из переменной окружения LOG_LEVEL_<МОДУЛЬ>."""
+    monkeypatch.setattr(log_config, "LOG_DIR", tmp_path)
+    monkeypatch.setenv("LOG_LEVEL_TEST_ENV_MODULE", "ERROR")
+    logger = get_logger("test_env_module")
+    start_logging()
+    try:
+        assert logger.getEffectiveLevel() == 40
+    finally:
+        stop_logging()
+
+
+def test_get_logger_has_no_side_effects(tmp_path, monkeypatch):
+    """Тест: до start_logging получение логгера не создает файлов и не запускает поток записи."""
+    monkeypatch.setattr(log_config, "LOG_DIR", tmp_path)
+    get_logger("test_idle_module").info("Сообщение до инициализации")
+    assert list(tmp_path.iterdir()) == []
+    assert log_config._listener is None
@@ -1,11 +1,16 @@
 import json
+import subprocess
+import sys
 from datetime import datetime
+from pathlib import Path
 from unittest.mock import patch
 
 import pandas as pd
 import pytest
 
-from src.main import main
+from src.main import (get_cards_data, get_quote_cache, get_top_data, load_user_settings, main, main_batch,
+                      main_multi_user, read_user_settings)
+from src.utils import prepare_transactions
 
 
 @pytest.fixture
@@ -42,16 +47,18 @@ def mock_excel_file(tmp_path):
 def test_main(mock_read_excel, mock_get_stock_prices, mock_get_currency_rate, mock_user_settings, mock_excel_file):
     datetime_str = "2018-01-10 23:59:59"
 
-    # Mocking the return values of external dependencies
-    mock_read_excel.return_value = pd.DataFrame(
-        {
-            "Дата операции": [datetime(2018, 1, 1, 12, 0), datetime(2018, 1, 5, 14, 0)],
-            "Сумма операции с округлением": [1000.0, 500.0],
-            "Категория": ["Категория1", "Категория2"],
-            "Описание": ["Описание1", "Описание2"],
-            "Номер карты": ["1234567890123456", "1234567890123457"],
-            "Статус": ["OK", "OK"],
-        }
+    # Mocking the return values of external dependencies: read_excel_file возвращает DataFrame в каноническом виде
+    mock_read_excel.return_value = prepare_transactions(
+        pd.DataFrame(
+            {
+                "Дата операции": [datetime(2018, 1, 1, 12, 0), datetime(2018, 1, 5, 14, 0)],
+                "Сумма операции с округлением": [1000.0, 500.0],
+                "Категория": ["Категория1", "Категория2"],
+                "Описание": ["Описание1", "Описание2"],
+                "Номер карты": ["1234567890123456", "1234567890123457"],
+                "Статус": ["OK", "OK"],
+            }
+        )
     )
     mock_get_currency_rate.return_value = [{"currency": "USD", "rate": 74.85}, {"currency": "EUR", "rate": 89.12}]
     mock_get_stock_prices.return_value = [{"stock": "AAPL", "price": 150.25}, {"stock": "TSLA", "price": 725.50}]
@@ -86,3 +93,160 @@ def test_main(mock_read_excel, mock_get_stock_prices, mock_get_currency_rate, mo
 
             # Проверяем, что данные по акциям корректны
             assert response["stock_prices"] == [{"stock": "AAPL", "price": 150.25}, {"stock": "TSLA", "price": 725.50}]
+
+
+@patch("src.main.get_currency_rate")
+@patch("src.main.get_stock_prices")
+def test_main_batch(mock_get_stock_prices, mock_get_currency_rate, mock_user_settings, mock_excel_file):
+    mock_get_currency_rate.return_value = [{"currency": "USD", "rate": 74.85}]
+    mock_get_stock_prices.return_value = [{"stock": "AAPL", "price": 150.25}]
+    datetime_strs = ["2018-01-10 23:59:59", "2018-01-03 08:00:00", "2018-02-01 12:00:00"]
+
+    with patch("src.main.user_settings_path", mock_user_settings):
+        with patch("src.main.file_path_xlsx", mock_excel_file):
+            with patch("src.main.CACHE_DIR", None):
+                responses = main_batch(datetime_strs)
+                # котировки запрашиваются один раз на весь пакет
+                mock_get_currency_rate.assert_called_once()
+                mock_get_stock_prices.assert_called_once()
+                assert responses == [main(datetime_str) for datetime_str in datetime_strs]
+
+
+@patch("src.main.get_currency_rate", return_value=[])
+@patch("src.main.get_stock_prices", return_value=[])
+def test_main_timings(mock_get_stock_prices, mock_get_currency_rate, mock_user_settings, mock_excel_file):
+    """Тест блока "_timings" с длительностями этапов и счетчиками; без timings блока нет."""
+    with patch("src.main.user_settings_path", mock_user_settings):
+        with patch("src.main.file_path_xlsx", mock_excel_file):
+            with patch("src.main.CACHE_DIR", None):
+                response = json.loads(main("2018-01-10 23:59:59", timings=True))
+                plain_response = json.loads(main("2018-01-10 23:59:59"))
+    timings = response.pop("_timings")
+    assert response == plain_response
+    assert set(timings["stages_ms"]) == {
+        "read_excel",
+        "prepare",
+        "read_settings",
+        "filter_by_date",
+        "card_summary",
+        "top_transactions",
+        "currency_rates",
+        "stock_prices",
+        "json",
+    }
+    assert timings["counters"] == {"rows_loaded": 2, "rows_scanned": 2}
+
+
+@patch("src.main.get_currency_rate", return_value=[{"currency": "USD", "rate": 74.85}])
+@patch("src.main.get_stock_prices", return_value=[])
+def test_main_compact(mock_get_stock_prices, mock_get_currency_rate, mock_user_settings, mock_excel_file):
+    datetime_str = "2018-01-10 23:59:59"
+    with patch("src.main.user_settings_path", mock_user_settings):
+        with patch("src.main.file_path_xlsx", mock_excel_file):
+            with patch("src.main.CACHE_DIR", None):
+                response_json = main(datetime_str)
+                compact_json = main(datetime_str, compact=True)
+                batch_json = main_batch([datetime_str], compact=True)
+                with pytest.raises(ValueError):
+                    main(datetime_str, encoder="yaml")
+    assert "\n" not in compact_json
+    assert json.loads(compact_json) == json.loads(response_json)
+    assert batch_json == [compact_json]
+
+
+def test_response_records():
+    """Записи ответа совпадают с построчной обработкой: округление встроенной round, даты ДД.ММ.ГГГГ."""
+    summary_df = pd.DataFrame({"last_digits": ["3456"], "total_spent": [1.005], "cashback": [0.01005]})
+    assert get_cards_data(summary_df) == [{"last_digits": "3456", "total_spent": 1.0, "cashback": 0.01}]
+    topfive_df = pd.DataFrame(
+        {
+            "Дата операции": [datetime(2018, 1, 5, 14, 0)],
+            "Сумма операции с округлением": [2.675],
+            "Категория": pd.Categorical(["Категория1"]),
+            "Описание": ["Описание1"],
+        }
+    )
+    assert get_top_data(topfive_df) == [
+        {"date": "05.01.2018", "amount": 2.67, "category": "Категория1", "description": "Описание1"}
+    ]
+    assert get_cards_data(summary_df.iloc[:0]) == []
+
+
+def fake_currency_rate(cur_list, **kwargs):
+    return [{"currency": currency, "rate": float(len(currency))} for currency in cur_list]
+
+
+def fake_stock_prices(stock_list, **kwargs):
+    # по акции NOPE нет данных, она пропускается
+    return [{"stock": symbol, "price": 100.0} for symbol in stock_list if symbol != "NOPE"]
+
+
+@patch("src.main.get_currency_rate", side_effect=fake_currency_rate)
+@patch("src.main.get_stock_prices", side_effect=fake_stock_prices)
+def test_main_multi_user(mock_get_stock_prices, mock_get_currency_rate, tmp_path, mock_excel_file):
+    users = [
+        {"user_currencies": ["USD", "EUR"], "user_stocks": ["AAPL", "NOPE"]},
+        {"user_currencies": ["EUR", "CNY"], "user_stocks": ["TSLA", "AAPL"]},
+        {"user_currencies": [], "user_stocks": []},
+    ]
+    settings_paths = []
+    for index, user_settings in enumerate(users):
+        settings_paths.append(tmp_path / f"user_{index}.json")
+        settings_paths[-1].write_text(json.dumps(user_settings))
+    requests = [
+        (settings_paths[0], "2018-01-10 23:59:59"),
+        (settings_paths[1], "2018-01-03 08:00:00"),
+        (users[2], "2018-01-10 23:59:59"),
+        (settings_paths[0], "2018-02-01 12:00:00"),
+    ]
+
+    with patch("src.main.file_path_xlsx", mock_excel_file):
+        with patch("src.main.CACHE_DIR", None):
+            responses = main_multi_user(requests)
+            # котировки запрашиваются один раз для объединения валют и акций всех пользователей
+            mock_get_currency_rate.assert_called_once()
+            assert mock_get_currency_rate.call_args.args[0] == ["USD", "EUR", "CNY"]
+            mock_get_stock_prices.assert_called_once()
+            assert mock_get_stock_prices.call_args.args[0] == ["AAPL", "NOPE", "TSLA"]
+
+            # ответ каждому пользователю совпадает с ответом main для его установок
+            expected = []
+            for settings, date_time_str in requests:
+                settings_path = settings if isinstance(settings, Path) else tmp_path / "inline.json"
+                if not isinstance(settings, Path):
+                    settings_path.write_text(json.dumps(settings))
+                with patch("src.main.user_settings_path", settings_path):
+                    expected.append(main(date_time_str))
+    assert responses == expected
+
+
+def test_load_user_settings(tmp_path):
+    settings_path = tmp_path / "user_settings.json"
+    settings_path.write_text(json.dumps({"user_currencies": ["USD"], "user_stocks": []}))
+    with patch("src.main.read_user_settings", wraps=read_user_settings) as mock_read:
+        assert load_user_settings(settings_path) == {"user_currencies": ["USD"], "user_stocks": []}
+        assert load_user_settings(settings_path) is load_user_settings(settings_path)
+        assert mock_read.call_count == 1
+
+        # измененный файл разбирается заново
+        settings_path.write_text(json.dumps({"user_currencies": ["USD", "EUR"], "user_stocks": []}))
+        assert load_user_settings(settings_path)["user_currencies"] == ["USD", "EUR"]
+        assert mock_read.call_count == 2
+
+
+def test_import_main_without_side_effects():
+    """Тест: импорт main не загружает отложенные зависимости, не открывает логи и не запускает потоки."""
+    src_dir = Path(__file__).resolve().parent.parent / "src"
+    code = (
+        "import sys, threading, main, log_config; "
+        "print(sorted(m for m in ('requests', 'urllib3', 'openpyxl', 'dotenv') if m in sys.modules)); "
+        "print(threading.active_count(), log_config._listener)"
+    )
+    completed = subprocess.run([sys.executable, "-c", code], cwd=src_dir, capture_output=True, text=True, check=True)
+    assert completed.stdout.splitlines() == ["[]", "1 None"]
+
+
+def test_get_quote_cache_refreshes_synchronously(tmp_path):
+    """Кеш котировок однократного запуска обновляет просроченные значения до ответа."""
+    with patch("src.main._quote_cache", None), patch("src.main.QUOTE_CACHE_PATH", tmp_path / "quotes.json"):
+        assert get_quote_cache().background_refresh is False
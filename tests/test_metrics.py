@@ -0,0 +1,69 @@
+import pytest
+
+from src import metrics
+from src.metrics import MetricsRegistry, collect_timings, count, set_sink, stage
+from src.utils import fetch_concurrently
+
+
+@pytest.fixture
+def registry():
+    """Реестр метрик, подключенный на время теста."""
+    registry = MetricsRegistry()
+    set_sink(registry)
+    yield registry
+    set_sink(None)
+
+
+def test_disabled_metrics():
+    """Тест: без приемника и сбора длительностей этапы не измеряются."""
+    assert metrics.get_sink() is None
+    assert not metrics.enabled()
+    assert stage("read_excel") is stage("json")
+    with stage("read_excel"):
+        count("rows_scanned", 10)
+
+
+def test_collect_timings():
+    """Тест сбора длительностей этапов и счетчиков одного запроса."""
+    with collect_timings() as timings:
+        assert metrics.enabled()
+        with stage("read_excel"):
+            count("rows_scanned", 10)
+        with stage("read_excel"):
+            count("rows_scanned", 5)
+        count("upstream_calls")
+    result = timings.as_dict()
+    assert list(result["stages_ms"]) == ["read_excel"]
+    assert result["stages_ms"]["read_excel"] >= 0
+    assert result["counters"] == {"rows_scanned": 15, "upstream_calls": 1}
+
+
+def test_collect_timings_in_fetch_threads():
+    """Тест: счетчики из потоков fetch_concurrently попадают в текущий запрос."""
+
+    def fetch(item):
+        count("upstream_calls")
+        return item
+
+    with collect_timings() as timings:
+        assert fetch_concurrently(fetch, [1, 2, 3], lambda item, error: None) == [1, 2, 3]
+    assert timings.counters == {"upstream_calls": 3}
+
+
+def test_registry_export_prometheus(registry):
+    """Тест выгрузки реестра в текстовом формате Prometheus."""
+    with stage("read_excel"):
+        count("rows_scanned", 10)
+    count("rows_scanned", 5)
+    registry.increment("requests_total", labels={"path": '/main"'})
+    assert registry.counter_value("rows_scanned_total") == 15
+    lines = registry.export_prometheus().splitlines()
+    assert lines[:5] == [
+        "# TYPE requests_total counter",
+        'requests_total{path="/main\\""} 1',
+        "# TYPE rows_scanned_total counter",
+        "rows_scanned_total 15",
+        "# TYPE stage_seconds summary",
+    ]
+    assert lines[5] == 'stage_seconds_count{stage="read_excel"} 1'
+    assert lines[6].startswith('stage_seconds_sum{stage="read_excel"} ')
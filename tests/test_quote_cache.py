@@ -0,0 +1,112 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.quote_cache import QuoteCache
+
+
+def test_get_fresh_hit():
+    cache = QuoteCache()
+    calls = []
+    loader = lambda: calls.append(1) or {"currency": "USD", "rate": 90.0}  # noqa: E731
+    assert cache.get("currency", "USD/RUB", loader) == {"currency": "USD", "rate": 90.0}
+    assert cache.get("currency", "USD/RUB", loader) == {"currency": "USD", "rate": 90.0}
+    assert len(calls) == 1
+    assert cache.stats["hits"] == 1
+
+
+def test_get_stale_while_revalidate():
+    cache = QuoteCache(ttls={"stock": 100})
+    cache.get("stock", "AAPL", lambda: 1)
+    with patch("src.quote_cache.time.time", return_value=time.time() + 200):
+        # просроченное значение отдается сразу, обновление идет в фоне
+        assert cache.get("stock", "AAPL", lambda: 2) == 1
+        cache.wait_for_refreshes()
+    assert cache.get("stock", "AAPL", lambda: 3) == 2
+    assert cache.stats["stale_hits"] == 1
+
+
+def test_get_stale_synchronous_refresh(tmp_path):
+    """Без фонового обновления просроченное значение обновляется до ответа и сохраняется на диск."""
+    store_path = tmp_path / "quotes.json"
+    cache = QuoteCache(ttls={"currency": 100}, store_path=store_path, background_refresh=False)
+    cache.get("currency", "USD/RUB", lambda: {"currency": "USD", "rate": 1.0})
+    with patch("src.quote_cache.time.time", return_value=time.time() + 200):
+        assert cache.get("currency", "USD/RUB", lambda: {"currency": "USD", "rate": 2.0})["rate"] == 2.0
+    with patch("src.quote_cache.time.time", return_value=time.time() + 400):
+        # при ошибке обновления отдается прежнее значение
+        assert cache.get("currency", "USD/RUB", lambda: 1 / 0)["rate"] == 2.0
+    assert cache.stats["stale_hits"] == 2
+    restarted_cache = QuoteCache(store_path=store_path)
+    assert restarted_cache.get("currency", "USD/RUB", lambda: None) == {"currency": "USD", "rate": 2.0}
+
+
+def test_refresh_threads_pruned():
+    """Завершившиеся потоки фонового обновления не накапливаются."""
+    cache = QuoteCache(ttls={"stock": 100})
+    cache.get("stock", "AAPL", lambda: 0)
+    for value in range(1, 6):
+        with patch("src.quote_cache.time.time", return_value=time.time() + 200 * value):
+            cache.get("stock", "AAPL", lambda: value)
+            for thread in list(cache._refresh_threads):
+                thread.join()
+    assert len(cache._refresh_threads) == 1
+
+
+def test_get_single_flight():
+    cache = QuoteCache()
+    calls = []
+    started = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("stock", "AAPL", slow_loader)))]
+    threads[0].start()
+    started.wait()
+    threads += [
+        threading.Thread(target=lambda: results.append(cache.get("stock", "AAPL", slow_loader))) for _ in range(4)
+    ]
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [42] * 5
+    assert len(calls) == 1
+
+
+def test_get_errors_and_none_not_cached():
+    cache = QuoteCache()
+
+    def failing_loader():
+        raise ValueError("API недоступен")
+
+    with pytest.raises(ValueError):
+        cache.get("stock", "AAPL", failing_loader)
+    assert cache.get("stock", "AAPL", lambda: None) is None
+    assert cache.get("stock", "AAPL", lambda: 5) == 5
+
+
+def test_lru_eviction():
+    cache = QuoteCache(max_entries=2)
+    cache.get("stock", "AAPL", lambda: 1)
+    cache.get("stock", "AMZN", lambda: 2)
+    cache.get("stock", "AAPL", lambda: 0)
+    cache.get("stock", "TSLA", lambda: 3)
+    # AMZN давно не использовался и был вытеснен
+    assert cache.get("stock", "AAPL", lambda: 10) == 1
+    assert cache.get("stock", "AMZN", lambda: 20) == 20
+
+
+def test_store_survives_restart(tmp_path):
+    store_path = tmp_path / "quotes.json"
+    QuoteCache(store_path=store_path).get("currency", "USD/RUB", lambda: {"currency": "USD", "rate": 90.0})
+    restarted_cache = QuoteCache(store_path=store_path)
+    assert restarted_cache.get("currency", "USD/RUB", lambda: None) == {"currency": "USD", "rate": 90.0}
+    assert restarted_cache.stats["upstream_calls"] == 0
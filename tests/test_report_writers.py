@@ -0,0 +1,72 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from src.report_writers import BackgroundWriter, get_writer, write_csv, write_excel_streaming
+
+
+@pytest.fixture
+def report():
+    """Небольшой отчет с датами, текстом и числами с пропуском."""
+    return pd.DataFrame(
+        {
+            "Дата операции": pd.to_datetime(["2021-09-01 10:00:00", "2021-09-15 12:00:00", "2021-09-20 09:30:00"]),
+            "Категория": ["Переводы", "Супермаркеты", "Переводы"],
+            "Сумма операции": [-100.5, -200.0, float("nan")],
+        }
+    )
+
+
+def test_write_excel_streaming(tmp_path, report, monkeypatch):
+    """Тест потоковой записи xlsx порциями строк."""
+    monkeypatch.setattr("src.report_writers.STREAM_CHUNK_ROWS", 2)
+    path = tmp_path / "report.xlsx"
+    write_excel_streaming(report, path)
+    pd.testing.assert_frame_equal(pd.read_excel(path), report)
+
+
+def test_write_csv(tmp_path, report):
+    """Тест записи отчета в CSV."""
+    path = tmp_path / "report.csv"
+    write_csv(report, path)
+    result = pd.read_csv(path, encoding="utf-8-sig", parse_dates=["Дата операции"])
+    pd.testing.assert_frame_equal(result, report)
+
+
+def test_get_writer_unknown():
+    """Тест запроса неизвестного формата отчета."""
+    with pytest.raises(ValueError):
+        get_writer("pdf")
+
+
+def test_background_writer(tmp_path, report):
+    """Тест фоновой записи: submit возвращает управление сразу, flush дожидается записи."""
+    release = threading.Event()
+    written = []
+
+    def slow_writer(df, path):
+        release.wait(5)
+        written.append(path)
+
+    writer = BackgroundWriter(max_queued=2)
+    writer.submit(slow_writer, report, tmp_path / "first.csv")
+    writer.submit(slow_writer, report, tmp_path / "second.csv")
+    assert writer.flush(timeout=0.05) is False
+    release.set()
+    assert writer.flush(timeout=5) is True
+    assert written == [tmp_path / "first.csv", tmp_path / "second.csv"]
+
+
+def test_background_writer_error(tmp_path, report):
+    """Тест фоновой записи с ошибкой: ошибка сохраняется, поток продолжает работу."""
+
+    def failing_writer(df, path):
+        raise OSError("Диск недоступен")
+
+    writer = BackgroundWriter()
+    writer.submit(failing_writer, report, tmp_path / "failed.csv")
+    writer.submit(write_csv, report, tmp_path / "report.csv")
+    assert writer.flush(timeout=5) is True
+    assert [path.name for path, _ in writer.errors] == ["failed.csv"]
+    assert (tmp_path / "report.csv").exists()
@@ -1,7 +1,12 @@
 import pandas as pd
+import pytest
 
-from src.reports import (save_report_to_file_no_filename_input, save_report_to_file_with_filename_input,
-                         spending_by_category)
+from src import reports
+from src.cube import TransactionCube
+from src.reports import (rolling_spending_by_category, save_report_to_file_no_filename_input,
+                         save_report_to_file_with_filename_input, spending_by_category, spending_by_category_bulk,
+                         spending_totals_by_category)
+from src.utils import prepare_transactions
 
 
 def test_spending_by_category(sample_transactions):
@@ -12,6 +17,52 @@ def test_spending_by_category(sample_transactions):
     assert (result["Категория"] == "Переводы").all(), "Все транзакции должны быть в категории 'Переводы'"
 
 
+def test_spending_by_category_chunks(sample_transactions):
+    """Тестирует функцию spending_by_category на итераторе порций DataFrame."""
+    chunks = iter([sample_transactions.iloc[:2], sample_transactions.iloc[2:4], sample_transactions.iloc[4:]])
+    result = spending_by_category(chunks, "Переводы", "15.02.2022")
+    expected = spending_by_category(sample_transactions, "Переводы", "15.02.2022")
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_spending_totals_by_category(sample_transactions):
+    """Тестирует подсчет трат по категориям по кубу в том же диапазоне дат, что и spending_by_category."""
+    df = prepare_transactions(sample_transactions.rename(columns={"Сумма": "Сумма операции с округлением"}))
+    df["Номер карты"], df["Статус"], df["last_digits"] = None, "OK", None
+    result = spending_totals_by_category(TransactionCube(df), "15.02.2022")
+    expected = spending_by_category(df, "Переводы", "15.02.2022")
+    transfers = result.set_index("Категория").loc["Переводы"]
+    assert transfers["total_spent"] == expected["Сумма операции с округлением"].sum()
+    assert transfers["operations_count"] == len(expected)
+
+
+REPORT_REQUESTS = [
+    ("Переводы", "15.02.2022"),
+    ("Супермаркеты", "15.02.2022"),
+    ("Переводы", "01.12.2021"),
+    ("Нет такой категории", "15.02.2022"),
+]
+
+
+@pytest.mark.parametrize("prepared", [True, False])
+def test_spending_by_category_bulk(sample_transactions, prepared):
+    """Тестирует построение отчетов для многих пар (категория, дата) в одном вызове."""
+    df = prepare_transactions(sample_transactions) if prepared else sample_transactions
+    result = spending_by_category_bulk(df, REPORT_REQUESTS)
+    assert len(result) == len(REPORT_REQUESTS)
+    for frame, (category, input_date) in zip(result, REPORT_REQUESTS):
+        pd.testing.assert_frame_equal(frame, spending_by_category(df, category, input_date))
+
+
+def test_spending_by_category_bulk_parallel(sample_transactions, monkeypatch):
+    """Тестирует распределение отчетов по процессам со столбцами в разделяемой памяти."""
+    df = prepare_transactions(sample_transactions)
+    monkeypatch.setattr(reports, "BULK_PARALLEL_THRESHOLD", 2)
+    result = spending_by_category_bulk(df, REPORT_REQUESTS * 3, workers=2)
+    for frame, (category, input_date) in zip(result, REPORT_REQUESTS * 3):
+        pd.testing.assert_frame_equal(frame, spending_by_category(df, category, input_date))
+
+
 def test_save_report_to_file_no_filename_input_decorator(tmp_path, sample_transactions, monkeypatch):
     """Тестирует декоратор, сохраняющий отчет в файл с автосгенерированным именем."""
     generated_files = []
@@ -42,3 +93,39 @@ def test_save_report_to_file_with_filename_input_decorator(tmp_path, sample_tran
     decorated_function(sample_transactions, "Переводы", "15.02.2022")
     assert len(generated_files) == 1, "Должен быть создан один файл отчета"
     assert generated_files[0] == report_file, f"Файл отчета должен быть сохранен как {report_file}"
+
+
+def test_save_report_to_file_background(tmp_path, sample_transactions):
+    """Тестирует декоратор с записью отчета в CSV в фоновом потоке."""
+    report_file = tmp_path / "custom_report.csv"
+    decorated_function = save_report_to_file_with_filename_input(report_file, writer="csv", background=True)(
+        spending_by_category
+    )
+    result = decorated_function(sample_transactions, "Переводы", "15.02.2022")
+    assert reports.background_writer.flush(timeout=5)
+    assert len(pd.read_csv(report_file, encoding="utf-8-sig")) == len(result)
+
+
+def test_save_report_to_file_no_filename_input_writer(sample_transactions, monkeypatch):
+    """Тестирует декоратор с автосгенерированным именем и выбранным форматом отчета."""
+    generated_files = []
+    monkeypatch.setattr(pd.DataFrame, "to_csv", lambda self, path, *args, **kwargs: generated_files.append(path))
+    decorated_function = save_report_to_file_no_filename_input(writer="csv")(spending_by_category)
+    decorated_function(sample_transactions, "Переводы", "15.02.2022")
+    assert len(generated_files) == 1
+    assert str(generated_files[0]).startswith("spending_by_category_report_")
+    assert str(generated_files[0]).endswith(".csv")
+
+
+def test_rolling_spending_by_category(sample_transactions):
+    """Тестирует суммы трат по категориям за окно для многих дат в одном вызове."""
+    df = prepare_transactions(sample_transactions.rename(columns={"Сумма": "Сумма операции с округлением"}))
+    input_dates = ["15.02.2022", "01.12.2021", "31.03.2022"]
+    result = rolling_spending_by_category(df, input_dates)
+    assert list(result.columns) == ["Переводы", "Покупки"]
+    for anchor, input_date in zip(result.index, input_dates):
+        for category in result.columns:
+            expected = spending_by_category(df, category, input_date)["Сумма операции с округлением"].sum()
+            assert result.loc[anchor, category] == expected
+    weekly = rolling_spending_by_category(reports.RollingSpend(df), ["15.03.2022"], months=0, days=7)
+    assert weekly.loc[pd.Timestamp("2022-03-15"), "Переводы"] == 0
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.reports import spending_by_category
+from src.rolling import RollingSpend
+
+
+@pytest.fixture
+def random_transactions():
+    """Случайные операции за два года с дробными суммами и несколькими категориями."""
+    rng = np.random.default_rng(0)
+    size = 2000
+    dates = pd.Timestamp("2021-01-01") + pd.to_timedelta(rng.integers(0, 730 * 24 * 3600, size), unit="s")
+    return (
+        pd.DataFrame(
+            {
+                "Дата операции": dates,
+                "Категория": rng.choice(["Переводы", "Супермаркеты", "Кафе", None], size),
+                "Сумма операции с округлением": np.round(rng.uniform(-5000, 5000, size), 2),
+            }
+        )
+        .sort_values("Дата операции", kind="stable")
+        .set_index("Дата операции", drop=False)
+    )
+
+
+def test_window_totals_matches_spending_by_category(random_transactions):
+    """Сумма за окно в три месяца совпадает с суммой строк, отобранных spending_by_category."""
+    rolling = RollingSpend(random_transactions)
+    input_dates = ["31.03.2021", "29.02.2020", "15.06.2022", "31.12.2022", "01.01.2021"]
+    anchors = [datetime.strptime(date, "%d.%m.%Y") for date in input_dates]
+    result = rolling.window_totals("Кафе", anchors, months=3)
+    for anchor, input_date in zip(anchors, input_dates):
+        expected = spending_by_category(random_transactions, "Кафе", input_date)["Сумма операции с округлением"]
+        assert result[anchor] == pytest.approx(expected.sum(), abs=1e-6)
+
+
+def test_rolling_totals_days_window(random_transactions):
+    """Ряд сумм по всем категориям за окно в днях совпадает с прямым отбором строк."""
+    rolling = RollingSpend(random_transactions)
+    result = rolling.rolling_totals(months=1, days=10)
+    assert list(result.columns) == ["Кафе", "Переводы", "Супермаркеты"]
+    assert result.index[0] == pd.Timestamp("2021-01-01 23:59:59.999999999")
+    assert len(result) == 730
+    for anchor in result.index[::97]:
+        start = (anchor - pd.DateOffset(months=1) - pd.Timedelta(days=10)).normalize()
+        window = random_transactions.loc[start:anchor]
+        expected = window.groupby("Категория")["Сумма операции с округлением"].sum()
+        for category in result.columns:
+            assert result.loc[anchor, category] == pytest.approx(expected.get(category, 0), abs=1e-6)
+
+
+def test_window_totals_string_dates_and_integers(sample_transactions):
+    """Даты-строки и целые суммы: результат в целых числах, неизвестная категория дает нули."""
+    rolling = RollingSpend(sample_transactions, column="Сумма")
+    anchors = [datetime(2022, 2, 15), datetime(2022, 3, 31)]
+    result = rolling.window_totals("Переводы", anchors, months=3)
+    assert result.tolist() == [2300, 4000]
+    assert result.dtype == "int64"
+    assert rolling.window_totals("Нет такой категории", anchors, days=1).tolist() == [0, 0]
+
+
+def test_window_totals_negative_window(sample_transactions):
+    """Отрицательный размер окна - ошибка."""
+    rolling = RollingSpend(sample_transactions, column="Сумма")
+    with pytest.raises(ValueError):
+        rolling.window_totals("Переводы", [datetime(2022, 2, 15)], days=-1)
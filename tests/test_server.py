@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src import server as server_module
+from src.server import DataStore, build_response, make_server
+
+
+def write_operations(file_path, amounts):
+    """Записывает Excel-файл с операциями по одной карте с заданными суммами."""
+    pd.DataFrame(
+        {
+            "Дата операции": [f"0{day}.01.2018 12:00:00" for day in range(1, len(amounts) + 1)],
+            "Сумма операции с округлением": amounts,
+            "Категория": ["Категория1"] * len(amounts),
+            "Описание": [f"Описание{day}" for day in range(1, len(amounts) + 1)],
+            "Номер карты": ["1234567890123456"] * len(amounts),
+            "Статус": ["OK"] * len(amounts),
+        }
+    ).to_excel(file_path, index=False)
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Хранилище данных по временным файлам операций и пользовательских установок."""
+    data_path = tmp_path / "operations.xlsx"
+    settings_path = tmp_path / "user_settings.json"
+    write_operations(data_path, [1000.0, 500.0])
+    settings_path.write_text(json.dumps({"user_currencies": ["USD"], "user_stocks": ["AAPL"]}))
+    with patch("main.get_currency_rate", return_value=[{"currency": "USD", "rate": 74.85}]):
+        with patch("main.get_stock_prices", return_value=[{"stock": "AAPL", "price": 150.25}]):
+            yield DataStore(data_path, settings_path, cache_dir=tmp_path / "cache")
+
+
+def test_build_response(store):
+    response = build_response(store, "2018-01-10 23:59:59")
+    assert response["greeting"] == "Доброй ночи"
+    assert response["cards"] == [{"last_digits": "3456", "total_spent": 1500.0, "cashback": 15.0}]
+    assert [row["amount"] for row in response["top_transactions"]] == [1000.0, 500.0]
+    assert response["currency_rates"] == [{"currency": "USD", "rate": 74.85}]
+    assert response["stock_prices"] == [{"stock": "AAPL", "price": 150.25}]
+
+
+def test_reload_if_changed(store):
+    assert not store.reload_if_changed()
+    previous_snapshot = store.snapshot
+    write_operations(store.data_path, [1000.0, 500.0, 250.0])
+    os.utime(store.data_path, ns=(previous_snapshot.data_mtime_ns + 10**9,) * 2)
+
+    assert store.reload_if_changed()
+    assert store.snapshot is not previous_snapshot
+    assert store.snapshot.user_settings is previous_snapshot.user_settings
+    assert build_response(store, "2018-01-10 23:59:59")["cards"][0]["total_spent"] == 1750.0
+
+
+def test_build_response_timings(store):
+    response = build_response(store, "2018-01-10 23:59:59", timings=True)
+    timings = response.pop("_timings")
+    assert response == build_response(store, "2018-01-10 23:59:59")
+    assert "filter_by_date" in timings["stages_ms"]
+    assert timings["counters"]["rows_scanned"] == 2
+
+
+def test_server_metrics(store):
+    # реестр из того же модуля metrics, что импортирует сервер
+    registry = server_module.MetricsRegistry()
+    registry.increment("rows_scanned_total", 2)
+    server = make_server(store, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with patch("src.server.get_sink", return_value=registry):
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                assert response.headers["Content-Type"].startswith("text/plain")
+                assert response.read().decode("utf-8") == registry.export_prometheus()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_server(store):
+    server = make_server(store, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base_url}/main?datetime=2018-01-10%2023:59:59") as response:
+            assert json.loads(response.read()) == build_response(store, "2018-01-10 23:59:59")
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base_url}/main?datetime=10.01.2018")
+        assert error.value.code == 400
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base_url}/unknown")
+        assert error.value.code == 404
+        # непредвиденная ошибка возвращается ответом 500, а не разрывом соединения
+        with patch("src.server.build_response", side_effect=KeyError("user_currencies")):
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(f"{base_url}/main?datetime=2018-01-10%2023:59:59")
+        assert error.value.code == 500
+        assert json.loads(error.value.read()) == {"error": "Внутренняя ошибка сервера"}
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -4,7 +4,10 @@ import json
 import pandas as pd
 import pytest
 
-from src.services import get_transactions_with_phone_num
+from src import services
+from src.services import (build_description_index, detect_phone_numbers, get_transactions_with_phone_num,
+                          search_transactions)
+from src.utils import prepare_transactions
 
 
 @pytest.mark.parametrize(
@@ -35,12 +38,18 @@ from src.services import get_transactions_with_phone_num
             json.dumps([], ensure_ascii=False),
         ),
         (
-            # Номера в неправильном формате и один правильный
+            # Номер в неправильном формате и номера в распространенных форматах
             {
                 "Описание": ["МТС +7 (921) 11-22-33", "Тинькофф +79555555555", "Я МТС +7 921 11-22-33"],
                 "Сумма": [1500, 2000, 2500],
             },
-            json.dumps([{"Описание": "Я МТС +7 921 11-22-33", "Сумма": 2500}], ensure_ascii=False),
+            json.dumps(
+                [
+                    {"Описание": "Тинькофф +79555555555", "Сумма": 2000},
+                    {"Описание": "Я МТС +7 921 11-22-33", "Сумма": 2500},
+                ],
+                ensure_ascii=False,
+            ),
         ),
     ],
 )
@@ -51,3 +60,88 @@ def test_get_transactions_with_phone_num(data, expected_result):
     result_data = json.loads(result)
     expected_data = json.loads(expected_result)
     assert result_data == expected_data, "Функция вернула неожиданный JSON результат."
+
+
+def test_get_transactions_with_phone_num_prepared_df():
+    """Тест функции get_transactions_with_phone_num на DataFrame в каноническом виде."""
+    df = prepare_transactions(
+        pd.DataFrame(
+            {
+                "Дата операции": ["01.09.2021 10:00:00", "15.09.2021 12:00:00"],
+                "Номер карты": ["*7197", "*4556"],
+                "Описание": ["Я МТС +7 921 11-22-33", "Без номера"],
+            }
+        )
+    )
+    result_data = json.loads(get_transactions_with_phone_num(df))
+    assert result_data == [
+        {"Дата операции": "01.09.2021 10:00:00", "Номер карты": "*7197", "Описание": "Я МТС +7 921 11-22-33"}
+    ]
+
+
+@pytest.mark.parametrize(
+    "description, expected_number",
+    [
+        ("Я МТС +7 921 11-22-33", "+7 921 11-22-33"),
+        ("Тинькофф Мобайл +7 995 555-55-55", "+79955555555"),
+        ("Билайн +7 (962) 717-08-52", "+79627170852"),
+        ("МегаФон +79213333333", "+79213333333"),
+        ("Перевод 8 921 333-33-33", "+79213333333"),
+        ("Перевод 8(921)333-33-33", "+79213333333"),
+        ("Перевод 89213333333", "+79213333333"),
+        ("МТС +7 (921) 11-22-33", None),
+        ("Снятие в банкомате 037000996", None),
+        ("Счет 1289213333333", None),
+        (None, None),
+    ],
+)
+def test_detect_phone_numbers(description, expected_number):
+    """Тест распознавания мобильных номеров в распространенных форматах."""
+    assert detect_phone_numbers(pd.Series([description])).iloc[0] == expected_number
+
+
+def test_detect_phone_numbers_parallel(monkeypatch):
+    """Тест распределения поиска номеров по процессам для больших DataFrame."""
+    descriptions = pd.Series(["МТС +7 981 333-44-55", "Без номера", "Перевод 8 921 333-33-33"] * 10)
+    monkeypatch.setattr(services, "PHONE_PARALLEL_THRESHOLD", 10)
+    result = detect_phone_numbers(descriptions, workers=2)
+    assert result.tolist() == ["+79813334455", None, "+79213333333"] * 10
+
+
+def test_detect_phone_numbers_serial_by_default(monkeypatch):
+    """Без workers процессы не запускаются даже для больших DataFrame."""
+    descriptions = pd.Series(["МТС +7 981 333-44-55", "Без номера"] * 10)
+    monkeypatch.setattr(services, "PHONE_PARALLEL_THRESHOLD", 10)
+    monkeypatch.setattr(services, "ProcessPoolExecutor", None)
+    assert detect_phone_numbers(descriptions).tolist() == ["+79813334455", None] * 10
+
+
+@pytest.mark.parametrize(
+    "query, mode, expected_descriptions",
+    [
+        # найденные операции выводятся в порядке строк исходного файла, а не по дате
+        ("такси", "substring", ["Такси Максим", "Яндекс Такси"]),
+        ("такси", "prefix", ["Такси Максим"]),
+        (r"\+7 \d{3}", "regex", ["Я МТС +7 921 11-22-33"]),
+    ],
+)
+def test_search_transactions(query, mode, expected_descriptions):
+    """Тест поиска транзакций по описанию с помощью индекса."""
+    df = prepare_transactions(
+        pd.DataFrame(
+            {
+                "Дата операции": ["15.09.2021 12:00:00", "01.09.2021 10:00:00", "20.09.2021 10:00:00"],
+                "Описание": ["Такси Максим", "Яндекс Такси", "Я МТС +7 921 11-22-33"],
+            }
+        )
+    )
+    index = build_description_index(df)
+    result_data = json.loads(search_transactions(df, index, query, mode))
+    assert [row["Описание"] for row in result_data] == expected_descriptions
+
+
+def test_search_transactions_unknown_mode():
+    """Тест поиска с неизвестным режимом."""
+    df = pd.DataFrame({"Описание": ["Колхоз"]})
+    with pytest.raises(ValueError):
+        search_transactions(df, build_description_index(df), "Колхоз", "fuzzy")
@@ -0,0 +1,112 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src import views
+from src.main import get_dashboard_data
+from src.reports import spending_by_category, spending_by_category_bulk
+from src.utils import prepare_transactions
+from src.views import filter_df_by_date, get_card_sum_cashback, get_top_transactions, get_topfive_transactions
+
+# класс из того же модуля sqlite_store, что импортируют views и reports
+SqliteTransactions = views.SqliteTransactions
+
+
+@pytest.fixture
+def prepared():
+    df = pd.DataFrame(
+        {
+            "Дата операции": [
+                "01.09.2021 10:00:00",
+                "05.09.2021 11:00:00",
+                "05.09.2021 11:00:00",
+                "15.09.2021 12:00:00",
+                "20.09.2021 13:00:00",
+                "30.09.2021 14:00:00",
+                "01.10.2021 16:00:00",
+                "20.08.2021 09:00:00",
+            ],
+            "Номер карты": ["*7197", "*7197", "*4556", None, "*4556", "*7197", "*7197", "*4556"],
+            "Статус": ["OK", "OK", "OK", "OK", "FAILED", "OK", "OK", "OK"],
+            "Сумма операции с округлением": [160.89, 300.0, 300.0, 99.99, 5000.0, 1.1, 700.0, 45.5],
+            "Категория": [
+                "Супермаркеты",
+                "Фастфуд",
+                "Супермаркеты",
+                "Переводы",
+                "Переводы",
+                "Фастфуд",
+                "Фастфуд",
+                "Ж/д",
+            ],
+            "Описание": ["Колхоз", "KFC", "Магнит", "Иван С.", "Сергей З.", "KFC", "KFC", "РЖД"],
+        }
+    )
+    return prepare_transactions(df)
+
+
+@pytest.fixture
+def store(prepared):
+    store = SqliteTransactions.from_frame(prepared)
+    yield store
+    store.close()
+
+
+def test_sqlite_filter_df_by_date(prepared, store):
+    input_date = datetime(2021, 9, 30, 12, 0, 0)
+    filtered = filter_df_by_date(store, input_date)
+    assert len(filtered) == 5
+    expected = filter_df_by_date(prepared, input_date)
+    pd.testing.assert_frame_equal(filtered.to_frame(), expected, check_categorical=False)
+    pd.testing.assert_frame_equal(store.to_frame(), prepared, check_categorical=False)
+
+
+def test_sqlite_aggregations(prepared, store):
+    input_date = datetime(2021, 9, 30, 23, 59, 59)
+    filtered = filter_df_by_date(store, input_date)
+    expected = filter_df_by_date(prepared, input_date)
+    pd.testing.assert_frame_equal(get_card_sum_cashback(filtered), get_card_sum_cashback(expected))
+    # из операций с равной суммой первой идет более ранняя
+    pd.testing.assert_frame_equal(
+        get_topfive_transactions(filtered), get_topfive_transactions(expected), check_categorical=False
+    )
+    pd.testing.assert_frame_equal(
+        get_top_transactions(filtered, 2), get_top_transactions(expected, 2), check_categorical=False
+    )
+    with pytest.raises(ValueError):
+        get_top_transactions(filtered, 5, "Нет такого столбца")
+    assert get_dashboard_data(store, input_date) == get_dashboard_data(prepared, input_date)
+
+
+def test_sqlite_dashboard_without_metrics(prepared, store):
+    """Без сбора метрик число строк диапазона (COUNT(*) в базе) не запрашивается."""
+    with patch.object(SqliteTransactions, "__len__", return_value=0) as mock_len:
+        get_dashboard_data(store, datetime(2021, 9, 30, 23, 59, 59))
+    mock_len.assert_not_called()
+
+
+def test_sqlite_spending_by_category(prepared, store):
+    for category, input_date in [("Фастфуд", "30.09.2021"), ("Супермаркеты", "01.10.2021"), ("Цветы", "30.09.2021")]:
+        pd.testing.assert_frame_equal(
+            spending_by_category(store, category, input_date),
+            spending_by_category(prepared, category, input_date),
+            check_categorical=False,
+        )
+    requests = [("Фастфуд", "02.10.2021"), ("Ж/д", "30.09.2021")]
+    results = spending_by_category_bulk(store, requests)
+    assert [len(result) for result in results] == [3, 1]
+    for result, expected in zip(results, spending_by_category_bulk(prepared, requests)):
+        pd.testing.assert_frame_equal(result, expected, check_categorical=False)
+
+
+def test_sqlite_file_shared(prepared, tmp_path):
+    db_path = tmp_path / "transactions.db"
+    SqliteTransactions.from_frame(prepared, db_path).close()
+    # другой процесс или поток открывает ту же базу
+    reopened = SqliteTransactions(db_path)
+    assert len(reopened) == len(prepared)
+    reopened.append(prepared.iloc[1:2])
+    assert len(reopened.date_range(datetime(2021, 9, 1), datetime(2021, 9, 1, 23, 59, 59))) == 2
+    reopened.close()
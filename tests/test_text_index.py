@@ -0,0 +1,72 @@
+import pytest
+
+from src.text_index import DescriptionIndex, regex_literals
+
+
+@pytest.fixture
+def description_index():
+    """Индекс по небольшому набору описаний."""
+    return DescriptionIndex(["Колхоз", "Яндекс Такси", "Перевод Константин Л.", None, "Магнит", "Такси Максим"])
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("такси", [1, 5]),
+        ("ТАКСИ", [1, 5]),
+        ("ко", [0, 2]),
+        ("н", [1, 2, 4]),
+        ("Пятерочка", []),
+        ("", [0, 1, 2, 3, 4, 5]),
+    ],
+)
+def test_search_substring(description_index, query, expected):
+    """Тест поиска по подстроке без учета регистра, в том числе для коротких запросов."""
+    assert description_index.search_substring(query).tolist() == expected
+
+
+@pytest.mark.parametrize("query, expected", [("такси", [5]), ("Я", [1]), ("колхоз", [0]), ("лхоз", [])])
+def test_search_prefix(description_index, query, expected):
+    """Тест поиска по началу описания."""
+    assert description_index.search_prefix(query).tolist() == expected
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [(r"Такси$", [1]), (r"^Такси", [5]), (r"Кол|Маг", [0, 4]), (r"[Кк]онстантин", [2])],
+)
+def test_search_regex(description_index, pattern, expected):
+    """Тест поиска по регулярному выражению с предварительным отбором по триграммам."""
+    assert description_index.search_regex(pattern).tolist() == expected
+
+
+def test_short_query_candidates(description_index):
+    """Кандидаты для запросов короче триграммы берутся из индекса, а не из всех строк."""
+    assert description_index._candidates("ко").tolist() == [0, 2]
+    assert description_index._candidates("\x02я").tolist() == [1]
+    assert description_index._candidates("щ").tolist() == []
+    assert all(positions.dtype == "int32" for positions in description_index._postings.values())
+
+
+def test_add(description_index):
+    """Тест добавления описаний: позиции новых строк продолжают уже проиндексированные."""
+    assert description_index.search_substring("б").tolist() == []
+    description_index.add(["Ситимобил такси"])
+    assert len(description_index) == 7
+    assert description_index.search_substring("такси").tolist() == [1, 5, 6]
+    assert description_index.search_substring("б").tolist() == [6]
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        (r"МТС \+7 \d{3}", ["МТС +7 "]),
+        (r"abc?def", ["ab", "def"]),
+        (r"(foo)?bar", ["bar"]),
+        (r"[abc]xyz+", ["xyz"]),
+        (r"a|b", []),
+    ],
+)
+def test_regex_literals(pattern, expected):
+    """Тест выделения обязательных фрагментов регулярного выражения."""
+    assert regex_literals(pattern) == expected
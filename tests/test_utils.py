@@ -1,10 +1,19 @@
+import json
 import pathlib
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import MagicMock, patch
+from urllib.parse import parse_qs, urlparse
 
 import pandas as pd
+import pytest
 
 from src import utils
-from src.utils import get_currency_rate, get_stock_prices, read_excel_file
+from src.quote_cache import QuoteCache
+from src.utils import (TRANSACTION_SCHEMA, get_currency_rate, get_stock_prices, prepare_transactions,
+                       read_excel_chunks, read_excel_file, select_date_range)
 
 
 def test_read_excel_file(tmp_path):
@@ -16,6 +25,184 @@ def test_read_excel_file(tmp_path):
     pd.testing.assert_frame_equal(result_df, df)
 
 
+def test_read_excel_file_cache(tmp_path):
+    file_path = tmp_path / "test_file.xlsx"
+    cache_dir = tmp_path / "cache"
+    df = pd.DataFrame({"A": [1, 2], "B": [3, 4]})
+    df.to_excel(file_path, index=False)
+
+    pd.testing.assert_frame_equal(read_excel_file(file_path, cache_dir=cache_dir), df)
+    assert len(list(cache_dir.glob("*.pkl"))) == 1
+
+    # повторное чтение не разбирает Excel файл
+    with patch("src.utils.pd.read_excel") as mock_read_excel:
+        result_df = read_excel_file(file_path, cache_dir=cache_dir)
+    mock_read_excel.assert_not_called()
+    pd.testing.assert_frame_equal(result_df, df)
+
+    # изменение файла приводит к пересборке кеша
+    new_df = pd.DataFrame({"A": [5], "B": [6]})
+    new_df.to_excel(file_path, index=False)
+    pd.testing.assert_frame_equal(read_excel_file(file_path, cache_dir=cache_dir), new_df)
+
+
+def test_read_excel_file_corrupted_cache(tmp_path):
+    file_path = tmp_path / "test_file.xlsx"
+    cache_dir = tmp_path / "cache"
+    df = pd.DataFrame({"A": [1, 2], "B": [3, 4]})
+    df.to_excel(file_path, index=False)
+    read_excel_file(file_path, cache_dir=cache_dir)
+    (data_path,) = cache_dir.glob("*.pkl")
+
+    # обрезанный файл кеша удаляется, Excel файл разбирается заново и кеш пересобирается
+    data_path.write_bytes(data_path.read_bytes()[:10])
+    pd.testing.assert_frame_equal(read_excel_file(file_path, cache_dir=cache_dir), df)
+    with patch("src.utils.pd.read_excel") as mock_read_excel:
+        pd.testing.assert_frame_equal(read_excel_file(file_path, cache_dir=cache_dir), df)
+    mock_read_excel.assert_not_called()
+
+    # поврежденные метаданные кеша тоже не мешают чтению
+    data_path.with_suffix(".json").write_text("{", encoding="utf-8")
+    pd.testing.assert_frame_equal(read_excel_file(file_path, cache_dir=cache_dir), df)
+
+
+def test_read_excel_file_schema(tmp_path):
+    file_path = tmp_path / "test_file.xlsx"
+    cache_dir = tmp_path / "cache"
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["01.09.2021 10:00:00", "15.09.2021 12:00:00"],
+            "Дата платежа": ["01.09.2021", "15.09.2021"],
+            "Номер карты": ["*7197", None],
+            "Статус": ["OK", "FAILED"],
+            "Сумма операции с округлением": [160, 118],
+            "Категория": ["Супермаркеты", "Переводы"],
+            "Описание": ["Колхоз", "МТС"],
+            "MCC": [5411, 4814],
+        }
+    )
+    df.to_excel(file_path, index=False)
+
+    result_df = read_excel_file(file_path, schema=TRANSACTION_SCHEMA)
+    assert list(result_df.columns) == [column for column in df.columns if column in TRANSACTION_SCHEMA]
+    for column in ("Номер карты", "Статус", "Категория"):
+        assert isinstance(result_df[column].dtype, pd.CategoricalDtype)
+    assert result_df["Сумма операции с округлением"].dtype == "float64"
+    assert result_df["Описание"].tolist() == ["Колхоз", "МТС"]
+
+    # данные со схемой и без нее кешируются отдельно
+    cached_df = read_excel_file(file_path, cache_dir=cache_dir, schema=TRANSACTION_SCHEMA)
+    pd.testing.assert_frame_equal(cached_df, result_df)
+    assert list(read_excel_file(file_path, cache_dir=cache_dir).columns) == list(df.columns)
+    assert len(list(cache_dir.glob("*.pkl"))) == 2
+
+
+def test_read_excel_file_prepared_cache(tmp_path):
+    """В кеше хранится DataFrame в каноническом виде: повторное чтение не вызывает prepare_transactions."""
+    file_path = tmp_path / "test_file.xlsx"
+    cache_dir = tmp_path / "cache"
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["15.09.2021 12:00:00", "01.09.2021 10:00:00"],
+            "Номер карты": ["*7197", "*5091"],
+            "Статус": ["OK", "OK"],
+            "Сумма операции с округлением": [160.0, 118.0],
+            "Категория": ["Супермаркеты", "Переводы"],
+            "Описание": ["Колхоз", "МТС +7 981 333-44-55"],
+        }
+    )
+    df.to_excel(file_path, index=False)
+    expected = prepare_transactions(read_excel_file(file_path, schema=TRANSACTION_SCHEMA))
+
+    result_df = read_excel_file(file_path, cache_dir=cache_dir, schema=TRANSACTION_SCHEMA, prepared=True)
+    pd.testing.assert_frame_equal(result_df, expected)
+    with patch("src.utils.prepare_transactions") as mock_prepare:
+        cached_df = read_excel_file(file_path, cache_dir=cache_dir, schema=TRANSACTION_SCHEMA, prepared=True)
+    mock_prepare.assert_not_called()
+    pd.testing.assert_frame_equal(cached_df, expected)
+
+    # исходные и подготовленные данные кешируются отдельно
+    raw_df = read_excel_file(file_path, cache_dir=cache_dir, schema=TRANSACTION_SCHEMA)
+    assert raw_df["Дата операции"].tolist() == df["Дата операции"].tolist()
+    assert len(list(cache_dir.glob("*.pkl"))) == 2
+
+
+def test_read_excel_file_cache_eviction(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(utils, "CACHE_MAX_FILES", 2)
+    for index in range(3):
+        file_path = tmp_path / f"test_file_{index}.xlsx"
+        pd.DataFrame({"A": [index]}).to_excel(file_path, index=False)
+        utils.read_excel_file(file_path, cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("*.pkl"))) == 2
+
+
+def test_read_excel_chunks(tmp_path):
+    file_path = tmp_path / "test_file.xlsx"
+    df = pd.DataFrame({"A": [1, 2, 3, 4, 5], "B": ["a", None, "c", "d", "e"]})
+    df.to_excel(file_path, index=False)
+
+    chunks = list(read_excel_chunks(file_path, chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), read_excel_file(file_path))
+
+
+def test_prepare_transactions():
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["01.09.2021 10:00:00", "15.09.2021 12:00:00"],
+            "Номер карты": ["*7197", None],
+            "Статус": ["OK", "FAILED"],
+            "Категория": ["Супермаркеты", "Переводы"],
+            "Описание": ["Колхоз", "МТС +7 981 333-44-55"],
+            "Сумма операции с округлением": ["160.89", 118],
+        }
+    )
+    result_df = prepare_transactions(df)
+    assert pd.api.types.is_datetime64_any_dtype(result_df["Дата операции"])
+    assert isinstance(result_df["Статус"].dtype, pd.CategoricalDtype)
+    assert isinstance(result_df["Категория"].dtype, pd.CategoricalDtype)
+    assert isinstance(result_df["last_digits"].dtype, pd.CategoricalDtype)
+    assert list(result_df["Сумма операции с округлением"]) == [160.89, 118.0]
+    assert result_df["last_digits"].iloc[0] == "7197"
+    assert pd.isna(result_df["last_digits"].iloc[1])
+    assert list(result_df["has_phone"]) == [False, True]
+    assert result_df["phone_number"].iloc[1] == "+79813334455"
+    # исходный DataFrame не изменяется
+    assert df["Дата операции"].dtype == object
+
+
+def test_prepare_transactions_sorts_by_date():
+    df = pd.DataFrame({"Дата операции": ["15.09.2021 12:00:00", "01.09.2021 10:00:00", "30.09.2021 14:00:00"]})
+    result_df = prepare_transactions(df)
+    assert result_df["Дата операции"].is_monotonic_increasing
+    assert isinstance(result_df.index, pd.DatetimeIndex)
+
+
+def test_select_date_range():
+    df = pd.DataFrame(
+        {
+            "Дата операции": [
+                "30.09.2021 14:00:00",
+                "01.09.2021 10:00:00",
+                "01.10.2021 16:00:00",
+                "15.09.2021 12:00:00",
+                "31.08.2021 23:59:59",
+            ],
+            "Сумма": [3, 1, 4, 2, 0],
+        }
+    )
+    start_date, end_date = datetime(2021, 9, 1), datetime(2021, 9, 30, 14, 0, 0)
+
+    # бинарный поиск по отсортированному индексу
+    result_df = select_date_range(prepare_transactions(df), start_date, end_date)
+    assert list(result_df["Сумма"]) == [1, 2, 3]
+
+    # маска для DataFrame, не приведенного к каноническому виду
+    result_df = select_date_range(df, start_date, end_date)
+    assert sorted(result_df["Сумма"]) == [1, 2, 3]
+
+
 def test_read_excel_file_exception_handling(capfd):
     non_existent_file_path = pathlib.Path("non_existent_file.xlsx")
 
@@ -25,34 +212,40 @@ def test_read_excel_file_exception_handling(capfd):
     assert "Произошла ошибка:" in captured.out
 
 
-@patch("utils.requests.request")
-def test_get_currency_rate(mock_request):
+@pytest.fixture
+def mock_session():
+    """Подменяет общую сессию requests."""
+    session = MagicMock()
+    with patch("src.utils.get_session", return_value=session):
+        yield session
+
+
+def test_get_currency_rate(mock_session):
     original_api_key = utils.APILAYER_API_KEY
     utils.APILAYER_API_KEY = "test_api_key"
 
     try:
         mock_response = MagicMock()
         mock_response.json.return_value = {"info": {"rate": 75.5}}
-        mock_request.return_value = mock_response
+        mock_session.get.return_value = mock_response
 
         currency_list = ["USD"]
         result = utils.get_currency_rate(currency_list, "RUB")
         assert result == [{"currency": "USD", "rate": 75.5}]
-        mock_request.assert_called_once_with(
-            "GET",
+        mock_session.get.assert_called_once_with(
             "https://api.apilayer.com/exchangerates_data/convert?to=RUB&from=USD&amount=1",
             headers={"apikey": "test_api_key"},
-            data={},
+            timeout=utils.REQUEST_TIMEOUT,
         )
     finally:
         utils.APILAYER_API_KEY = original_api_key
 
 
-def test_get_currency_rate_exception_handling(capfd):
+def test_get_currency_rate_exception_handling(capfd, mock_session):
     cur_list = ["USD", "EUR"]
 
-    with patch("src.utils.requests.request", side_effect=Exception("API request failed")):
-        result = get_currency_rate(cur_list, "RUB")
+    mock_session.get.side_effect = Exception("API request failed")
+    result = get_currency_rate(cur_list, "RUB")
 
     expected_result = [{"currency": "USD", "rate": ""}, {"currency": "EUR", "rate": ""}]
     assert result == expected_result
@@ -62,33 +255,77 @@ def test_get_currency_rate_exception_handling(capfd):
     assert "Исключение API request failed. Не удалось получить курс валюты EUR." in captured.out
 
 
-@patch("utils.requests.get")
-def test_get_stock_prices(mock_get):
+def test_get_currency_rate_batch(mock_session, capfd):
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"base": "EUR", "rates": {"RUB": 100.0, "USD": 1.25, "CNY": 8.0}}
+    mock_session.get.return_value = mock_response
+
+    result = get_currency_rate(["USD", "EUR", "CNY", "XXX"], "RUB", batch=True)
+    assert result == [
+        {"currency": "USD", "rate": 80.0},
+        {"currency": "EUR", "rate": 100.0},
+        {"currency": "CNY", "rate": 12.5},
+        {"currency": "XXX", "rate": ""},
+    ]
+    assert get_currency_rate(["RUB"], "USD", batch=True) == [{"currency": "RUB", "rate": 0.01}]
+    assert mock_session.get.call_count == 2
+    assert "/latest?base=EUR" in mock_session.get.call_args.args[0]
+    assert "Не удалось получить курс валюты XXX" in capfd.readouterr().out
+
+
+def test_get_currency_rate_batch_cache(mock_session):
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"base": "EUR", "rates": {"RUB": 100.0, "USD": 1.25}}
+    mock_session.get.return_value = mock_response
+    cache = QuoteCache()
+
+    # запросы разных пользователей обслуживаются одной таблицей курсов
+    assert get_currency_rate(["USD"], cache=cache, batch=True) == [{"currency": "USD", "rate": 80.0}]
+    assert get_currency_rate(["EUR", "USD"], cache=cache, batch=True) == [
+        {"currency": "EUR", "rate": 100.0},
+        {"currency": "USD", "rate": 80.0},
+    ]
+    mock_session.get.assert_called_once()
+
+
+def test_get_stock_prices(mock_session):
     original_api_key = utils.ALPHAVANTAGE_API_KEY
     utils.ALPHAVANTAGE_API_KEY = "test_api_key"
 
     try:
         mock_response = MagicMock()
         mock_response.json.return_value = {"Time Series (5min)": {"2023-10-30 09:35:00": {"4. close": "150.00"}}}
-        mock_get.return_value = mock_response
+        mock_session.get.return_value = mock_response
 
         stock_list = ["AAPL"]
         result = get_stock_prices(stock_list)
         assert result == [{"stock": "AAPL", "price": 150.0}]
-        mock_get.assert_called_once_with(
+        mock_session.get.assert_called_once_with(
             "https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&"
-            "symbol=AAPL&interval=5min&apikey=test_api_key"
+            "symbol=AAPL&interval=5min&apikey=test_api_key",
+            timeout=utils.REQUEST_TIMEOUT,
         )
 
     finally:
         utils.ALPHAVANTAGE_API_KEY = original_api_key
 
 
-def test_get_stock_prices_exception_handling(capfd):
+def test_get_stock_prices_cache(mock_session):
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"Time Series (5min)": {"2023-10-30 09:35:00": {"4. close": "150.00"}}}
+    mock_session.get.return_value = mock_response
+    cache = QuoteCache()
+
+    assert get_stock_prices(["AAPL"], cache=cache) == [{"stock": "AAPL", "price": 150.0}]
+    assert get_stock_prices(["AAPL"], cache=cache) == [{"stock": "AAPL", "price": 150.0}]
+    mock_session.get.assert_called_once()
+
+
+def test_get_stock_prices_exception_handling(capfd, mock_session):
     stock_list = ["AAPL", "TSLA"]
 
-    with patch("src.utils.requests.get", side_effect=Exception("API request failed")):
-        result = get_stock_prices(stock_list)
+    mock_session.get.side_effect = Exception("API request failed")
+    result = get_stock_prices(stock_list)
 
     expected_result = [{"stock": "AAPL", "price": ""}, {"stock": "TSLA", "price": ""}]
     assert result == expected_result
@@ -96,3 +333,82 @@ def test_get_stock_prices_exception_handling(capfd):
     captured = capfd.readouterr()
     assert "Исключение API request failed. Не удалось получить стоимость акции AAPL." in captured.out
     assert "Исключение API request failed. Не удалось получить стоимость акции TSLA." in captured.out
+
+
+class StubState:
+    """Состояние заглушки API: число выполняющихся запросов, их максимум и ожидание медленного запроса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.release_slow = threading.Event()
+        self.slow_finished = threading.Event()
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    """Локальный HTTP-сервер, отвечающий как apilayer.com и alphavantage.co с задержкой.
+
+    Возвращает StubState; запрос акции SLOW выполняется, пока тест не установит release_slow.
+    """
+    state = StubState()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            with state.lock:
+                state.in_flight += 1
+                state.peak = max(state.peak, state.in_flight)
+            try:
+                time.sleep(0.3)
+                if query.get("symbol") == ["SLOW"]:
+                    state.release_slow.wait(5)
+                    state.slow_finished.set()
+                if self.path.startswith("/exchangerates_data/convert"):
+                    body = {"info": {"rate": {"USD": 90.123, "EUR": 100.456}[query["from"][0]]}}
+                else:
+                    body = {"Time Series (5min)": {"2023-10-30 09:35:00": {"4. close": "150.00"}}}
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(utils, "APILAYER_URL", f"{base_url}/exchangerates_data")
+    monkeypatch.setattr(utils, "ALPHAVANTAGE_URL", f"{base_url}/query")
+    yield state
+    state.release_slow.set()
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_concurrently_stub_server(stub_server):
+    rates = utils.get_currency_rate(["USD", "EUR"])
+    prices = utils.get_stock_prices(["AAPL", "AMZN", "GOOGL", "MSFT", "TSLA"])
+
+    assert rates == [{"currency": "USD", "rate": 90.12}, {"currency": "EUR", "rate": 100.46}]
+    assert [price["price"] for price in prices] == [150.0] * 5
+    # запросы выполняются параллельно: заглушка видела одновременно несколько запросов
+    assert stub_server.peak >= 2
+
+
+def test_fetch_concurrently_deadline(stub_server, monkeypatch, capfd):
+    monkeypatch.setattr(utils, "FETCH_DEADLINE", 0.6)
+    prices = utils.get_stock_prices(["AAPL", "SLOW"])
+    # результат получен, не дожидаясь медленного запроса
+    assert not stub_server.slow_finished.is_set()
+    assert prices == [{"stock": "AAPL", "price": 150.0}, {"stock": "SLOW", "price": ""}]
+    assert "превышен общий таймаут 0.6 с. Не удалось получить стоимость акции SLOW" in capfd.readouterr().out
@@ -1,9 +1,14 @@
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from src.views import filter_df_by_date, get_card_sum_cashback, get_greeting, get_topfive_transactions, parse_datetime
+from src.cube import TransactionCube
+from src.utils import prepare_transactions
+from src.views import (filter_df_by_date, get_card_sum_cashback, get_card_sum_cashback_batch,
+                       get_card_sum_cashback_from_cube, get_greeting, get_top_transactions, get_topfive_transactions,
+                       get_topfive_transactions_batch, merge_top_transactions, parse_datetime)
 
 
 @pytest.mark.parametrize(
@@ -41,6 +46,8 @@ def test_filter_df_by_date():
     result_df = filter_df_by_date(df, input_date)
     expected_dates = ["01.09.2021 10:00:00", "15.09.2021 12:00:00", "30.09.2021 14:00:00"]
     assert list(result_df["Дата операции"].dt.strftime("%d.%m.%Y %H:%M:%S")) == expected_dates
+    # исходный DataFrame не изменяется
+    assert df["Дата операции"].dtype == object
 
 
 def test_get_card_sum_cashback():
@@ -80,3 +87,183 @@ def test_get_topfive_transactions():
         result_df[["Статус", "Сумма операции с округлением"]].reset_index(drop=True),
         expected_df.reset_index(drop=True),
     )
+
+
+def test_get_top_transactions():
+    df = pd.DataFrame(
+        {
+            "Статус": ["OK", "OK", "OK", "FAILED", "OK", "OK", "OK"],
+            "Сумма операции с округлением": [500, 2000, 1500, 9000, 2000, None, 1200],
+            "Кэшбэк": [5, 20, 15, 90, 10, 0, 12],
+            "Описание": ["a", "b", "c", "d", "e", "f", "g"],
+        }
+    )
+    # из операций с равной суммой первой идет более ранняя
+    assert list(get_top_transactions(df, 3)["Описание"]) == ["b", "e", "c"]
+    assert list(get_top_transactions(df, 2, column="Кэшбэк")["Описание"]) == ["b", "c"]
+    assert list(get_top_transactions(df, 10)["Описание"]) == ["b", "e", "c", "g", "a"]
+
+
+def test_get_top_transactions_ties_in_source_order():
+    """Равные суммы упорядочиваются, как при сортировке sort_values операций в порядке файла."""
+    rng = np.random.default_rng(0)
+    size = 300
+    dates = pd.Timestamp("2021-09-01") + pd.to_timedelta(rng.integers(0, 29 * 24 * 3600, size), unit="s")
+    raw_df = pd.DataFrame(
+        {
+            # выписка идет от новых операций к старым, суммы часто совпадают
+            "Дата операции": dates.sort_values(ascending=False).strftime("%d.%m.%Y %H:%M:%S"),
+            "Статус": rng.choice(["OK", "OK", "OK", "FAILED"], size),
+            "Сумма операции с округлением": rng.choice([100.0, 250.0, 500.0, 1000.0], size),
+            "Описание": [f"Описание{index}" for index in range(size)],
+        }
+    )
+    ok_df = raw_df[raw_df["Статус"] == "OK"]
+    expected = ok_df.sort_values(by="Сумма операции с округлением", ascending=False).head(5)["Описание"].tolist()
+    prepared_df = prepare_transactions(raw_df)
+    assert get_topfive_transactions(prepared_df)["Описание"].tolist() == expected
+    input_date = datetime(2021, 9, 30)
+    batch_df = get_topfive_transactions_batch(prepared_df, [input_date])[0]
+    assert batch_df["Описание"].tolist() == expected
+
+
+def test_merge_top_transactions():
+    df = pd.DataFrame(
+        {
+            "Статус": ["OK"] * 6,
+            "Сумма операции с округлением": [100, 300, 200, 300, 50, 400],
+            "Описание": ["a", "b", "c", "d", "e", "f"],
+        }
+    )
+    parts = [get_top_transactions(df.iloc[:3], 3), get_top_transactions(df.iloc[3:], 3)]
+    result_df = merge_top_transactions(parts, 3)
+    pd.testing.assert_frame_equal(result_df, get_top_transactions(df, 3))
+
+
+def test_get_card_sum_cashback_half_kopeck():
+    """Кешбэк, приходящийся на половину копейки, округляется, как в прежнем расчете по строкам файла."""
+    raw_df = pd.DataFrame(
+        {
+            "Дата операции": [
+                "04.09.2021 10:00:00",
+                "03.09.2021 10:00:00",
+                "02.09.2021 10:00:00",
+                "01.09.2021 10:00:00",
+            ],
+            "Номер карты": ["*7197"] * 4,
+            "Статус": ["OK"] * 4,
+            "Сумма операции с округлением": [207.09, 169.18, 406.19, 462.04],
+        }
+    )
+    result_df = get_card_sum_cashback(prepare_transactions(raw_df))
+    assert result_df["total_spent"].tolist() == [1244.5]
+    # round для np.float64 округляет 12.445 до 12.44, встроенная round для float - до 12.45
+    assert result_df["cashback"].tolist() == [12.44]
+
+
+def test_get_card_sum_cashback_chunks():
+    df = pd.DataFrame(
+        {
+            "Номер карты": ["1234567890123456", None, "1234567890123456", "6543210987654321", "6543210987654321"],
+            "Статус": ["OK", "OK", "OK", "FAILED", "OK"],
+            "Сумма операции с округлением": [1000, 500, 2000, 700, 3000],
+        }
+    )
+    chunks = iter([df.iloc[:2], df.iloc[2:4], df.iloc[4:]])
+    pd.testing.assert_frame_equal(get_card_sum_cashback(chunks), get_card_sum_cashback(df))
+
+
+def test_get_topfive_transactions_chunks():
+    df = pd.DataFrame(
+        {
+            "Статус": ["OK", "OK", "OK", "FAILED", "OK", "OK", "FAILED", "OK"],
+            "Сумма операции с округлением": [500, 2000, 1500, 1000, 3000, 1700, 800, 1200],
+        }
+    )
+    chunks = iter([df.iloc[:3], df.iloc[3:6], df.iloc[6:]])
+    result_df = get_topfive_transactions(chunks)
+    assert list(result_df["Сумма операции с округлением"]) == [3000, 2000, 1700, 1500, 1200]
+
+
+def test_get_card_sum_cashback_from_cube():
+    df = prepare_transactions(
+        pd.DataFrame(
+            {
+                "Дата операции": [
+                    "31.08.2021 10:00:00",
+                    "01.09.2021 10:00:00",
+                    "10.09.2021 12:00:00",
+                    "10.09.2021 18:00:00",
+                ],
+                "Номер карты": ["1234567890123456", "1234567890123456", "6543210987654321", "6543210987654321"],
+                "Статус": ["OK", "OK", "OK", "OK"],
+                "Категория": ["Переводы", "Переводы", "Переводы", "Переводы"],
+                "Сумма операции с округлением": [500.0, 1000.0, 2000.0, 3000.0],
+            }
+        )
+    )
+    input_date = datetime(2021, 9, 10, 16, 0, 0)
+    result_df = get_card_sum_cashback_from_cube(TransactionCube(df), input_date)
+    pd.testing.assert_frame_equal(result_df, get_card_sum_cashback(filter_df_by_date(df, input_date)))
+
+
+@pytest.fixture
+def month_transactions():
+    """Операции по двум картам за два месяца в каноническом виде."""
+    return prepare_transactions(
+        pd.DataFrame(
+            {
+                "Дата операции": [
+                    "28.08.2021 10:00:00",
+                    "01.09.2021 10:00:00",
+                    "02.09.2021 11:00:00",
+                    "05.09.2021 12:00:00",
+                    "05.09.2021 18:00:00",
+                    "10.09.2021 09:00:00",
+                    "20.09.2021 15:00:00",
+                    "01.10.2021 08:00:00",
+                ],
+                "Номер карты": ["*1111", "*1111", "*2222", None, "*1111", "*2222", "*1111", "*2222"],
+                "Статус": ["OK", "OK", "OK", "OK", "FAILED", "OK", "OK", "OK"],
+                "Категория": ["Переводы"] * 8,
+                "Описание": [f"Описание{index}" for index in range(8)],
+                "Сумма операции с округлением": [900.5, 100.25, 300.0, 300.0, 700.0, 50.75, 300.0, 10.0],
+            }
+        )
+    )
+
+
+def test_get_card_sum_cashback_batch(month_transactions):
+    input_dates = [
+        datetime(2021, 9, 30, 23, 0),
+        datetime(2021, 8, 31),
+        datetime(2021, 9, 5, 12, 0),
+        datetime(2021, 10, 1),
+    ]
+    results = get_card_sum_cashback_batch(month_transactions, input_dates)
+    for input_date, result_df in zip(input_dates, results):
+        expected_df = get_card_sum_cashback(filter_df_by_date(month_transactions, input_date))
+        pd.testing.assert_frame_equal(result_df, expected_df, check_index_type=False)
+
+
+def test_get_card_sum_cashback_batch_missing_amount(month_transactions):
+    """Пропущенная сумма операции не портит сумму по карте."""
+    df = month_transactions.copy()
+    df.iloc[1, df.columns.get_loc("Сумма операции с округлением")] = float("nan")
+    input_dates = [datetime(2021, 9, 30, 23, 0)]
+    result_df = get_card_sum_cashback_batch(df, input_dates)[0]
+    expected_df = get_card_sum_cashback(filter_df_by_date(df, input_dates[0]))
+    pd.testing.assert_frame_equal(result_df, expected_df, check_index_type=False)
+
+
+def test_get_topfive_transactions_batch(month_transactions):
+    input_dates = [
+        datetime(2021, 9, 30, 23, 0),
+        datetime(2021, 8, 31),
+        datetime(2021, 9, 5, 12, 0),
+        datetime(2021, 7, 1),
+    ]
+    results = get_topfive_transactions_batch(month_transactions, input_dates)
+    for input_date, result_df in zip(input_dates, results):
+        expected_df = get_topfive_transactions(filter_df_by_date(month_transactions, input_date))
+        assert list(result_df["Описание"]) == list(expected_df["Описание"])